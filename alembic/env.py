@@ -13,7 +13,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.config import settings
 from app.db.base import Base
-from app.models import Task, TaskStatusHistory, Theme, User  # noqa: F401 - нужны для метаданных
+from app.models import (  # noqa: F401 - нужны для метаданных
+    AnalyticsWatermark,
+    Task,
+    TaskCounter,
+    TaskFlowWeek,
+    TaskStatusHistory,
+    Theme,
+    User,
+    UserTokenVersion,
+)
 
 config = context.config
 
@@ -0,0 +1,31 @@
+"""Composite indexes for keyset pagination of tasks
+
+Revision ID: 002_task_keyset_indexes
+Revises: 001_initial
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '002_task_keyset_indexes'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_tasks_created_at_id', 'tasks', ['created_at', 'id'])
+    op.create_index('idx_tasks_due_date_id', 'tasks', ['due_date', 'id'])
+    op.create_index('idx_tasks_priority_id', 'tasks', ['priority', 'id'])
+    op.create_index('idx_tasks_status_id', 'tasks', ['status', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_tasks_status_id', table_name='tasks')
+    op.drop_index('idx_tasks_priority_id', table_name='tasks')
+    op.drop_index('idx_tasks_due_date_id', table_name='tasks')
+    op.drop_index('idx_tasks_created_at_id', table_name='tasks')
@@ -0,0 +1,41 @@
+"""Full-text and trigram search indexes for tasks
+
+Revision ID: 003_task_search
+Revises: 002_task_keyset_indexes
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '003_task_search'
+down_revision: Union[str, None] = '002_task_keyset_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Конфигурация 'simple' должна совпадать с SEARCH_TS_CONFIG в app/models/task.py.
+    op.execute(
+        "ALTER TABLE tasks ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX idx_tasks_search_vector ON tasks USING gin (search_vector)")
+    op.execute("CREATE INDEX idx_tasks_title_trgm ON tasks USING gin (title gin_trgm_ops)")
+    op.execute(
+        "CREATE INDEX idx_tasks_description_trgm ON tasks USING gin (description gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_tasks_description_trgm', table_name='tasks')
+    op.drop_index('idx_tasks_title_trgm', table_name='tasks')
+    op.drop_index('idx_tasks_search_vector', table_name='tasks')
+    op.drop_column('tasks', 'search_vector')
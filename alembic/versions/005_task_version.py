@@ -0,0 +1,29 @@
+"""Task version column for optimistic concurrency
+
+Revision ID: 005_task_version
+Revises: 004_user_token_versions
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '005_task_version'
+down_revision: Union[str, None] = '004_user_token_versions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tasks',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'version')
@@ -0,0 +1,46 @@
+"""Sharded task counters and overdue index for analytics summary
+
+Revision ID: 006_task_counters
+Revises: 005_task_version
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '006_task_counters'
+down_revision: Union[str, None] = '005_task_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_counters',
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('key', sa.String(length=36), nullable=False),
+        sa.Column('shard', sa.SmallInteger(), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('dimension', 'key', 'shard'),
+    )
+    # Начальные значения — в шард 0; дальше счетчики ведет приложение.
+    op.execute(
+        "INSERT INTO task_counters (dimension, key, shard, count) "
+        "SELECT 'status', status, 0, count(*) FROM tasks GROUP BY status "
+        "UNION ALL "
+        "SELECT 'theme', CAST(theme_id AS VARCHAR), 0, count(*) FROM tasks "
+        "WHERE theme_id IS NOT NULL GROUP BY theme_id "
+        "UNION ALL "
+        "SELECT 'assignee', CAST(assignee_id AS VARCHAR), 0, count(*) FROM tasks "
+        "WHERE assignee_id IS NOT NULL GROUP BY assignee_id"
+    )
+    op.create_index('idx_tasks_due_date_status', 'tasks', ['due_date', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_tasks_due_date_status', table_name='tasks')
+    op.drop_table('task_counters')
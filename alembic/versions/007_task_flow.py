@@ -0,0 +1,52 @@
+"""Weekly task flow aggregates with a history watermark
+
+Revision ID: 007_task_flow
+Revises: 006_task_counters
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '007_task_flow'
+down_revision: Union[str, None] = '006_task_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_flow_weekly',
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('theme_key', sa.String(length=36), nullable=False),
+        sa.Column('assignee_key', sa.String(length=36), nullable=False),
+        sa.Column('completed', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('lead_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('cycle_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cycle_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('blocked_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('week', 'theme_key', 'assignee_key'),
+    )
+    op.create_table(
+        'analytics_watermarks',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('processed_until', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    # Строка знака существует заранее: первое пополнение блокирует ее FOR UPDATE
+    # и обрабатывает всю накопленную историю.
+    op.execute(
+        "INSERT INTO analytics_watermarks (name, processed_until) "
+        "VALUES ('task_flow', '1970-01-01 00:00:00')"
+    )
+    op.create_index('idx_history_changed_at', 'task_status_history', ['changed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_history_changed_at', table_name='task_status_history')
+    op.drop_table('analytics_watermarks')
+    op.drop_table('task_flow_weekly')
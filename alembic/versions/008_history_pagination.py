@@ -0,0 +1,50 @@
+"""Composite history indexes for cursor pagination and the history feed
+
+Revision ID: 008_history_pagination
+Revises: 007_task_flow
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '008_history_pagination'
+down_revision: Union[str, None] = '007_task_flow'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_history_task_id_changed_at',
+        'task_status_history',
+        ['task_id', sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'idx_history_changed_by_changed_at',
+        'task_status_history',
+        ['changed_by', sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'idx_history_changed_at_id',
+        'task_status_history',
+        [sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    # Оба прежних индекса — префиксы новых составных.
+    op.drop_index('idx_history_task_id', table_name='task_status_history')
+    op.drop_index('idx_history_changed_at', table_name='task_status_history')
+
+
+def downgrade() -> None:
+    op.create_index('idx_history_changed_at', 'task_status_history', ['changed_at'], unique=False)
+    op.create_index('idx_history_task_id', 'task_status_history', ['task_id'], unique=False)
+    op.drop_index('idx_history_changed_at_id', table_name='task_status_history')
+    op.drop_index('idx_history_changed_by_changed_at', table_name='task_status_history')
+    op.drop_index('idx_history_task_id_changed_at', table_name='task_status_history')
@@ -0,0 +1,236 @@
+"""Monthly range partitioning of task_status_history on PostgreSQL
+
+Revision ID: 009_history_partitions
+Revises: 008_history_pagination
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import uuid
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# Идентификаторы ревизии, используются Alembic.
+revision: str = '009_history_partitions'
+down_revision: Union[str, None] = '008_history_pagination'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Строк истории, переносимых одной короткой транзакцией.
+BATCH_SIZE = 10000
+# Секции создаются на столько месяцев вперед, дальше их держит
+# app/repositories/partitions.py (HISTORY_PARTITIONS_AHEAD).
+MONTHS_AHEAD = 3
+COLUMNS = 'id, task_id, from_status, to_status, changed_by, changed_at'
+
+COPY_BATCH = sa.text(f"""
+    WITH batch AS (
+        SELECT {COLUMNS} FROM task_status_history
+        WHERE (changed_at, id) > (CAST(:changed_at AS timestamp), CAST(:id AS uuid))
+        ORDER BY changed_at, id
+        LIMIT :limit
+        FOR SHARE
+    ), copied AS (
+        INSERT INTO task_status_history_new ({COLUMNS})
+        SELECT {COLUMNS} FROM batch
+        ON CONFLICT DO NOTHING
+    )
+    SELECT changed_at, id FROM batch ORDER BY changed_at DESC, id DESC LIMIT 1
+""")
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f'task_status_history_y{month.year:04d}m{month.month:02d}'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite остается одной таблицей.
+        return
+
+    # Перенос идет вне транзакции миграции: каждая пачка коммитится сразу,
+    # а новые записи во время переноса дублирует триггер. Шаги повторяемы,
+    # так что прерванную миграцию можно просто запустить снова.
+    with op.get_context().autocommit_block():
+        now = datetime.utcnow()
+        current = date(now.year, now.month, 1)
+        first = bind.scalar(sa.text('SELECT min(changed_at) FROM task_status_history')) or now
+        months = []
+        month = date(first.year, first.month, 1)
+        while month <= _add_months(current, MONTHS_AHEAD):
+            months.append(month)
+            month = _add_months(month, 1)
+
+        _create_partitioned_table(months)
+        _mirror_writes()
+        _copy_rows(bind)
+        # BRIN строится по уже перенесенным закрытым месяцам, куда новые записи
+        # не попадают, в дополнение к btree: по btree лента читается страницами.
+        for month in months:
+            if month < current:
+                name = _partition_name(month)
+                op.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name}_changed_at_brin '
+                    f'ON {name} USING brin (changed_at)'
+                )
+
+    # Подмена — одна короткая транзакция: все строки уже в новой таблице.
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute('LOCK TABLE task_status_history IN ACCESS EXCLUSIVE MODE')
+    op.execute('DROP TABLE task_status_history')
+    op.execute('DROP FUNCTION task_status_history_mirror()')
+    op.execute('ALTER TABLE task_status_history_new RENAME TO task_status_history')
+    op.execute(
+        'ALTER TABLE task_status_history '
+        'RENAME CONSTRAINT task_status_history_new_pkey TO task_status_history_pkey'
+    )
+    for index in ('idx_history_task_id_changed_at', 'idx_history_changed_by_changed_at'):
+        op.execute(f'ALTER INDEX {index}_new RENAME TO {index}')
+
+
+def _create_partitioned_table(months: list[date]) -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS task_status_history_new (
+            id UUID NOT NULL,
+            task_id UUID NOT NULL,
+            from_status VARCHAR(20) NOT NULL,
+            to_status VARCHAR(20) NOT NULL,
+            changed_by UUID NOT NULL,
+            changed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT task_status_history_new_pkey PRIMARY KEY (id, changed_at),
+            CONSTRAINT task_status_history_task_id_fkey
+                FOREIGN KEY (task_id) REFERENCES tasks (id),
+            CONSTRAINT task_status_history_changed_by_fkey
+                FOREIGN KEY (changed_by) REFERENCES users (id)
+        ) PARTITION BY RANGE (changed_at)
+    """)
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS idx_history_task_id_changed_at_new '
+        'ON task_status_history_new (task_id, changed_at DESC, id DESC)'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS idx_history_changed_by_changed_at_new '
+        'ON task_status_history_new (changed_by, changed_at DESC, id DESC)'
+    )
+    for month in months:
+        name = _partition_name(month)
+        op.execute(
+            f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF task_status_history_new '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        op.execute(
+            f'CREATE INDEX IF NOT EXISTS {name}_changed_at_id '
+            f'ON {name} (changed_at DESC, id DESC)'
+        )
+
+
+def _mirror_writes() -> None:
+    """Триггер повторяет в новой таблице все изменения старой, пока идет перенос."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION task_status_history_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM task_status_history_new
+                WHERE id = OLD.id AND changed_at = OLD.changed_at;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO task_status_history_new
+                    (id, task_id, from_status, to_status, changed_by, changed_at)
+                VALUES
+                    (NEW.id, NEW.task_id, NEW.from_status, NEW.to_status,
+                     NEW.changed_by, NEW.changed_at)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # CREATE TRIGGER дожидается открытых транзакций записи; ограничиваем
+    # ожидание, чтобы не держать очередь пишущих за собой.
+    op.execute("SET lock_timeout = '10s'")
+    op.execute('DROP TRIGGER IF EXISTS task_status_history_mirror ON task_status_history')
+    op.execute(
+        'CREATE TRIGGER task_status_history_mirror '
+        'AFTER INSERT OR UPDATE OR DELETE ON task_status_history '
+        'FOR EACH ROW EXECUTE FUNCTION task_status_history_mirror()'
+    )
+    op.execute('RESET lock_timeout')
+
+
+def _copy_rows(bind) -> None:
+    """Перенести строки пачками по (changed_at, id).
+
+    FOR SHARE держит строки пачки до ее коммита: параллельное удаление
+    дождется переноса и затем уберет строку и из новой таблицы триггером.
+    """
+    position = {'changed_at': datetime(1, 1, 1), 'id': uuid.UUID(int=0)}
+    while True:
+        last = bind.execute(COPY_BATCH, {**position, 'limit': BATCH_SIZE}).first()
+        if last is None:
+            break
+        position = {'changed_at': last.changed_at, 'id': last.id}
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Обратный перенос — одной транзакцией, с блокировкой записи в историю.
+    op.execute('LOCK TABLE task_status_history IN EXCLUSIVE MODE')
+    op.create_table(
+        'task_status_history_flat',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('from_status', sa.String(20), nullable=False),
+        sa.Column('to_status', sa.String(20), nullable=False),
+        sa.Column('changed_by', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['task_id'], ['tasks.id'], name='task_status_history_flat_task_id_fkey'
+        ),
+        sa.ForeignKeyConstraint(
+            ['changed_by'], ['users.id'], name='task_status_history_flat_changed_by_fkey'
+        ),
+        sa.PrimaryKeyConstraint('id', name='task_status_history_flat_pkey'),
+    )
+    op.execute(
+        f'INSERT INTO task_status_history_flat ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM task_status_history'
+    )
+    op.execute('DROP TABLE task_status_history')
+    op.rename_table('task_status_history_flat', 'task_status_history')
+    for old, new in (
+        ('task_status_history_flat_pkey', 'task_status_history_pkey'),
+        ('task_status_history_flat_task_id_fkey', 'task_status_history_task_id_fkey'),
+        ('task_status_history_flat_changed_by_fkey', 'task_status_history_changed_by_fkey'),
+    ):
+        op.execute(f'ALTER TABLE task_status_history RENAME CONSTRAINT {old} TO {new}')
+    op.create_index(
+        'idx_history_task_id_changed_at',
+        'task_status_history',
+        ['task_id', sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'idx_history_changed_by_changed_at',
+        'task_status_history',
+        ['changed_by', sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'idx_history_changed_at_id',
+        'task_status_history',
+        [sa.text('changed_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
@@ -2,13 +2,25 @@
 
 from app.analytics.plots import (
     HAS_MATPLOTLIB,
+    ChartSpec,
     plot_tasks_by_priority,
     plot_tasks_by_status,
     plot_tasks_by_theme,
+    render_chart,
 )
+from app.analytics.rendering import ChartRenderError, chart_renderer
+from app.analytics.svg import render_svg
+from app.analytics.chart_cache import chart_cache, chart_refresher
 
 __all__ = [
     "HAS_MATPLOTLIB",
+    "ChartSpec",
+    "ChartRenderError",
+    "chart_renderer",
+    "chart_cache",
+    "chart_refresher",
+    "render_chart",
+    "render_svg",
     "plot_tasks_by_status",
     "plot_tasks_by_priority",
     "plot_tasks_by_theme",
@@ -0,0 +1,301 @@
+"""Кэш готовых графиков по отпечатку ряда и параметров отрисовки.
+
+Ключ — хэш имени графика, формата и всех полей ``ChartSpec``: те же агрегаты
+дают тот же ключ, поэтому повторный запрос получает готовые байты без
+matplotlib, а сам ключ служит сильным ETag. Байты держатся в памяти в
+пределах бюджета и, если задан каталог, на диске — там их видят соседние
+процессы и переживает перезапуск.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Mapping, NamedTuple, Optional
+
+from app.analytics.plots import ChartSpec
+from app.analytics.rendering import ChartRenderer, chart_renderer
+from app.analytics.svg import render_svg
+from app.core.config import settings
+
+logger = logging.getLogger("task_tracker")
+
+
+def chart_fingerprint(name: str, spec: ChartSpec, fmt: str = "png") -> str:
+    """Отпечаток графика: имя, формат, ряд и оформление."""
+    payload = json.dumps([name, fmt, dataclasses.astuple(spec)], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedChart(NamedTuple):
+    """Байты графика и их ETag; ``fresh=False`` — прежняя версия, пока рисуется новая."""
+
+    etag: str
+    content: bytes
+    fresh: bool = True
+
+
+class ChartCache:
+    """Готовые графики: LRU в памяти по сумме байт и необязательный каталог на диске.
+
+    Одинаковые промахи рисуются один раз. Пока рисуется новая версия
+    графика, отдается предыдущая (если она еще в кэше), чтобы запрос не
+    ждал отрисовки. ``disk_max_bytes=0`` — каталог без ограничения размера.
+    """
+
+    def __init__(
+        self,
+        renderer: ChartRenderer,
+        max_bytes: int,
+        directory: str = "",
+        disk_max_bytes: int = 0,
+    ):
+        self.renderer = renderer
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._data: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Имя графика → ключ последней нарисованной версии PNG.
+        self._latest: dict[str, str] = {}
+        self.hits = self.disk_hits = self.misses = self.stale = 0
+
+    def lookup(self, key: str) -> Optional[bytes]:
+        """Байты графика из памяти или с диска; None — промах."""
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return data
+        data = self._read_disk(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    def store(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    async def get(self, name: str, spec: ChartSpec, fmt: str = "png") -> CachedChart:
+        """Готовый график ``name``: из кэша, прежняя версия или новая отрисовка.
+
+        SVG строится сразу в запросе — без пула процессов и прежних версий.
+        """
+        key = chart_fingerprint(name, spec, fmt)
+        data = self.lookup(key)
+        if fmt == "svg":
+            if data is None:
+                data = render_svg(spec)
+                self.store(key, data)
+            return CachedChart(f'"{key}"', data)
+        if data is not None:
+            self._latest[name] = key
+            return CachedChart(f'"{key}"', data)
+
+        render = self._render(name, key, spec)
+        previous = self._latest.get(name)
+        if previous is not None and previous != key:
+            stale = self.lookup(previous)
+            if stale is not None:
+                self.stale += 1
+                return CachedChart(f'"{previous}"', stale, fresh=False)
+        # shield: отключившийся клиент не отменяет отрисовку, которую ждут другие.
+        return CachedChart(f'"{key}"', await asyncio.shield(render))
+
+    async def refresh(self, specs: Mapping[str, ChartSpec]) -> int:
+        """Нарисовать PNG графиков, которых еще нет в кэше; вернуть их число."""
+        pending = []
+        for name, spec in specs.items():
+            key = chart_fingerprint(name, spec)
+            if self.lookup(key) is None:
+                pending.append(self._render(name, key, spec))
+            else:
+                self._latest[name] = key
+        await asyncio.gather(*pending)
+        return len(pending)
+
+    async def join(self) -> None:
+        """Дождаться отрисовок, запущенных в фоне."""
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+
+    def _render(self, name: str, key: str, spec: ChartSpec) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render_and_store(name, key, spec))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    async def _render_and_store(self, name: str, key: str, spec: ChartSpec) -> bytes:
+        data = await self.renderer.render(spec)
+        self.store(key, data)
+        self._latest[name] = key
+        return data
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Не удалось нарисовать график %s: %s", key, task.exception())
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._data[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.chart")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # mtime — время последнего обращения для вытеснения с диска.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Кэш графиков на диске недоступен: %s", e)
+            return None
+        return data
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as file:
+                file.write(data)
+            # Атомарная замена: соседний процесс не прочитает недописанный файл.
+            os.replace(tmp, path)
+            if self.disk_max_bytes > 0:
+                self._prune_disk()
+        except OSError as e:
+            logger.warning("Не удалось сохранить график на диск: %s", e)
+
+    def _prune_disk(self) -> None:
+        """Удалить давно не читавшиеся файлы сверх бюджета диска.
+
+        Пишется только новая версия графика, поэтому просмотр каталога
+        происходит редко.
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".chart"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+        self._inflight.clear()
+        self._latest.clear()
+        self.hits = self.disk_hits = self.misses = self.stale = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "rendering": len(self._inflight),
+        }
+
+
+class ChartRefresher:
+    """Фоновая перерисовка графиков.
+
+    Просыпается после коммита, изменившего счетчики задач, и не реже раза
+    в ``interval`` секунд (изменения из других процессов), затем дорисовывает
+    графики с новыми рядами. Серия коммитов во время отрисовки дает одну
+    следующую перерисовку.
+    """
+
+    def __init__(self, cache: ChartCache, interval: float):
+        self.cache = cache
+        self.interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.rendered = 0
+
+    def start(self, load: Callable[[], Awaitable[Mapping[str, ChartSpec]]]) -> None:
+        """Запустить перерисовку; ``load`` возвращает ряды всех графиков."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._wake.set()
+        self._task = asyncio.create_task(self._run(load))
+
+    def notify(self) -> None:
+        """Разбудить перерисовку; можно вызывать из любого потока."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self, load: Callable[[], Awaitable[Mapping[str, ChartSpec]]]) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                self.rendered += await self.cache.refresh(await load())
+                self.runs += 1
+            except Exception:
+                logger.exception("Фоновая перерисовка графиков не удалась")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._loop = self._wake = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+chart_cache = ChartCache(
+    chart_renderer,
+    max_bytes=settings.CHART_CACHE_MAX_BYTES,
+    directory=settings.CHART_CACHE_DIR,
+    disk_max_bytes=settings.CHART_CACHE_DISK_MAX_BYTES,
+)
+
+chart_refresher = ChartRefresher(chart_cache, interval=settings.CHART_REFRESH_INTERVAL)
@@ -0,0 +1,102 @@
+"""Колоночная сборка DataFrame задач для графиков и отчетов.
+
+Строки читаются пачками только по нужным колонкам и сразу превращаются в
+типизированные массивы: статус и идентификаторы — категории, приоритет —
+int8, даты — datetime64. ORM-объекты и словари на строку не создаются.
+"""
+
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Row, String, cast
+
+from app.models.task import Task
+
+try:
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+    np = pd = union_categoricals = None  # type: ignore
+
+# Порядок совпадает с ограничением check_task_status.
+TASK_STATUSES = ("new", "in_progress", "done", "blocked", "canceled")
+
+FRAME_COLUMNS = {
+    "id": Task.id,
+    "title": Task.title,
+    "status": Task.status,
+    "priority": Task.priority,
+    "theme_id": Task.theme_id,
+    "assignee_id": Task.assignee_id,
+    "created_by": Task.created_by,
+    "due_date": Task.due_date,
+    "created_at": Task.created_at,
+    "updated_at": Task.updated_at,
+}
+# Идентификаторы читаются строками: без преобразования в uuid.UUID на каждую ячейку.
+ID_COLUMNS = {"id", "theme_id", "assignee_id", "created_by"}
+_DATETIME_COLUMNS = {"due_date", "created_at", "updated_at"}
+
+
+def frame_columns(columns: Optional[Sequence[str]] = None) -> list:
+    """Выражения SELECT для колонок DataFrame; None — все колонки."""
+    names = list(FRAME_COLUMNS) if columns is None else list(columns)
+    unknown = [name for name in names if name not in FRAME_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные колонки: {', '.join(unknown)}")
+    return [
+        cast(FRAME_COLUMNS[name], String).label(name) if name in ID_COLUMNS else FRAME_COLUMNS[name]
+        for name in names
+    ]
+
+
+def _column_chunk(name: str, values: Sequence):
+    if name == "status":
+        return pd.Categorical(values, categories=TASK_STATUSES)
+    if name == "priority":
+        return np.fromiter(values, dtype=np.int8, count=len(values))
+    if name in ID_COLUMNS:
+        return pd.Categorical(values)
+    if name in _DATETIME_COLUMNS:
+        # None превращается в NaT.
+        return np.array(values, dtype="datetime64[us]")
+    return np.array(values, dtype=object)
+
+
+def _concat(name: str, chunks: list):
+    if name == "status":
+        return pd.Categorical.from_codes(
+            np.concatenate([chunk.codes for chunk in chunks]), categories=TASK_STATUSES
+        )
+    if name in ID_COLUMNS:
+        return union_categoricals(chunks)
+    return np.concatenate(chunks)
+
+
+def _empty_column(name: str):
+    return _concat(name, [_column_chunk(name, [])])
+
+
+async def build_tasks_frame(
+    partitions: AsyncIterator[Sequence[Row]],
+    columns: Sequence[str],
+) -> "pd.DataFrame":
+    """Собрать DataFrame из пачек строк с колонками ``columns``.
+
+    Каждая пачка сразу раскладывается по типизированным массивам, поэтому в
+    памяти одновременно держится не больше одной пачки Python-объектов.
+    """
+    chunks: dict[str, list] = {name: [] for name in columns}
+    async for rows in partitions:
+        for name, values in zip(columns, zip(*rows)):
+            chunks[name].append(_column_chunk(name, values))
+
+    return pd.DataFrame(
+        {
+            name: _concat(name, parts) if parts else _empty_column(name)
+            for name, parts in chunks.items()
+        }
+    )
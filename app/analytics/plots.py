@@ -1,110 +1,136 @@
-﻿import io
-from typing import Optional
+﻿"""Столбчатые графики аналитики.
+
+График описывается ``ChartSpec`` — готовым агрегированным рядом и
+параметрами отрисовки. ``render_chart`` рисует его через объектный API
+matplotlib (Figure + Agg) без pyplot и его глобального состояния, поэтому
+одновременные отрисовки безопасны и работают в отдельных процессах.
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Mapping, Optional
 
 import pandas as pd
 
 try:
-    from matplotlib import pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
 
     HAS_MATPLOTLIB = True
 except ImportError:
     HAS_MATPLOTLIB = False
 
-
-def plot_tasks_by_status(df: pd.DataFrame) -> Optional[bytes]:
-    """Построить PNG-график количества задач по статусам."""
+# Сколько тем показывает график по темам.
+THEME_CHART_LIMIT = 10
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """Агрегированный ряд и оформление столбчатого графика."""
+
+    title: str
+    xlabel: str
+    labels: tuple[str, ...]
+    values: tuple[int, ...]
+    color: str
+    ylabel: str = "Количество"
+    rotation: int = 0
+    empty_message: str = "Данных по задачам пока нет"
+    empty_title: Optional[str] = None
+    width: float = 10.0
+    height: float = 6.0
+    dpi: int = 100
+
+
+def status_chart(counts: Mapping[str, int]) -> ChartSpec:
+    """График задач по статусам: от самого частого статуса к редкому."""
+    ordered = sorted(
+        ((status, count) for status, count in counts.items() if count),
+        key=lambda item: -item[1],
+    )
+    return ChartSpec(
+        title="Задачи по статусам",
+        xlabel="Статус",
+        labels=tuple(status for status, _ in ordered),
+        values=tuple(count for _, count in ordered),
+        color="steelblue",
+        rotation=45,
+    )
+
+
+def priority_chart(counts: Mapping[int, int]) -> ChartSpec:
+    """График задач по приоритетам в порядке приоритета."""
+    ordered = sorted((priority, count) for priority, count in counts.items() if count)
+    return ChartSpec(
+        title="Задачи по приоритетам",
+        xlabel="Приоритет",
+        labels=tuple(str(priority) for priority, _ in ordered),
+        values=tuple(count for _, count in ordered),
+        color="coral",
+    )
+
+
+def theme_chart(counts: Mapping[str, int]) -> ChartSpec:
+    """График десяти тем с наибольшим числом задач."""
+    ordered = sorted(
+        ((str(theme_id), count) for theme_id, count in counts.items() if count),
+        key=lambda item: -item[1],
+    )[:THEME_CHART_LIMIT]
+    return ChartSpec(
+        title=f"Задачи по темам (топ {THEME_CHART_LIMIT})",
+        xlabel="ID темы",
+        labels=tuple(theme_id[:8] for theme_id, _ in ordered),
+        values=tuple(count for _, count in ordered),
+        color="mediumseagreen",
+        rotation=45,
+        empty_message="Нет задач с темами",
+        empty_title="Задачи по темам",
+    )
+
+
+def render_chart(spec: ChartSpec) -> bytes:
+    """Нарисовать график в PNG."""
     if not HAS_MATPLOTLIB:
         raise ImportError(
             "Для построения графиков нужен matplotlib. "
             "Установите зависимости: pip install -e '.[analytics]'"
         )
 
-    status_counts = df["status"].value_counts()
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    status_counts.plot(kind="bar", ax=ax, color="steelblue")
+    fig = Figure(figsize=(spec.width, spec.height), dpi=spec.dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
 
-    ax.set_title("Задачи по статусам", fontsize=16, fontweight="bold")
-    ax.set_xlabel("Статус", fontsize=12)
-    ax.set_ylabel("Количество", fontsize=12)
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=45, ha="right")
-
-    for i, value in enumerate(status_counts):
-        ax.text(i, value + 0.1, str(value), ha="center", fontsize=10)
-
-    plt.tight_layout()
+    if not spec.values:
+        ax.text(0.5, 0.5, spec.empty_message, ha="center", va="center", fontsize=14)
+        ax.set_title(spec.empty_title or spec.title, fontsize=16, fontweight="bold")
+        ax.axis("off")
+    else:
+        positions = range(len(spec.values))
+        ax.bar(positions, spec.values, width=0.5, color=spec.color)
+        ax.set_title(spec.title, fontsize=16, fontweight="bold")
+        ax.set_xlabel(spec.xlabel, fontsize=12)
+        ax.set_ylabel(spec.ylabel, fontsize=12)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(spec.labels, rotation=spec.rotation, ha="right" if spec.rotation else "center")
+        for i, value in enumerate(spec.values):
+            ax.text(i, value + 0.1, str(value), ha="center", fontsize=10)
+        fig.tight_layout()
 
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=100)
-    buf.seek(0)
-    plt.close(fig)
-
+    fig.savefig(buf, format="png", dpi=spec.dpi)
     return buf.getvalue()
 
 
-def plot_tasks_by_priority(df: pd.DataFrame) -> Optional[bytes]:
-    """Построить PNG-график количества задач по приоритетам."""
-    if not HAS_MATPLOTLIB:
-        raise ImportError(
-            "Для построения графиков нужен matplotlib. "
-            "Установите зависимости: pip install -e '.[analytics]'"
-        )
-
-    priority_counts = df["priority"].value_counts().sort_index()
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    priority_counts.plot(kind="bar", ax=ax, color="coral")
-
-    ax.set_title("Задачи по приоритетам", fontsize=16, fontweight="bold")
-    ax.set_xlabel("Приоритет", fontsize=12)
-    ax.set_ylabel("Количество", fontsize=12)
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=0)
-
-    for i, value in enumerate(priority_counts):
-        ax.text(i, value + 0.1, str(value), ha="center", fontsize=10)
-
-    plt.tight_layout()
+def plot_tasks_by_status(df: pd.DataFrame) -> Optional[bytes]:
+    """Построить PNG-график количества задач по статусам."""
+    return render_chart(status_chart(df["status"].value_counts().to_dict()))
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=100)
-    buf.seek(0)
-    plt.close(fig)
 
-    return buf.getvalue()
+def plot_tasks_by_priority(df: pd.DataFrame) -> Optional[bytes]:
+    """Построить PNG-график количества задач по приоритетам."""
+    return render_chart(priority_chart(df["priority"].value_counts().to_dict()))
 
 
 def plot_tasks_by_theme(df: pd.DataFrame) -> Optional[bytes]:
     """Построить PNG-график количества задач по темам."""
-    if not HAS_MATPLOTLIB:
-        raise ImportError(
-            "Для построения графиков нужен matplotlib. "
-            "Установите зависимости: pip install -e '.[analytics]'"
-        )
-
-    theme_counts = df[df["theme_id"].notna()]["theme_id"].value_counts().head(10)
-
-    if len(theme_counts) == 0:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.text(0.5, 0.5, "Нет задач с темами", ha="center", va="center", fontsize=14)
-        ax.set_title("Задачи по темам", fontsize=16, fontweight="bold")
-        ax.axis("off")
-    else:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        theme_counts.plot(kind="bar", ax=ax, color="mediumseagreen")
-
-        ax.set_title("Задачи по темам (топ 10)", fontsize=16, fontweight="bold")
-        ax.set_xlabel("ID темы", fontsize=12)
-        ax.set_ylabel("Количество", fontsize=12)
-        ax.set_xticklabels([str(x)[:8] for x in theme_counts.index], rotation=45, ha="right")
-
-        for i, value in enumerate(theme_counts):
-            ax.text(i, value + 0.1, str(value), ha="center", fontsize=10)
-
-    plt.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=100)
-    buf.seek(0)
-    plt.close(fig)
-
-    return buf.getvalue()
+    return render_chart(theme_chart(df["theme_id"].dropna().value_counts().to_dict()))
@@ -0,0 +1,145 @@
+"""Отрисовка графиков в пуле процессов вне цикла событий.
+
+matplotlib держит GIL всю отрисовку, поэтому графики рисуются в отдельных
+процессах. Процессы создаются один раз и прогреваются (импорт matplotlib,
+кэш шрифтов), в них передается только ``ChartSpec`` с агрегатами.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from app.analytics.plots import ChartSpec, render_chart, status_chart
+from app.core.config import settings
+
+
+class ChartRenderError(RuntimeError):
+    """График не удалось нарисовать вовремя."""
+
+
+class ChartRendererBusy(ChartRenderError):
+    """Очередь на отрисовку графиков переполнена."""
+
+
+class ChartRenderTimeout(ChartRenderError):
+    """Отрисовка графика не уложилась в таймаут."""
+
+
+def _warm_up() -> None:
+    """Инициализатор процесса: импорт matplotlib и первый рендер заранее."""
+    render_chart(status_chart({"new": 1}))
+
+
+class ChartRenderer:
+    """Ограниченный пул процессов для отрисовки графиков.
+
+    Одновременно рисуется не больше ``workers`` графиков, еще ``queue_limit``
+    ждут очереди; остальные получают ChartRendererBusy. Ожидание результата
+    ограничено ``timeout`` секундами; место в очереди освобождается, только
+    когда пул закончит (или отменит) отрисовку, даже если ожидающий уже сдался.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, timeout: float):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._durations: deque[float] = deque(maxlen=1000)
+        self.calls = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: дочерний процесс не наследует потоки и соединения родителя.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+            return self._executor
+
+    async def start(self) -> None:
+        """Заранее поднять и прогреть все процессы пула."""
+        pool = self._pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, time.sleep, 0) for _ in range(self.workers)))
+
+    async def render(self, spec: ChartSpec) -> bytes:
+        """Нарисовать PNG в пуле или, если пул выключен, прямо в цикле событий."""
+        if not settings.CHART_RENDER_OFFLOAD:
+            return render_chart(spec)
+
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise ChartRendererBusy("Сервис графиков перегружен, повторите запрос позже")
+            self._pending += 1
+
+        started = time.perf_counter()
+        try:
+            future = self._pool().submit(render_chart, spec)
+        except BrokenProcessPool:
+            self._release()
+            self._reset()
+            raise ChartRenderError("Процесс отрисовки графиков аварийно завершился")
+        future.add_done_callback(self._release)
+        try:
+            # По таймауту ждущая в очереди отрисовка отменяется, а запущенную
+            # прервать нельзя: процесс дорисует, и только тогда слот освободится.
+            png = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ChartRenderTimeout("График не успел построиться, повторите запрос позже")
+        except BrokenProcessPool:
+            self._reset()
+            raise ChartRenderError("Процесс отрисовки графиков аварийно завершился")
+
+        with self._lock:
+            self.calls += 1
+            self._durations.append(time.perf_counter() - started)
+        return png
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        # Вызывается из потока пула по завершении future.
+        with self._lock:
+            self._pending -= 1
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """Остановить процессы пула."""
+        self._reset()
+
+    def stats(self) -> dict:
+        """Время отрисовки с ожиданием очереди в миллисекундах по последним вызовам."""
+        with self._lock:
+            durations = sorted(self._durations)
+        p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))] if durations else 0.0
+        return {
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "render_p99_ms": round(p99 * 1000, 3),
+        }
+
+
+chart_renderer = ChartRenderer(
+    workers=settings.CHART_RENDER_WORKERS,
+    queue_limit=settings.CHART_RENDER_QUEUE_LIMIT,
+    timeout=settings.CHART_RENDER_TIMEOUT,
+)
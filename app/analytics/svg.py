@@ -0,0 +1,126 @@
+"""Столбчатый график в SVG без matplotlib.
+
+Разметка собирается строками прямо из ``ChartSpec``: размеры, шрифты и
+цвета те же, что у PNG из matplotlib, а построение занимает микросекунды и
+не требует ни пула процессов, ни растеризации.
+"""
+
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+from app.analytics.plots import ChartSpec
+
+_FONT = "DejaVu Sans, Arial, Helvetica, sans-serif"
+# Поля области графика в долях ширины и высоты рисунка.
+_LEFT, _RIGHT, _TOP = 0.09, 0.02, 0.1
+_BOTTOM, _BOTTOM_ROTATED = 0.12, 0.2
+
+
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _text(x: float, y: float, content: str, size: float, **attrs: str) -> str:
+    """Элемент text; ``text_anchor=...`` превращается в атрибут text-anchor."""
+    extra = "".join(
+        f" {name.replace('_', '-')}={quoteattr(value)}" for name, value in attrs.items()
+    )
+    return (
+        f'<text x="{_num(x)}" y="{_num(y)}" font-size="{_num(size)}"{extra}>'
+        f"{escape(content)}</text>"
+    )
+
+
+def _ticks(top: int) -> list[int]:
+    """Целые деления оси Y с шагом 1, 2 или 5 × 10ⁿ; последнее не меньше ``top``."""
+    if top <= 0:
+        return [0, 1]
+    raw = top / 5
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    step = max(1, int(step))
+    return list(range(0, top + step, step))
+
+
+def render_svg(spec: ChartSpec) -> bytes:
+    """Нарисовать график в SVG."""
+    width, height = spec.width * spec.dpi, spec.height * spec.dpi
+    # Размеры шрифтов в ChartSpec — в пунктах, как у matplotlib.
+    pt = spec.dpi / 72
+    size = f'width="{_num(width)}" height="{_num(height)}"'
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" {size} '
+        f'viewBox="0 0 {_num(width)} {_num(height)}" font-family="{_FONT}">',
+        f'<rect {size} fill="white"/>',
+    ]
+
+    if not spec.values:
+        title = spec.empty_title or spec.title
+        parts += [
+            _text(width / 2, height * 0.1, title, 16 * pt, text_anchor="middle", font_weight="bold"),
+            _text(
+                width / 2,
+                height / 2,
+                spec.empty_message,
+                14 * pt,
+                text_anchor="middle",
+                dominant_baseline="middle",
+            ),
+            "</svg>",
+        ]
+        return "".join(parts).encode("utf-8")
+
+    left, right, top = width * _LEFT, width * (1 - _RIGHT), height * _TOP
+    bottom = height * (1 - (_BOTTOM_ROTATED if spec.rotation else _BOTTOM))
+    ticks = _ticks(max(spec.values))
+    scale = (bottom - top) / ticks[-1]
+    slot = (right - left) / len(spec.values)
+
+    parts.append(
+        _text(width / 2, top * 0.6, spec.title, 16 * pt, text_anchor="middle", font_weight="bold")
+    )
+    for tick in ticks:
+        y = _num(bottom - tick * scale)
+        parts.append(f'<path d="M{_num(left - 5)} {y}H{_num(left)}" stroke="black"/>')
+        parts.append(
+            _text(
+                left - 8,
+                bottom - tick * scale,
+                str(tick),
+                10 * pt,
+                text_anchor="end",
+                dominant_baseline="middle",
+            )
+        )
+    parts.append(
+        f'<path d="M{_num(left)} {_num(top)}V{_num(bottom)}H{_num(right)}" '
+        'fill="none" stroke="black"/>'
+    )
+
+    for i, (label, value) in enumerate(zip(spec.labels, spec.values)):
+        center = left + slot * (i + 0.5)
+        bar_top = bottom - value * scale
+        parts.append(
+            f'<rect x="{_num(center - slot / 4)}" y="{_num(bar_top)}" width="{_num(slot / 2)}" '
+            f'height="{_num(value * scale)}" fill={quoteattr(spec.color)}/>'
+        )
+        parts.append(_text(center, bar_top - 4, str(value), 10 * pt, text_anchor="middle"))
+        label_y = bottom + 12 * pt
+        if spec.rotation:
+            rotate = f"rotate({-spec.rotation} {_num(center)} {_num(label_y)})"
+            parts.append(
+                _text(center, label_y, label, 10 * pt, text_anchor="end", transform=rotate)
+            )
+        else:
+            parts.append(_text(center, label_y, label, 10 * pt, text_anchor="middle"))
+
+    parts.append(
+        _text((left + right) / 2, height - 8 * pt, spec.xlabel, 12 * pt, text_anchor="middle")
+    )
+    ylabel_x, ylabel_y = 16 * pt, (top + bottom) / 2
+    rotate = f"rotate(-90 {_num(ylabel_x)} {_num(ylabel_y)})"
+    parts.append(
+        _text(ylabel_x, ylabel_y, spec.ylabel, 12 * pt, text_anchor="middle", transform=rotate)
+    )
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
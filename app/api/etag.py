@@ -0,0 +1,93 @@
+"""ETag, условные GET-запросы (If-None-Match → 304) и If-Match для изменений."""
+
+import hashlib
+import re
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException, Response, status
+
+_VERSION_ETAG = re.compile(r'^"v(\d+)(?:-[0-9a-f]+)?"$')
+
+
+def _digest(parts: Iterable[str]) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    return f'"{hasher.hexdigest()}"'
+
+
+def entity_etag(entity_id: Any, updated_at: datetime, *variant: Any) -> str:
+    """Сильный ETag сущности по id и updated_at.
+
+    ``variant`` различает представления одной сущности (например, набор полей).
+    """
+    return _digest([str(entity_id), updated_at.isoformat(), *map(str, variant)])
+
+
+def version_etag(version: int, *variant: Any) -> str:
+    """Сильный ETag по номеру версии сущности: ``"v3"``.
+
+    Для других представлений (``variant``) к номеру добавляется хэш, номер
+    версии из такого ETag по-прежнему читается ``parse_if_match``.
+    """
+    if not variant:
+        return f'"v{version}"'
+    suffix = hashlib.blake2b(
+        "\x00".join(map(str, variant)).encode("utf-8"), digest_size=6
+    ).hexdigest()
+    return f'"v{version}-{suffix}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Ожидаемая версия из If-Match; None — заголовка нет или он равен ``*``.
+
+    If-Match требует сильного сравнения, поэтому слабые и чужие ETag, как и
+    несколько разных версий сразу, отклоняются с 412.
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    versions = set()
+    for candidate in if_match.split(","):
+        match = _VERSION_ETAG.match(candidate.strip())
+        if match is None:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Некорректный If-Match",
+            )
+        versions.add(int(match.group(1)))
+    if len(versions) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match должен указывать одну версию",
+        )
+    return versions.pop()
+
+
+def collection_etag(rows: Iterable[tuple[Any, datetime]], *variant: Any) -> str:
+    """Сильный ETag страницы коллекции по парам (id, updated_at) в порядке выдачи."""
+    parts = [f"{row_id}:{updated_at.isoformat()}" for row_id, updated_at in rows]
+    return _digest([*map(str, variant), *parts])
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверить If-None-Match (слабое сравнение, как требует RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    """Ответ 304 без тела."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def with_etag(result: Any, response: Response, etag: str) -> Any:
+    """Проставить ETag готовому ответу или ответу, который соберет FastAPI."""
+    target = result if isinstance(result, Response) else response
+    target.headers["ETag"] = etag
+    return result
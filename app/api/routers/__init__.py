@@ -1,5 +1,5 @@
 ﻿"""Набор веб-роутеров."""
 
-from app.api.routers import analytics, auth, tasks, themes, users
+from app.api.routers import analytics, auth, history, tasks, themes, users
 
-__all__ = ["auth", "users", "themes", "tasks", "analytics"]
+__all__ = ["auth", "users", "themes", "tasks", "history", "analytics"]
@@ -1,32 +1,96 @@
-﻿from typing import Annotated
+﻿from datetime import date
+from typing import Annotated, Literal, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.analytics.plots import HAS_MATPLOTLIB, plot_tasks_by_status
+from app.analytics.chart_cache import CachedChart, chart_cache
+from app.analytics.plots import HAS_MATPLOTLIB
+from app.api.etag import etag_matches, not_modified
+from app.core.config import settings
 from app.core.deps import get_db
-from app.schemas.analytics import AnalyticsSummary
-from app.services.analytics import AnalyticsService
+from app.schemas.analytics import AnalyticsSummary, FlowMetrics
+from app.services.analytics import CHART_NAMES, AnalyticsService
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+_CHART_MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
 
 @router.get("/summary", response_model=AnalyticsSummary)
 async def get_analytics_summary(
     db: Annotated[AsyncSession, Depends(get_db)],
+    created_from: Optional[date] = Query(None, description="Задачи, созданные не раньше этой даты"),
+    created_to: Optional[date] = Query(None, description="Задачи, созданные не позже этой даты"),
+    theme_id: Optional[UUID] = None,
+    assignee_id: Optional[UUID] = None,
 ):
     """Вернуть сводную аналитику по задачам."""
     service = AnalyticsService(db)
-    summary = await service.get_summary()
+    try:
+        summary = await service.get_summary(
+            created_from=created_from,
+            created_to=created_to,
+            theme_id=theme_id,
+            assignee_id=assignee_id,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     return summary
 
 
+def _chart_response(
+    chart: CachedChart,
+    if_none_match: Optional[str],
+    filename: str,
+    media_type: str = "image/png",
+) -> Response:
+    """Ответ с графиком: сильный ETag, Cache-Control и 304 на совпавший If-None-Match.
+
+    Прежнюю версию графика клиент должен перепроверить при следующем запросе.
+    """
+    cache_control = f"public, max-age={settings.CHART_CACHE_MAX_AGE}" if chart.fresh else "no-cache"
+    if etag_matches(if_none_match, chart.etag):
+        response = not_modified(chart.etag)
+        response.headers["Cache-Control"] = cache_control
+        return response
+    return Response(
+        content=chart.content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"inline; filename={filename}",
+            "ETag": chart.etag,
+            "Cache-Control": cache_control,
+        },
+    )
+
+
+@router.get("/flow", response_model=FlowMetrics)
+async def get_flow_metrics(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    incremental: Optional[bool] = Query(
+        None, description="Пополнять недельные суммы после водяного знака; по умолчанию — из настроек"
+    ),
+):
+    """Вернуть lead time, cycle time, время в блокировке и пропускную способность по неделям."""
+    return await AnalyticsService(db).get_flow(incremental=incremental)
+
+
 @router.get("/plot/statuses.png")
 async def get_plot_statuses(
     db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Optional[str] = Header(None),
 ):
-    """Вернуть PNG-график по количеству задач в статусах."""
+    """Вернуть PNG-график по количеству задач в статусах.
+
+    Ряд берется из агрегатов; готовый PNG для того же ряда отдается из кэша,
+    новый рисуется в пуле процессов, не блокируя цикл событий.
+    """
     if not HAS_MATPLOTLIB:
         return StreamingResponse(
             iter(["matplotlib не установлен".encode("utf-8")]),
@@ -35,35 +99,70 @@ async def get_plot_statuses(
         )
 
     service = AnalyticsService(db)
-    df = await service.get_tasks_dataframe()
-
-    if len(df) == 0:
-        import io
-
-        try:
-            from matplotlib import pyplot as plt
-
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.text(0.5, 0.5, "Данных по задачам пока нет", ha="center", va="center", fontsize=14)
-            ax.set_title("Задачи по статусам", fontsize=16, fontweight="bold")
-            ax.axis("off")
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format="png", dpi=100)
-            buf.seek(0)
-            plt.close(fig)
-            png_data = buf.getvalue()
-        except ImportError:
-            return StreamingResponse(
-                iter(["matplotlib не установлен".encode("utf-8")]),
-                media_type="text/plain; charset=utf-8",
-                status_code=503,
-            )
-    else:
-        png_data = plot_tasks_by_status(df)
-
-    return StreamingResponse(
-        iter([png_data]),
-        media_type="image/png",
-        headers={"Content-Disposition": "inline; filename=statuses.png"},
-    )
+    chart = await chart_cache.get("statuses", await service.get_chart("statuses"))
+    return _chart_response(chart, if_none_match, "statuses.png")
+
+
+def _negotiate_format(accept: Optional[str]) -> str:
+    """Формат графика по Accept: PNG, только если клиент предпочитает его SVG.
+
+    Без Accept и при равных весах выбирается SVG: он строится без matplotlib.
+    """
+    weights: dict[str, float] = {}
+    for item in (accept or "*/*").split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        media_type = media_type.lower()
+        weights[media_type] = max(weight, weights.get(media_type, 0.0))
+
+    def weight_of(media_type: str) -> float:
+        for candidate in (media_type, "image/*", "*/*"):
+            if candidate in weights:
+                return weights[candidate]
+        return 0.0
+
+    svg, png = weight_of("image/svg+xml"), weight_of("image/png")
+    if not svg and not (png and HAS_MATPLOTLIB):
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Графики доступны в форматах image/svg+xml и image/png",
+        )
+    return "png" if HAS_MATPLOTLIB and png > svg else "svg"
+
+
+@router.get("/plot/{name}")
+async def get_plot(
+    name: str,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    chart_format: Optional[Literal["svg", "png"]] = Query(
+        None, alias="format", description="svg или png; без параметра — по заголовку Accept"
+    ),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Вернуть график ``name`` (statuses, priorities, themes) в SVG или PNG.
+
+    SVG строится из агрегатов без matplotlib; PNG рисует matplotlib в пуле
+    процессов. Оба формата кэшируются с сильным ETag.
+    """
+    if name not in CHART_NAMES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="График не найден")
+    fmt = chart_format or _negotiate_format(accept)
+    if fmt == "png" and not HAS_MATPLOTLIB:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="matplotlib не установлен, используйте format=svg",
+        )
+
+    service = AnalyticsService(db)
+    chart = await chart_cache.get(name, await service.get_chart(name), fmt)
+    response = _chart_response(chart, if_none_match, f"{name}.{fmt}", _CHART_MEDIA_TYPES[fmt])
+    response.headers["Vary"] = "Accept"
+    return response
@@ -4,8 +4,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user_record, get_db
+from app.core.principals import Principal
 from app.core.security import create_access_token
+from app.repositories.token_versions import TokenVersionRepository
 from app.schemas.auth import LoginRequest, RegisterRequest, TokenResponse
 from app.schemas.user import UserResponse
 from app.services.users import UserService
@@ -45,9 +47,14 @@ async def login(
             detail="Неверная почта или пароль",
         )
 
+    claims = {"sub": str(user.id)}
+    if settings.AUTH_STATELESS:
+        version = await TokenVersionRepository(db).get_version(user.id)
+        claims.update(Principal.from_user(user).claims(version))
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=claims,
         expires_delta=access_token_expires,
     )
 
@@ -59,7 +66,7 @@ async def login(
 
 @router.get("/me", response_model=UserResponse)
 async def get_me(
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_user_record),
 ):
     """Получить текущего пользователя."""
     return current_user
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.serialization import FastJSONResponse, history_feed_serializer, respond
+from app.core.deps import get_current_user, get_db
+from app.schemas.task import HistoryFeedResponse
+from app.services.tasks import TaskService
+
+router = APIRouter(prefix="/history", tags=["history"], default_response_class=FastJSONResponse)
+
+
+@router.get("", response_model=HistoryFeedResponse)
+async def get_history_feed(
+    changed_by: Optional[UUID] = Query(None, description="Автор изменений"),
+    since: Optional[datetime] = Query(None, description="Записи не раньше этого момента"),
+    until: Optional[datetime] = Query(None, description="Записи раньше этого момента"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Лента смены статусов по всем задачам, от новых записей к старым.
+
+    Администратор видит изменения всех пользователей, остальные — только свои.
+    """
+    if not current_user.is_admin:
+        if changed_by is not None and changed_by != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Нет прав на просмотр изменений другого пользователя",
+            )
+        changed_by = current_user.id
+
+    service = TaskService(db)
+    try:
+        page = await service.get_history_feed(changed_by, since, until, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return respond(
+        history_feed_serializer,
+        {"items": page.items, "limit": limit, "next_cursor": page.next_cursor},
+    )
@@ -1,22 +1,89 @@
-﻿from datetime import date
-from typing import Optional
+﻿from datetime import date, datetime
+from typing import Any, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi import status as http_status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.etag import etag_matches, not_modified, parse_if_match, version_etag, with_etag
+from app.api.serialization import (
+    FastJSONResponse,
+    respond,
+    sparse_task_list_serializer,
+    sparse_task_serializer,
+    task_history_serializer,
+    task_list_serializer,
+    task_serializer,
+)
 from app.core.deps import get_current_user, get_db
+from app.repositories.counting import COUNT_NONE
 from app.schemas.task import (
+    TaskBulkCreateResponse,
+    TaskBulkStatusChange,
+    TaskBulkStatusResponse,
     TaskCreate,
     TaskListResponse,
     TaskResponse,
     TaskStatusChange,
     TaskStatusHistoryResponse,
     TaskUpdate,
+    parse_task_fields,
 )
+from app.services.export import EXPORT_MEDIA_TYPES, ExportService
 from app.services.tasks import TaskService
 
-router = APIRouter(prefix="/tasks", tags=["tasks"])
+router = APIRouter(prefix="/tasks", tags=["tasks"], default_response_class=FastJSONResponse)
+
+
+def _owner_filter(current_user) -> Optional[UUID]:
+    """Автор, которым ограничивается изменение; админ меняет любые задачи."""
+    return None if current_user.is_admin else current_user.id
+
+
+async def _rejection(
+    service: TaskService,
+    task_id: UUID,
+    owner_id: Optional[UUID],
+    detail: str,
+    expected_version: Optional[int] = None,
+    from_status: Optional[str] = None,
+) -> Optional[HTTPException]:
+    """Причина, по которой условное изменение не затронуло строк.
+
+    Читается только узкая строка задачи: нет задачи — 404, чужая — 403,
+    другая версия — 412, другой статус — 409. None — условия выполнены
+    (например, задача уже в нужном статусе).
+    """
+    row = await service.get_version(task_id)
+    if row is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена",
+        )
+    if owner_id is not None and row.created_by != owner_id:
+        return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    if expected_version is not None and row.version != expected_version:
+        return HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Задача изменена другим запросом",
+            headers={"ETag": version_etag(row.version)},
+        )
+    if from_status is not None and row.status != from_status:
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Текущий статус задачи: {row.status}",
+        )
+    return None
+
+
+def _concurrent_change() -> HTTPException:
+    """Строка изменилась между условным запросом и разбором причины отказа."""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Задача изменена другим запросом",
+    )
 
 
 @router.get("", response_model=TaskListResponse)
@@ -29,15 +96,90 @@ async def list_tasks(
     due_date_from: Optional[date] = None,
     due_date_to: Optional[date] = None,
     q: Optional[str] = None,
-    sort: str = Query("created_at", description="Поле сортировки"),
+    sort: str = Query("created_at", description="Поле сортировки или relevance при поиске"),
     order: str = Query("desc", description="Порядок сортировки"),
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = Query(None, description="Курсор next_cursor/prev_cursor"),
+    include_total: bool = Query(True, description="Считать ли общее количество задач"),
+    count: Optional[str] = Query(
+        None,
+        pattern="^(exact|window|estimate)$",
+        description="Способ подсчета total: exact, window или estimate",
+    ),
+    fields: Optional[str] = Query(None, description="Поля задачи через запятую, id всегда включен"),
     db: AsyncSession = Depends(get_db),
 ):
     """Получить список задач с фильтрами, сортировкой и пагинацией."""
     service = TaskService(db)
-    tasks, total = await service.list_with_filters(
+    count_mode = count if include_total else COUNT_NONE
+    try:
+        selected = parse_task_fields(fields)
+        page = await service.list_with_filters(
+            status=status,
+            theme_id=theme_id,
+            assignee_id=assignee_id,
+            created_by=created_by,
+            priority=priority,
+            due_date_from=due_date_from,
+            due_date_to=due_date_to,
+            q=q,
+            sort=sort,
+            order=order,
+            limit=limit,
+            offset=offset,
+            count_mode=count_mode,
+            cursor=cursor,
+            fields=selected,
+        )
+    except ValueError as e:
+        # Параметр status перекрывает модуль fastapi.status.
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    payload = {
+        "items": page.items,
+        "total": page.total,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    }
+    if selected is not None:
+        return sparse_task_list_serializer(selected).response(payload)
+    return respond(task_list_serializer, payload)
+
+
+@router.get("/export")
+async def export_tasks(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Формат: ndjson или csv"),
+    status: Optional[str] = None,
+    theme_id: Optional[UUID] = None,
+    assignee_id: Optional[UUID] = None,
+    created_by: Optional[UUID] = None,
+    priority: Optional[int] = None,
+    due_date_from: Optional[date] = None,
+    due_date_to: Optional[date] = None,
+    q: Optional[str] = None,
+    csv_row_count: bool = Query(
+        False, description="CSV: дописать в конец строку '# rows: N' (это уже не CSV)"
+    ),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Выгрузить задачи потоком в NDJSON или CSV с фильтрами списка.
+
+    NDJSON заканчивается объектом ``{"export": {"rows": N}}``. CSV — чистый
+    CSV (заголовок и данные); ``csv_row_count=true`` дописывает последней
+    строкой ``# rows: N`` для проверки полноты, но такой файл стандартные
+    CSV-парсеры прочитают с лишней строкой данных.
+    """
+    service = ExportService(db)
+    stream = service.export_tasks(
+        format,
+        csv_row_count=csv_row_count,
         status=status,
         theme_id=theme_id,
         assignee_id=assignee_id,
@@ -46,17 +188,12 @@ async def list_tasks(
         due_date_from=due_date_from,
         due_date_to=due_date_to,
         q=q,
-        sort=sort,
-        order=order,
-        limit=limit,
-        offset=offset,
     )
-    return {
-        "items": tasks,
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-    }
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=tasks.{format}"},
+    )
 
 
 @router.post("", response_model=TaskResponse)
@@ -77,7 +214,7 @@ async def create_task(
             assignee_id=data.assignee_id,
             due_date=data.due_date,
         )
-        return task
+        return respond(task_serializer, task)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,126 +222,252 @@ async def create_task(
         )
 
 
+@router.post("/bulk", response_model=TaskBulkCreateResponse)
+async def create_tasks_bulk(
+    items: list[dict[str, Any]] = Body(..., description="Массив объектов TaskCreate"),
+    partial: bool = Query(False, description="Создать корректные задачи, вернув ошибки остальных"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Создать несколько задач за один запрос."""
+    service = TaskService(db)
+    try:
+        tasks, errors = await service.create_many(items, current_user.id, partial=partial)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    if errors and not partial:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=errors,
+        )
+
+    return {
+        "created": len(tasks),
+        "items": tasks,
+        "errors": errors,
+    }
+
+
+@router.post("/status:bulk", response_model=TaskBulkStatusResponse)
+async def change_tasks_status_bulk(
+    data: TaskBulkStatusChange,
+    status: Optional[str] = None,
+    theme_id: Optional[UUID] = None,
+    assignee_id: Optional[UUID] = None,
+    created_by: Optional[UUID] = None,
+    priority: Optional[int] = None,
+    due_date_from: Optional[date] = None,
+    due_date_to: Optional[date] = None,
+    q: Optional[str] = None,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Сменить статус у задач из task_ids и/или подходящих под фильтры.
+
+    Изменяются только задачи пользователя (или любые — для админа).
+    """
+    service = TaskService(db)
+    try:
+        task_ids = await service.change_status_many(
+            data.to_status,
+            changed_by=current_user.id,
+            is_admin=current_user.is_admin,
+            task_ids=data.task_ids,
+            status=status,
+            theme_id=theme_id,
+            assignee_id=assignee_id,
+            created_by=created_by,
+            priority=priority,
+            due_date_from=due_date_from,
+            due_date_to=due_date_to,
+            q=q,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return {"updated": len(task_ids), "task_ids": task_ids}
+
+
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
     task_id: UUID,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Поля задачи через запятую, id всегда включен"),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить задачу по идентификатору."""
+    """Получить задачу по идентификатору.
+
+    Ответ содержит ETag по версии задачи; при совпадении If-None-Match
+    возвращается 304 после чтения одной версии, без загрузки задачи.
+    """
     service = TaskService(db)
+    try:
+        selected = parse_task_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    # Для выборки полей версии в строке нет, поэтому она читается всегда.
+    if if_none_match or selected is not None:
+        version = await service.get_version(task_id)
+        if version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Задача не найдена",
+            )
+        etag = version_etag(version.version, *(selected or ()))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    if selected is not None:
+        row = await service.get_fields_by_id(task_id, selected)
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Задача не найдена",
+            )
+        return with_etag(sparse_task_serializer(selected).response(row), response, etag)
+
     task = await service.get_by_id(task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Задача не найдена",
         )
-    return task
+    # Задача могла измениться между запросами — ETag берется из загруженной версии.
+    etag = version_etag(task.version)
+    return with_etag(respond(task_serializer, task), response, etag)
 
 
 @router.patch("/{task_id}", response_model=TaskResponse)
 async def update_task(
     task_id: UUID,
     data: TaskUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Обновить задачу."""
-    service = TaskService(db)
-    task = await service.get_by_id(task_id)
-
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задача не найдена",
-        )
-
-    if task.created_by != current_user.id and not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Редактировать можно только свои задачи",
-        )
+    """Обновить задачу.
 
+    Права и версия из If-Match проверяются в условии UPDATE, поэтому задача
+    не читается заранее; устаревшая версия — 412.
+    """
+    service = TaskService(db)
+    expected_version = parse_if_match(if_match)
+    owner_id = _owner_filter(current_user)
     try:
         update_data = data.model_dump(exclude_unset=True)
-        updated_task = await service.update(task_id, **update_data)
-        return updated_task
+        updated_task = await service.update(
+            task_id, owner_id=owner_id, expected_version=expected_version, **update_data
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    if updated_task is None:
+        raise await _rejection(
+            service, task_id, owner_id, "Редактировать можно только свои задачи", expected_version
+        ) or _concurrent_change()
+    return with_etag(respond(task_serializer, updated_task), response, version_etag(updated_task.version))
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     task_id: UUID,
+    if_match: Optional[str] = Header(None),
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Удалить задачу."""
+    """Удалить задачу (права и версия из If-Match проверяются в условии DELETE)."""
     service = TaskService(db)
-    task = await service.get_by_id(task_id)
-
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задача не найдена",
-        )
-
-    if task.created_by != current_user.id and not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Удалять можно только свои задачи",
-        )
-
-    success = await service.delete(task_id)
+    expected_version = parse_if_match(if_match)
+    owner_id = _owner_filter(current_user)
+    success = await service.delete(task_id, owner_id=owner_id, expected_version=expected_version)
     if not success:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задача не найдена",
-        )
+        raise await _rejection(
+            service, task_id, owner_id, "Удалять можно только свои задачи", expected_version
+        ) or _concurrent_change()
 
 
-# Проверка прав доступа перед сменой статуса.
 @router.post("/{task_id}/status", response_model=TaskResponse)
 async def change_task_status(
     task_id: UUID,
     data: TaskStatusChange,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Изменить статус задачи."""
-    service = TaskService(db)
-    task = await service.get_by_id(task_id)
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задача не найдена",
-        )
-
-    if task.created_by != current_user.id and not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Менять статус можно только у своих задач",
-        )
+    """Изменить статус задачи.
 
+    Смена выполняется одним условным запросом: права, ожидаемый статус
+    (``from_status``) и версия из If-Match проверяются в его условии, история
+    пишется в том же запросе. Задача читается, только если строк не затронуто.
+    """
+    service = TaskService(db)
+    expected_version = parse_if_match(if_match)
+    owner_id = _owner_filter(current_user)
     try:
-        updated_task = await service.change_status(task_id, data.to_status, current_user.id)
-        return updated_task
+        task = await service.change_status(
+            task_id,
+            data.to_status,
+            current_user.id,
+            owner_id=owner_id,
+            from_status=data.from_status,
+            expected_version=expected_version,
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
 
+    if task is None:
+        rejection = await _rejection(
+            service,
+            task_id,
+            owner_id,
+            "Менять статус можно только у своих задач",
+            expected_version,
+            data.from_status,
+        )
+        if rejection is not None:
+            raise rejection
+        # Задача уже в нужном статусе — менять нечего.
+        task = await service.get_by_id(task_id)
+        if task is None:
+            raise _concurrent_change()
+    return with_etag(respond(task_serializer, task), response, version_etag(task.version))
+
 
 @router.get("/{task_id}/history", response_model=list[TaskStatusHistoryResponse])
 async def get_task_history(
     task_id: UUID,
+    request: Request,
+    response: Response,
+    since: Optional[datetime] = Query(None, description="Записи не раньше этого момента"),
+    until: Optional[datetime] = Query(None, description="Записи раньше этого момента"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка Link (rel=next)"),
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить историю изменения статусов задачи."""
+    """Получить историю изменения статусов задачи, от новых записей к старым.
+
+    Отдается не больше ``limit`` записей; ссылка на следующую страницу —
+    в заголовке ``Link`` с ``rel="next"``.
+    """
     service = TaskService(db)
     task = await service.get_by_id(task_id)
 
@@ -224,5 +487,18 @@ async def get_task_history(
             detail="Нет прав на просмотр истории этой задачи",
         )
 
-    return await service.get_task_history(task_id)
+    try:
+        page = await service.get_task_history(task_id, since, until, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    result = respond(task_history_serializer, page.items)
+    if page.next_cursor:
+        target = result if isinstance(result, Response) else response
+        next_url = request.url.include_query_params(cursor=page.next_cursor)
+        target.headers["Link"] = f'<{next_url}>; rel="next"'
+    return result
 
@@ -1,25 +1,48 @@
-﻿from uuid import UUID
+﻿from typing import Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.etag import collection_etag, entity_etag, etag_matches, not_modified, with_etag
+from app.api.serialization import (
+    FastJSONResponse,
+    respond,
+    theme_list_serializer,
+    theme_serializer,
+)
 from app.core.deps import get_current_user, get_db
+from app.repositories.counting import COUNT_NONE
 from app.schemas.theme import ThemeCreate, ThemeResponse, ThemeUpdate
 from app.services.themes import ThemeService
 
-router = APIRouter(prefix="/themes", tags=["themes"])
+router = APIRouter(prefix="/themes", tags=["themes"], default_response_class=FastJSONResponse)
 
 
 @router.get("", response_model=list[ThemeResponse])
 async def list_themes(
+    response: Response,
     limit: int = 100,
     offset: int = 0,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить список тем."""
+    """Получить список тем.
+
+    ETag считается по парам (id, updated_at) страницы, поэтому повторный
+    запрос без изменений отвечает 304 без загрузки тем.
+    """
     service = ThemeService(db)
-    themes, _ = await service.list_all(limit, offset)
-    return themes
+    if if_none_match:
+        versions = await service.list_versions(limit, offset)
+        etag = collection_etag(versions, limit, offset)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    # Ответ не содержит total, поэтому считать его незачем.
+    themes, _ = await service.list_all(limit, offset, count_mode=COUNT_NONE)
+    etag = collection_etag(((theme.id, theme.updated_at) for theme in themes), limit, offset)
+    return with_etag(respond(theme_list_serializer, themes), response, etag)
 
 
 @router.post("", response_model=ThemeResponse)
@@ -38,7 +61,7 @@ async def create_theme(
     service = ThemeService(db)
     try:
         theme = await service.create(data.name, data.description)
-        return theme
+        return respond(theme_serializer, theme)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,17 +72,27 @@ async def create_theme(
 @router.get("/{theme_id}", response_model=ThemeResponse)
 async def get_theme(
     theme_id: UUID,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить тему по идентификатору."""
+    """Получить тему по идентификатору (с ETag и поддержкой If-None-Match)."""
     service = ThemeService(db)
+    if if_none_match:
+        version = await service.get_version(theme_id)
+        if version is not None:
+            etag = entity_etag(version.id, version.updated_at)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
     theme = await service.get_by_id(theme_id)
     if not theme:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Тема не найдена",
         )
-    return theme
+    etag = entity_etag(theme.id, theme.updated_at)
+    return with_etag(respond(theme_serializer, theme), response, etag)
 
 
 @router.patch("/{theme_id}", response_model=ThemeResponse)
@@ -84,7 +117,7 @@ async def update_theme(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Тема не найдена",
             )
-        return theme
+        return respond(theme_serializer, theme)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,7 +1,7 @@
 ﻿from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user, get_current_user_record, get_db
 from app.schemas.user import UserResponse, UserUpdate
 from app.services.users import UserService
 
@@ -10,7 +10,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_user_record),
 ):
     """Получить информацию о текущем пользователе."""
     return current_user
@@ -0,0 +1,84 @@
+"""Быстрая сериализация ответов API.
+
+По умолчанию FastAPI валидирует возвращаемый объект через ``response_model``,
+прогоняет результат через ``jsonable_encoder`` и только потом кодирует JSON.
+При ``FAST_JSON_RESPONSES`` ответ валидируется один раз заранее собранным
+``TypeAdapter`` и сразу кодируется в байты в pydantic-core, а словари
+кодируются через orjson, если он установлен.
+"""
+
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.schemas.task import (
+    HistoryFeedResponse,
+    TaskListResponse,
+    TaskResponse,
+    TaskStatusHistoryResponse,
+    sparse_task_list_model,
+    sparse_task_model,
+)
+from app.schemas.theme import ThemeResponse
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None  # type: ignore
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, который кодирует содержимое через orjson в быстром режиме."""
+
+    def render(self, content: Any) -> bytes:
+        if HAS_ORJSON and settings.FAST_JSON_RESPONSES:
+            return orjson.dumps(content)
+        return super().render(content)
+
+
+class Serializer:
+    """Заранее собранный валидатор и JSON-кодировщик схемы."""
+
+    def __init__(self, schema: Any):
+        self.adapter = TypeAdapter(schema)
+
+    def dump(self, value: Any) -> bytes:
+        """Провалидировать значение (в том числе ORM-объекты) и закодировать в JSON."""
+        return self.adapter.dump_json(self.adapter.validate_python(value, from_attributes=True))
+
+    def response(self, value: Any, status_code: int = 200) -> Response:
+        return Response(self.dump(value), status_code=status_code, media_type="application/json")
+
+
+task_serializer = Serializer(TaskResponse)
+task_list_serializer = Serializer(TaskListResponse)
+task_history_serializer = Serializer(list[TaskStatusHistoryResponse])
+history_feed_serializer = Serializer(HistoryFeedResponse)
+theme_serializer = Serializer(ThemeResponse)
+theme_list_serializer = Serializer(list[ThemeResponse])
+
+
+def respond(serializer: Serializer, value: Any) -> Any:
+    """Вернуть ответ быстрым путем, если он включен, иначе отдать FastAPI как есть."""
+    if not settings.FAST_JSON_RESPONSES:
+        return value
+    return serializer.response(value)
+
+
+@lru_cache(maxsize=128)
+def sparse_task_serializer(fields: tuple[str, ...]) -> Serializer:
+    """Сериализатор задачи с выбранными полями."""
+    return Serializer(sparse_task_model(fields))
+
+
+@lru_cache(maxsize=128)
+def sparse_task_list_serializer(fields: tuple[str, ...]) -> Serializer:
+    """Сериализатор списка задач с выбранными полями."""
+    return Serializer(sparse_task_list_model(fields))
@@ -1,12 +1,21 @@
 ﻿"""Общие элементы слоя core."""
 
 from app.core.config import settings
-from app.core.security import create_access_token, decode_token, hash_password, verify_password
+from app.core.security import (
+    create_access_token,
+    decode_token,
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_password_async,
+)
 
 __all__ = [
     "settings",
     "hash_password",
+    "hash_password_async",
     "verify_password",
+    "verify_password_async",
     "create_access_token",
     "decode_token",
 ]
@@ -5,8 +5,11 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import decode_token
+from app.core.config import settings
+from app.core.principals import Principal, principal_cache
+from app.core.security import PRINCIPAL_CLAIMS, decode_token
 from app.db.session import get_session
+from app.repositories.token_versions import TokenVersionRepository
 from app.repositories.users import UserRepository
 
 security = HTTPBearer()
@@ -21,8 +24,13 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db),
-):
-    """Получить текущего пользователя по токену."""
+) -> Principal:
+    """Получить текущего пользователя по токену.
+
+    Возвращается снимок ``Principal`` из кэша; в базу запрос идет только
+    при промахе. В режиме ``AUTH_STATELESS`` снимок собирается из claims
+    токена, а база (через кэш) проверяет только версию токенов.
+    """
     token = credentials.credentials
     payload = decode_token(token)
 
@@ -43,6 +51,20 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if settings.AUTH_STATELESS and all(claim in payload for claim in PRINCIPAL_CLAIMS):
+        version = await TokenVersionRepository(db).get_version(user_uuid)
+        if payload["token_version"] != version:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Токен отозван",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return Principal.from_claims(user_uuid, payload)
+
+    principal = principal_cache.get(user_uuid)
+    if principal is not None:
+        return principal
+
     repo = UserRepository(db)
     user = await repo.get_by_id(user_uuid)
 
@@ -53,4 +75,21 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return principal
+
+
+async def get_current_user_record(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Полная запись текущего пользователя для ответов с его профилем."""
+    user = await UserRepository(db).get_by_id(current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь не найден",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
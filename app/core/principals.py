@@ -0,0 +1,88 @@
+"""Кэш аутентифицированных пользователей для get_current_user."""
+
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.models.user import User
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Неизменяемый снимок пользователя, достаточный для проверки прав."""
+
+    id: UUID
+    email: str
+    username: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_admin=user.is_admin,
+        )
+
+    @classmethod
+    def from_claims(cls, user_id: UUID, claims: dict) -> "Principal":
+        """Собрать снимок из claims токена (режим AUTH_STATELESS)."""
+        return cls(
+            id=user_id,
+            email=claims.get("email", ""),
+            username=claims["username"],
+            is_admin=bool(claims["is_admin"]),
+        )
+
+    def claims(self, token_version: int) -> dict:
+        """Claims для токена, по которым снимок восстанавливается без базы."""
+        return {
+            "email": self.email,
+            "username": self.username,
+            "is_admin": self.is_admin,
+            "token_version": token_version,
+        }
+
+
+class PrincipalCache:
+    """LRU снимков пользователей по id с коротким временем жизни."""
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.backend = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: UUID) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        principal = self.backend.get(user_id)
+        if principal is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return principal
+
+    def put(self, principal: Principal) -> None:
+        if self.enabled:
+            self.backend.set(principal.id, principal)
+
+    def invalidate(self, user_id: UUID) -> None:
+        self.backend.delete(user_id)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    enabled=settings.PRINCIPAL_CACHE_ENABLED,
+)
@@ -1,10 +1,17 @@
-﻿from datetime import datetime, timedelta, timezone
-from typing import Optional
+﻿import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.lru import LRUCache
 
 # Контекст для хеширования паролей.
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +27,87 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasherBusy(RuntimeError):
+    """Очередь на хеширование паролей переполнена."""
+
+
+class PasswordHashPool:
+    """Ограниченный пул потоков для bcrypt.
+
+    bcrypt отпускает GIL, поэтому в потоках хеширование не блокирует цикл
+    событий. Одновременно выполняется не больше ``workers`` задач, еще
+    ``queue_limit`` ждут своей очереди; остальные получают PasswordHasherBusy.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._waits: deque[float] = deque(maxlen=1000)
+        self.calls = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполнить func в пуле или, если пул выключен, прямо в цикле событий."""
+        if not settings.PASSWORD_HASH_OFFLOAD:
+            return func(*args)
+
+        if self._pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise PasswordHasherBusy("Сервис перегружен, повторите запрос позже")
+
+        self._pending += 1
+        submitted = time.perf_counter()
+
+        def job() -> Any:
+            self._record_wait(time.perf_counter() - submitted)
+            return func(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self._pending -= 1
+
+    def _record_wait(self, wait: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self._waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+
+    def stats(self) -> dict:
+        """Ожидание свободного потока в миллисекундах по последним вызовам."""
+        with self._lock:
+            waits = sorted(self._waits)
+        p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+        return {
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "wait_p99_ms": round(p99 * 1000, 3),
+            "wait_max_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """Захешировать пароль, не блокируя цикл событий."""
+    return await password_hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверить пароль, не блокируя цикл событий."""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создать токен доступа."""
     to_encode = data.copy()
@@ -30,13 +118,112 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
+class TokenCache:
+    """Кэш результатов проверки JWT по sha256 токена.
+
+    Проверенный токен хранится до своего ``exp``, некорректный — короткое
+    ``negative_ttl``, чтобы поток мусорных токенов не расходовал CPU на подписи.
+    Некорректные токены лежат в отдельном, меньшем LRU: поток уникального
+    мусора вытесняет только их, а не проверенные токены.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        negative_ttl: float,
+        negative_maxsize: int = 1000,
+        enabled: bool = True,
+    ):
+        self.entries = LRUCache(maxsize=maxsize)
+        self.rejected = LRUCache(maxsize=negative_maxsize, ttl=negative_ttl)
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> tuple[bool, Optional[dict]]:
+        """Вернуть (найдено, данные); данные None — токен некорректен.
+
+        Данные — копия: вызывающий может менять ее, не трогая кэш.
+        """
+        if not self.enabled:
+            return False, None
+        key = self.key(token)
+        payload = self.entries.get(key)
+        if payload is not None:
+            self.hits += 1
+            return True, dict(payload)
+        if self.rejected.get(key) is not None:
+            self.negative_hits += 1
+            return True, None
+        self.misses += 1
+        return False, None
+
+    def put(self, token: str, payload: Optional[dict], expires_at: Optional[float] = None) -> None:
+        """Запомнить результат проверки; ``expires_at`` — exp токена (unix time)."""
+        if not self.enabled:
+            return
+        if payload is None:
+            self.rejected.set(self.key(token), True)
+            return
+        if expires_at is None:
+            return
+        ttl = expires_at - time.time()
+        if ttl > 0:
+            self.entries.set(self.key(token), dict(payload), ttl)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.rejected.clear()
+        self.hits = self.negative_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "verifications_saved": self.hits + self.negative_hits,
+        }
+
+
+token_cache = TokenCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    negative_ttl=settings.TOKEN_CACHE_NEGATIVE_TTL,
+    negative_maxsize=settings.TOKEN_CACHE_NEGATIVE_SIZE,
+    enabled=settings.TOKEN_CACHE_ENABLED,
+)
+
+
+# Claims пользователя, которые кладутся в токен в режиме AUTH_STATELESS.
+PRINCIPAL_CLAIMS = ("email", "username", "is_admin", "token_version")
+
+
 def decode_token(token: str) -> Optional[dict]:
-    """Декодировать токен и вернуть его данные."""
+    """Декодировать токен и вернуть его данные.
+
+    Повторные токены берутся из ``token_cache`` без проверки подписи.
+    """
+    found, cached = token_cache.get(token)
+    if found:
+        return cached
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            return None
-        return {"user_id": user_id}
     except JWTError:
+        token_cache.put(token, None)
+        return None
+
+    user_id = payload.get("sub")
+    if not user_id:
+        token_cache.put(token, None)
         return None
+    data = {"user_id": user_id}
+    data.update({claim: payload[claim] for claim in PRINCIPAL_CLAIMS if claim in payload})
+    token_cache.put(token, data, payload.get("exp"))
+    return data
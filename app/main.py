@@ -1,10 +1,23 @@
+import asyncio
 import logging
+from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.api.routers import analytics, auth, tasks, themes, users
+from app.analytics.chart_cache import chart_cache, chart_refresher
+from app.analytics.plots import HAS_MATPLOTLIB, ChartSpec
+from app.analytics.rendering import ChartRenderError, chart_renderer
+from app.api.routers import analytics, auth, history, tasks, themes, users
 from app.core.config import settings
+from app.core.principals import principal_cache
+from app.core.security import PasswordHasherBusy, password_hash_pool, token_cache
+from app.db.session import async_session
+from app.repositories.cache import entity_cache
+from app.repositories.partitions import HistoryPartitionRepository
+from app.repositories.task_counters import on_counters_changed
+from app.services.analytics import AnalyticsService
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,14 +42,73 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(themes.router)
 app.include_router(tasks.router)
+app.include_router(history.router)
 app.include_router(analytics.router)
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Переполненная очередь bcrypt — 503 с просьбой повторить позже."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(ChartRenderError)
+async def chart_render_error_handler(request: Request, exc: ChartRenderError):
+    """Пул графиков перегружен или не успел — 503 с просьбой повторить позже."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _load_charts() -> dict[str, ChartSpec]:
+    async with async_session() as db:
+        return await AnalyticsService(db).get_charts()
+
+
+_partition_maintenance: Optional[asyncio.Task] = None
+
+
+async def _maintain_history_partitions() -> None:
+    """Создавать будущие секции истории и индексировать закрытые (PostgreSQL)."""
+    while True:
+        try:
+            async with async_session() as db:
+                changes = await HistoryPartitionRepository(db).maintain()
+            if changes["created"] or changes["compacted"]:
+                logger.info("Секции истории: %s", changes)
+        except Exception:
+            logger.exception("Обслуживание секций истории не удалось")
+        await asyncio.sleep(settings.HISTORY_PARTITION_MAINTENANCE_INTERVAL)
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
+    global _partition_maintenance
+    if settings.CHART_RENDER_OFFLOAD and HAS_MATPLOTLIB:
+        await chart_renderer.start()
+    if settings.CHART_REFRESH_ENABLED and HAS_MATPLOTLIB:
+        on_counters_changed(chart_refresher.notify)
+        chart_refresher.start(_load_charts)
+    if settings.HISTORY_PARTITION_MAINTENANCE_INTERVAL > 0:
+        _partition_maintenance = asyncio.create_task(_maintain_history_partitions())
     logger.info("API трекера задач запущен")
 
 
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    if _partition_maintenance is not None:
+        _partition_maintenance.cancel()
+    await chart_refresher.stop()
+    await chart_cache.join()
+    chart_renderer.shutdown()
+
+
 @app.get("/", tags=["root"])
 async def root():
     """Корневой эндпоинт."""
@@ -50,4 +122,12 @@ async def root():
 @app.get("/health", tags=["health"])
 async def health_check():
     """Проверка состояния сервиса."""
-    return {"status": "ок"}
+    return {
+        "status": "ок",
+        "entity_cache": entity_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": password_hash_pool.stats(),
+        "token_cache": token_cache.stats(),
+        "chart_rendering": chart_renderer.stats(),
+        "chart_cache": chart_cache.stats(),
+    }
@@ -2,5 +2,17 @@ from app.models.user import User
 from app.models.theme import Theme
 from app.models.task import Task
 from app.models.history import TaskStatusHistory
+from app.models.token_version import UserTokenVersion
+from app.models.counter import TaskCounter
+from app.models.flow import AnalyticsWatermark, TaskFlowWeek
 
-__all__ = ["User", "Theme", "Task", "TaskStatusHistory"]
+__all__ = [
+    "User",
+    "Theme",
+    "Task",
+    "TaskStatusHistory",
+    "UserTokenVersion",
+    "TaskCounter",
+    "TaskFlowWeek",
+    "AnalyticsWatermark",
+]
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, SmallInteger, String
+
+from app.db.base import Base
+
+
+class TaskCounter(Base):
+    """Счетчик задач в разрезе (статус, тема или исполнитель).
+
+    Значение разреза — сумма ``count`` по всем шардам ключа: изменения пишутся
+    в случайный шард, чтобы параллельные транзакции по одному ключу не ждали
+    блокировку одной строки. Отдельный шард может уходить в минус.
+    """
+
+    __tablename__ = "task_counters"
+
+    dimension = Column(String(16), primary_key=True)
+    key = Column(String(36), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<TaskCounter {self.dimension}:{self.key}#{self.shard}={self.count}>"
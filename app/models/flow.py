@@ -0,0 +1,38 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, String
+
+from app.db.base import Base
+
+
+class TaskFlowWeek(Base):
+    """Недельные суммы показателей потока задач в разрезе темы и исполнителя.
+
+    Строки пополняются инкрементально по истории статусов после водяного
+    знака (``AnalyticsWatermark``); средние считаются при чтении из сумм.
+    Пустая строка в ключе — задача без темы или исполнителя.
+    """
+
+    __tablename__ = "task_flow_weekly"
+
+    week = Column(Date, primary_key=True)
+    theme_key = Column(String(36), primary_key=True)
+    assignee_key = Column(String(36), primary_key=True)
+    completed = Column(BigInteger, default=0, nullable=False)
+    lead_seconds = Column(Float, default=0, nullable=False)
+    cycle_count = Column(BigInteger, default=0, nullable=False)
+    cycle_seconds = Column(Float, default=0, nullable=False)
+    blocked_seconds = Column(Float, default=0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<TaskFlowWeek {self.week} {self.theme_key}/{self.assignee_key}>"
+
+
+class AnalyticsWatermark(Base):
+    """До какого момента инкрементальный агрегат уже обработал исходные данные."""
+
+    __tablename__ = "analytics_watermarks"
+
+    name = Column(String(32), primary_key=True)
+    processed_until = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<AnalyticsWatermark {self.name}={self.processed_until}>"
@@ -1,7 +1,7 @@
 ﻿import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Index, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, text
 
 from app.db.base import Base
 from app.db.types import GUID
@@ -11,14 +11,32 @@ class TaskStatusHistory(Base):
     """Модель истории изменения статуса задачи."""
 
     __tablename__ = "task_status_history"
-    __table_args__ = (Index("idx_history_task_id", "task_id"),)
+    __table_args__ = (
+        # Страницы истории задачи и ленты от новых записей к старым.
+        Index(
+            "idx_history_task_id_changed_at", "task_id", text("changed_at DESC"), text("id DESC")
+        ),
+        Index(
+            "idx_history_changed_by_changed_at",
+            "changed_by",
+            text("changed_at DESC"),
+            text("id DESC"),
+        ),
+        # Лента без фильтров и переходы после водяного знака для показателей потока.
+        # На PostgreSQL таблица секционирована по месяцам changed_at (миграция 009),
+        # и этот индекс у каждой секции свой; закрытым месяцам к нему добавляется
+        # BRIN по changed_at (app/repositories/partitions.py).
+        Index("idx_history_changed_at_id", text("changed_at DESC"), text("id DESC")),
+    )
 
+    # changed_at входит в ключ: уникальность секционированной таблицы
+    # проверяется только вместе с ключом секционирования.
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     task_id = Column(GUID(), ForeignKey("tasks.id"), nullable=False)
     from_status = Column(String(20), nullable=False)
     to_status = Column(String(20), nullable=False)
     changed_by = Column(GUID(), ForeignKey("users.id"), nullable=False)
-    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    changed_at = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
 
     def __repr__(self) -> str:
         return f"<TaskStatusHistory {self.task_id}>"
@@ -1,7 +1,18 @@
 ﻿import uuid
 from datetime import datetime
 
-from sqlalchemy import CheckConstraint, Column, Date, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy import (
+    DDL,
+    CheckConstraint,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+)
 
 from app.db.base import Base
 from app.db.types import GUID
@@ -19,6 +30,13 @@ class Task(Base):
         Index("idx_tasks_theme_id", "theme_id"),
         Index("idx_tasks_due_date", "due_date"),
         Index("idx_tasks_status_assignee_id", "status", "assignee_id"),
+        # Покрывающий индекс для подсчета просроченных задач в сводке.
+        Index("idx_tasks_due_date_status", "due_date", "status"),
+        # Составные индексы для курсорной пагинации: поле сортировки + id.
+        Index("idx_tasks_created_at_id", "created_at", "id"),
+        Index("idx_tasks_due_date_id", "due_date", "id"),
+        Index("idx_tasks_priority_id", "priority", "id"),
+        Index("idx_tasks_status_id", "status", "id"),
     )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
@@ -32,6 +50,62 @@ class Task(Base):
     due_date = Column(Date, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Номер версии для оптимистичных блокировок (ETag/If-Match); растет при каждом изменении.
+    version = Column(Integer, default=1, server_default="1", nullable=False)
 
     def __repr__(self) -> str:
         return f"<Task {self.title}>"
+
+
+# Конфигурация полнотекстового поиска PostgreSQL; без стемминга, чтобы
+# одинаково работать с русскими и английскими названиями.
+SEARCH_TS_CONFIG = "simple"
+
+# Поисковые структуры не входят в ORM-модель: в PostgreSQL это generated-колонка
+# search_vector с GIN-индексом и trigram-индексы, в SQLite — таблица FTS5 с
+# триггерами. Для боевой БД те же объекты создает миграция 003.
+_POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(description, '')), 'B')"
+    f") STORED",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_search_vector ON tasks USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_description_trgm "
+    "ON tasks USING gin (description gin_trgm_ops)",
+]
+
+# Неявный rowid таблицы tasks с ключом GUID не постоянен (VACUUM может его
+# перенумеровать), поэтому строки FTS5 ключуются постоянным INTEGER PRIMARY KEY
+# из tasks_fts_ids; уникальный индекс по task_id ведет от задачи к строке FTS5
+# без просмотра всей таблицы FTS5.
+_SQLITE_FTS_ROWID = "(SELECT fts_rowid FROM tasks_fts_ids WHERE task_id = {}.id)"
+_SQLITE_SEARCH_DDL = [
+    "CREATE TABLE IF NOT EXISTS tasks_fts_ids ("
+    "fts_rowid INTEGER PRIMARY KEY, task_id CHAR(36) NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts_ids(task_id) VALUES (new.id); "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    f"VALUES ({_SQLITE_FTS_ROWID.format('new')}, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    f"DELETE FROM tasks_fts WHERE rowid = {_SQLITE_FTS_ROWID.format('old')}; "
+    "DELETE FROM tasks_fts_ids WHERE task_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN "
+    "UPDATE tasks_fts SET title = new.title, description = new.description "
+    f"WHERE rowid = {_SQLITE_FTS_ROWID.format('old')}; END",
+]
+
+for _statement in _POSTGRESQL_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in _SQLITE_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _table in ("tasks_fts", "tasks_fts_ids"):
+    event.listen(
+        Task.__table__,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {_table}").execute_if(dialect="sqlite"),
+    )
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+
+from app.db.base import Base
+from app.db.types import GUID
+
+
+class UserTokenVersion(Base):
+    """Версия токенов пользователя; токены с меньшей версией отозваны.
+
+    Строка появляется только после первого отзыва, отсутствие строки — версия 0.
+    """
+
+    __tablename__ = "user_token_versions"
+
+    user_id = Column(GUID(), ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UserTokenVersion {self.user_id}:{self.version}>"
@@ -0,0 +1,187 @@
+"""Агрегаты сводной аналитики, которые считает база."""
+
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Row, case, func, literal, null, select, tuple_, type_coerce, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.types import GUID
+from app.models.counter import TaskCounter
+from app.models.task import Task
+from app.repositories.task_counters import (
+    DIMENSION_ASSIGNEE,
+    DIMENSION_STATUS,
+    DIMENSION_THEME,
+)
+
+# Статусы, в которых задача не считается просроченной.
+CLOSED_STATUSES = ("done", "canceled")
+
+DIMENSION_TOTAL = "total"
+
+# Разрез счетчиков → ключ сводки.
+_SUMMARY_KEYS = {
+    DIMENSION_STATUS: "counts_by_status",
+    DIMENSION_THEME: "counts_by_theme",
+    DIMENSION_ASSIGNEE: "counts_by_assignee",
+}
+
+
+class AnalyticsRepository:
+    """Репозиторий агрегатов по задачам."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def dialect_name(self) -> str:
+        return self.db.bind.dialect.name
+
+    @staticmethod
+    def build_filters(
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+        theme_id: Optional[UUID] = None,
+        assignee_id: Optional[UUID] = None,
+    ) -> list:
+        """Условия WHERE для фильтров сводки; ``created_to`` включает весь день."""
+        filters = []
+        if created_from:
+            filters.append(Task.created_at >= datetime.combine(created_from, time.min))
+        if created_to:
+            filters.append(Task.created_at < datetime.combine(created_to + timedelta(days=1), time.min))
+        if theme_id:
+            filters.append(Task.theme_id == theme_id)
+        if assignee_id:
+            filters.append(Task.assignee_id == assignee_id)
+        return filters
+
+    async def summary(self, today: date, **filters) -> dict:
+        """Посчитать задачи по статусам, темам, исполнителям и просроченные.
+
+        Все четыре агрегата возвращает один запрос: в PostgreSQL — GROUP BY
+        GROUPING SETS за один проход по таблице, в остальных базах —
+        UNION ALL сгруппированных запросов. Задачи без темы или исполнителя
+        в соответствующие разрезы не попадают.
+        """
+        conditions = self.build_filters(**filters)
+        overdue = func.count().filter(
+            Task.due_date < today, Task.status.notin_(CLOSED_STATUSES)
+        )
+        if self.dialect_name == "postgresql":
+            statement = self._grouping_sets(conditions, overdue)
+        else:
+            statement = self._union(conditions, overdue)
+
+        summary = {
+            "counts_by_status": {},
+            "counts_by_theme": {},
+            "counts_by_assignee": {},
+            "overdue_count": 0,
+        }
+        for dimension, status, theme_id, assignee_id, total, overdue_count in (
+            await self.db.execute(statement)
+        ):
+            if dimension == DIMENSION_STATUS:
+                summary["counts_by_status"][status] = total
+            elif dimension == DIMENSION_THEME and theme_id is not None:
+                summary["counts_by_theme"][str(theme_id)] = total
+            elif dimension == DIMENSION_ASSIGNEE and assignee_id is not None:
+                summary["counts_by_assignee"][str(assignee_id)] = total
+            elif dimension == DIMENSION_TOTAL:
+                summary["overdue_count"] = overdue_count or 0
+        return summary
+
+    async def summary_from_counters(self, today: date) -> dict:
+        """Сводка без фильтров по таблице task_counters.
+
+        Разрезы — суммы шардов счетчиков, просроченные задачи считаются
+        по индексу due_date; оба запроса уходят одним UNION ALL.
+        """
+        total = func.sum(TaskCounter.count)
+        statement = union_all(
+            select(TaskCounter.dimension, TaskCounter.key, total)
+            .group_by(TaskCounter.dimension, TaskCounter.key)
+            .having(total != 0),
+            select(literal(DIMENSION_TOTAL), type_coerce(null(), TaskCounter.key.type), func.count())
+            .where(Task.due_date < today, Task.status.notin_(CLOSED_STATUSES)),
+        )
+
+        summary = {key: {} for key in _SUMMARY_KEYS.values()}
+        summary["overdue_count"] = 0
+        for dimension, key, count in await self.db.execute(statement):
+            if dimension == DIMENSION_TOTAL:
+                summary["overdue_count"] = int(count)
+            elif dimension in _SUMMARY_KEYS:
+                summary[_SUMMARY_KEYS[dimension]][key] = int(count)
+        return summary
+
+    async def counts_by(self, column) -> dict:
+        """Число задач по значениям колонки (без NULL)."""
+        result = await self.db.execute(
+            select(column, func.count()).where(column.is_not(None)).group_by(column)
+        )
+        return {value: count for value, count in result}
+
+    async def stream_columns(
+        self,
+        columns: Sequence,
+        chunk_size: int = 10_000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Отдавать выбранные колонки всех задач пачками через серверный курсор."""
+        query = select(*columns).execution_options(yield_per=chunk_size)
+        result = await self.db.stream(query)
+        try:
+            async for partition in result.partitions():
+                yield partition
+        finally:
+            await result.close()
+
+    @staticmethod
+    def _grouping_sets(conditions: list, overdue):
+        dimension = case(
+            (func.grouping(Task.status) == 0, DIMENSION_STATUS),
+            (func.grouping(Task.theme_id) == 0, DIMENSION_THEME),
+            (func.grouping(Task.assignee_id) == 0, DIMENSION_ASSIGNEE),
+            else_=DIMENSION_TOTAL,
+        )
+        return (
+            select(dimension, Task.status, Task.theme_id, Task.assignee_id, func.count(), overdue)
+            .where(*conditions)
+            .group_by(
+                func.grouping_sets(
+                    tuple_(Task.status),
+                    tuple_(Task.theme_id),
+                    tuple_(Task.assignee_id),
+                    tuple_(),
+                )
+            )
+        )
+
+    @staticmethod
+    def _union(conditions: list, overdue):
+        no_status = type_coerce(null(), Task.status.type)
+        no_guid = type_coerce(null(), GUID())
+        no_overdue = literal(0)
+        return union_all(
+            select(
+                literal(DIMENSION_STATUS), Task.status, no_guid, no_guid, func.count(), no_overdue
+            )
+            .where(*conditions)
+            .group_by(Task.status),
+            select(
+                literal(DIMENSION_THEME), no_status, Task.theme_id, no_guid, func.count(), no_overdue
+            )
+            .where(*conditions, Task.theme_id.is_not(None))
+            .group_by(Task.theme_id),
+            select(
+                literal(DIMENSION_ASSIGNEE), no_status, no_guid, Task.assignee_id, func.count(), no_overdue
+            )
+            .where(*conditions, Task.assignee_id.is_not(None))
+            .group_by(Task.assignee_id),
+            select(
+                literal(DIMENSION_TOTAL), no_status, no_guid, no_guid, func.count(), overdue
+            ).where(*conditions),
+        )
@@ -0,0 +1,180 @@
+"""Кэш сущностей по первичному ключу для get_by_id репозиториев.
+
+В кэше хранятся не ORM-объекты, а снимки значений колонок: при попадании
+снимок превращается в detached-объект и добавляется в текущую сессию без
+запроса к базе. Записи сбрасываются при flush измененных и удаленных
+объектов и повторно после commit или rollback; массовые UPDATE помечаются явно через
+``EntityCache.mark``.
+
+Сброс действует только в памяти процесса, поэтому кэш по умолчанию
+выключен (``ENTITY_CACHE_ENABLED``): с несколькими процессами без общего
+хранилища и общей рассылки сбросов другие процессы отдавали бы старые данные
+до истечения TTL.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Hashable, Iterable, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.models.task import Task
+from app.models.theme import Theme
+from app.models.user import User
+
+_PENDING_KEY = "entity_cache_pending"
+# Число счетчиков сбросов. Ключи делят счетчики по хэшу: совпадение лишь
+# изредка отменяет сохранение снимка, а память не растет с числом сущностей.
+_GENERATION_SLOTS = 4096
+
+
+class CacheBackend(ABC):
+    """Интерфейс хранилища кэша (in-process, Redis, memcached и т.п.).
+
+    Значения — словари простых типов, их можно сериализовать pickle.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Вернуть значение или None, если ключа нет или он устарел."""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: dict) -> None:
+        """Сохранить значение."""
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Удалить значение."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Очистить хранилище."""
+
+
+class LRUCacheBackend(LRUCache, CacheBackend):
+    """Хранилище в памяти процесса: LRU с ограничением размера и TTL."""
+
+
+class EntityCache:
+    """Кэш сущностей поверх выбранного хранилища со счетчиками попаданий."""
+
+    def __init__(self, backend: CacheBackend, models: Iterable[type], enabled: bool = True):
+        self.backend = backend
+        self.models = frozenset(models)
+        self.enabled = enabled
+        self._generations = [0] * _GENERATION_SLOTS
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(model: type, entity_id: Any) -> tuple[str, str]:
+        return model.__tablename__, str(entity_id)
+
+    def generation(self, model: type, entity_id: Any) -> int:
+        """Счетчик сбросов ключа; снимается до чтения из базы и передается в ``put``."""
+        return self._generations[hash(self.key(model, entity_id)) % _GENERATION_SLOTS]
+
+    async def get(self, db: AsyncSession, model: type, entity_id: Any) -> Optional[Any]:
+        """Вернуть сущность из сессии или кэша; None — нужно идти в базу."""
+        if not self.enabled:
+            return None
+
+        # Объект, уже загруженный в сессию, важнее снимка: в нем могут быть
+        # еще не зафиксированные изменения.
+        existing = db.identity_map.get(identity_key(model, entity_id))
+        if existing is not None and not inspect(existing).expired_attributes:
+            self.hits += 1
+            return existing
+
+        values = self.backend.get(self.key(model, entity_id))
+        if values is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entity = model(**values)
+        make_transient_to_detached(entity)
+        db.add(entity)
+        return entity
+
+    def put(self, db: AsyncSession, entity: Any, generation: int) -> None:
+        """Сохранить снимок колонок загруженной сущности.
+
+        ``generation`` — значение ``generation()`` до чтения. Если ключ с тех
+        пор сбрасывали, снимок мог быть прочитан до коммита конкурентной
+        записи, чей сброс уже прошел, и не кэшируется. Сущности, измененные
+        в текущей транзакции, тоже не кэшируются: их состояние еще не
+        зафиксировано.
+        """
+        if not self.enabled or entity is None:
+            return
+        model = type(entity)
+        entity_id = inspect(model).primary_key_from_instance(entity)[0]
+        if self.generation(model, entity_id) != generation:
+            return
+        if (model, entity_id) in db.sync_session.info.get(_PENDING_KEY, ()):
+            return
+        values = {attr.key: getattr(entity, attr.key) for attr in inspect(model).column_attrs}
+        self.backend.set(self.key(model, entity_id), values)
+
+    def invalidate(self, model: type, entity_id: Any) -> None:
+        key = self.key(model, entity_id)
+        self.invalidations += 1
+        self._generations[hash(key) % _GENERATION_SLOTS] += 1
+        self.backend.delete(key)
+
+    def mark(self, db: AsyncSession | Session, model: type, entity_ids: Iterable[Any]) -> None:
+        """Сбросить записи сейчас и еще раз в конце текущей транзакции.
+
+        Нужен для изменений в обход ORM (массовый UPDATE): повторный сброс
+        убирает снимок, который конкурентный запрос мог положить до commit.
+        """
+        session = db.sync_session if isinstance(db, AsyncSession) else db
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        for entity_id in entity_ids:
+            self.invalidate(model, entity_id)
+            pending.add((model, entity_id))
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+entity_cache = EntityCache(
+    LRUCacheBackend(maxsize=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_TTL),
+    models=(Task, Theme, User),
+    enabled=settings.ENTITY_CACHE_ENABLED,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session: Session, flush_context) -> None:
+    changed = [
+        instance
+        for instance in (*session.dirty, *session.deleted)
+        if type(instance) in entity_cache.models
+    ]
+    for instance in changed:
+        entity_id = inspect(instance).identity
+        if entity_id is not None:
+            entity_cache.mark(session, type(instance), [entity_id[0]])
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_pending(session: Session) -> None:
+    for model, entity_id in session.info.pop(_PENDING_KEY, ()):
+        entity_cache.invalidate(model, entity_id)
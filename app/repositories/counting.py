@@ -0,0 +1,173 @@
+"""Стратегии подсчета общего числа строк для списочных запросов."""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable, Select
+
+from app.core.config import settings
+
+COUNT_EXACT = "exact"
+COUNT_WINDOW = "window"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+
+ALLOWED_COUNT_MODES = {COUNT_EXACT, COUNT_WINDOW, COUNT_ESTIMATE, COUNT_NONE}
+
+_TOTAL_LABEL = "_total_count"
+
+# Сколько запросов сразу держат второе соединение для параллельного подсчета.
+# Запрос, которому слота не хватило, не ждет его, удерживая свое соединение,
+# а считает в своей сессии: иначе под нагрузкой пул исчерпывается.
+_concurrent_counts = asyncio.Semaphore(max(settings.COUNT_CONCURRENT_LIMIT, 1))
+
+
+class Explain(Executable, ClauseElement):
+    """Обертка EXPLAIN для получения оценки планировщика."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class CountEngine:
+    """Выполнить страницу запроса и посчитать total выбранным способом.
+
+    Режимы:
+    - ``exact`` — ``SELECT count(*)`` по отфильтрованному подзапросу;
+    - ``window`` — ``count(*) OVER ()`` вместе со страницей, без отдельного запроса;
+    - ``estimate`` — оценка планировщика PostgreSQL (``pg_class.reltuples``
+      без фильтров, ``EXPLAIN`` с фильтрами); небольшие оценки пересчитываются
+      точно, на других СУБД используется ``exact``;
+    - ``none`` — total не считается.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        mode: Optional[str] = None,
+        estimate_threshold: Optional[int] = None,
+        concurrent: Optional[bool] = None,
+    ):
+        self.db = db
+        self.mode = mode if mode in ALLOWED_COUNT_MODES else settings.LIST_COUNT_MODE
+        self.estimate_threshold = (
+            estimate_threshold
+            if estimate_threshold is not None
+            else settings.COUNT_ESTIMATE_THRESHOLD
+        )
+        self.concurrent = settings.COUNT_CONCURRENT if concurrent is None else concurrent
+
+    @property
+    def dialect_name(self) -> str:
+        return self.db.bind.dialect.name
+
+    async def paginate(
+        self,
+        query: Select,
+        page_query: Select,
+        filtered: bool = True,
+    ) -> tuple[list[Any], Optional[int]]:
+        """Вернуть строки страницы и total.
+
+        ``query`` — отфильтрованный запрос без сортировки и лимитов,
+        ``page_query`` — тот же запрос с сортировкой, limit и offset.
+        """
+        if self.mode == COUNT_NONE:
+            return await self._fetch(page_query), None
+
+        if self.mode == COUNT_WINDOW:
+            return await self._fetch_with_window(query, page_query)
+
+        if self.concurrent and self._supports_concurrency() and not _concurrent_counts.locked():
+            # Отдельная сессия берет свое соединение из пула, поэтому
+            # подсчет и выборка страницы идут параллельно, но по разным снимкам.
+            async with _concurrent_counts, AsyncSession(self.db.bind) as count_session:
+                items, total = await asyncio.gather(
+                    self._fetch(page_query),
+                    self._count(count_session, query, filtered),
+                )
+            return items, total
+
+        items = await self._fetch(page_query)
+        total = await self._count(self.db, query, filtered)
+        return items, total
+
+    def _supports_concurrency(self) -> bool:
+        # SQLite работает через одно соединение (в тестах — StaticPool).
+        return self.dialect_name != "sqlite"
+
+    async def _fetch(self, page_query: Select) -> list[Any]:
+        result = await self.db.execute(page_query)
+        if len(page_query.column_descriptions) == 1:
+            return result.scalars().all()
+        return result.all()
+
+    async def _fetch_with_window(
+        self,
+        query: Select,
+        page_query: Select,
+    ) -> tuple[list[Any], Optional[int]]:
+        width = len(page_query.column_descriptions)
+        result = await self.db.execute(
+            page_query.add_columns(func.count().over().label(_TOTAL_LABEL))
+        )
+        rows = result.all()
+        if not rows:
+            # За пределами выборки оконная функция ничего не вернет.
+            return [], await count_exact(self.db, query)
+
+        total = rows[0][-1]
+        if width == 1:
+            return [row[0] for row in rows], total
+        # Строки отдаются целиком: поля доступны по именам, лишняя колонка
+        # с total не мешает.
+        return rows, total
+
+    async def _count(self, db: AsyncSession, query: Select, filtered: bool) -> int:
+        if self.mode == COUNT_ESTIMATE and self.dialect_name == "postgresql":
+            estimate = await count_estimate(db, query, filtered)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return await count_exact(db, query)
+
+
+async def count_exact(db: AsyncSession, query: Select) -> int:
+    """Точный ``SELECT count(*)`` по отфильтрованному запросу."""
+    subquery = query.order_by(None).limit(None).offset(None).subquery()
+    result = await db.execute(select(func.count()).select_from(subquery))
+    return result.scalar_one()
+
+
+async def count_estimate(db: AsyncSession, query: Select, filtered: bool) -> Optional[int]:
+    """Оценка числа строк по статистике PostgreSQL."""
+    if not filtered:
+        froms = query.get_final_froms()
+        if len(froms) == 1 and getattr(froms[0], "name", None):
+            result = await db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+                {"name": froms[0].name},
+            )
+            reltuples = result.scalar_one_or_none()
+            # -1 означает, что таблица еще ни разу не анализировалась.
+            if reltuples is not None and reltuples >= 0:
+                return int(reltuples)
+
+    result = await db.execute(Explain(query.order_by(None).limit(None).offset(None)))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,28 @@
+"""Диалектные конструкции SQL, общие для репозиториев."""
+
+from sqlalchemy import Date, cast, func, type_coerce
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def upsert_insert(db: AsyncSession, target):
+    """INSERT с поддержкой ON CONFLICT для СУБД текущей сессии (PostgreSQL, SQLite)."""
+    if db.bind.dialect.name == "postgresql":
+        return pg_insert(target)
+    return sqlite_insert(target)
+
+
+def seconds_between(db: AsyncSession, end, start):
+    """Разница двух меток времени в секундах (NULL, если одной из них нет)."""
+    if db.bind.dialect.name == "postgresql":
+        return func.extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400.0
+
+
+def week_start(db: AsyncSession, moment):
+    """Понедельник недели, на которую приходится ``moment``."""
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.date_trunc("week", moment), Date)
+    # 'weekday 0' — ближайшее воскресенье не раньше даты; минус шесть дней — понедельник.
+    return type_coerce(func.date(moment, "weekday 0", "-6 days"), Date)
@@ -0,0 +1,234 @@
+"""Показатели потока задач по истории статусов.
+
+Время от создания до done (lead time), от первого перехода в работу до done
+(cycle time), время в блокировке и недельная пропускная способность
+считаются оконными функциями над task_status_history: LAG дает начало
+интервала, накопительный MIN — первый переход в in_progress. Результат —
+недельные суммы в разрезе темы и исполнителя; средние получаются делением
+сумм при чтении, поэтому суммы можно пополнять по частям.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, case, cast, delete, func, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import Select
+
+from app.models.flow import AnalyticsWatermark, TaskFlowWeek
+from app.models.history import TaskStatusHistory
+from app.models.task import Task
+from app.repositories.analytics import DIMENSION_TOTAL
+from app.repositories.dialects import seconds_between, upsert_insert, week_start
+from app.repositories.task_counters import DIMENSION_ASSIGNEE, DIMENSION_THEME
+
+FLOW_WATERMARK = "task_flow"
+# Начало отсчета, пока история не обрабатывалась.
+EPOCH = datetime(1970, 1, 1)
+
+_SUM_COLUMNS = ("completed", "lead_seconds", "cycle_count", "cycle_seconds", "blocked_seconds")
+_GROUP_KEYS = {DIMENSION_THEME: "by_theme", DIMENSION_ASSIGNEE: "by_assignee"}
+
+
+def _empty_stats() -> dict:
+    return {name: 0 for name in _SUM_COLUMNS} | {"throughput": {}}
+
+
+def _hours(seconds: float, count: int) -> Optional[float]:
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def _finish(stats: dict) -> dict:
+    return {
+        "completed": stats["completed"],
+        "lead_time_hours": _hours(stats["lead_seconds"], stats["completed"]),
+        "cycle_time_hours": _hours(stats["cycle_seconds"], stats["cycle_count"]),
+        "blocked_hours": round(stats["blocked_seconds"] / 3600, 2),
+        "throughput": dict(sorted(stats["throughput"].items())),
+    }
+
+
+class FlowRepository:
+    """Репозиторий показателей потока задач."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def weekly_events(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Select:
+        """Недельные суммы по переходам с ``changed_at`` в (since, until].
+
+        Завершение засчитывается неделе перехода в done, блокировка — неделе
+        выхода из blocked. Окна считаются по всей истории затронутых задач,
+        поэтому интервал, начатый до ``since``, учитывается при закрытии.
+        Тема и исполнитель берутся текущие.
+        """
+        h = TaskStatusHistory
+        scope = []
+        if until is not None:
+            scope.append(h.changed_at <= until)
+        if since is not None:
+            touched = aliased(TaskStatusHistory)
+            scope.append(
+                h.task_id.in_(
+                    select(touched.task_id).where(
+                        touched.changed_at > since,
+                        *([touched.changed_at <= until] if until is not None else []),
+                    )
+                )
+            )
+        order = (h.changed_at, h.id)
+        steps = (
+            select(
+                h.task_id,
+                h.from_status,
+                h.to_status,
+                h.changed_at,
+                func.lag(h.changed_at)
+                .over(partition_by=h.task_id, order_by=order)
+                .label("previous_at"),
+                func.min(case((h.to_status == "in_progress", h.changed_at)))
+                .over(partition_by=h.task_id, order_by=order, rows=(None, 0))
+                .label("started_at"),
+            )
+            .where(*scope)
+            .subquery("steps")
+        )
+
+        done = steps.c.to_status == "done"
+        unblocked = steps.c.from_status == "blocked"
+
+        def since_step(moment):
+            return seconds_between(self.db, steps.c.changed_at, moment)
+
+        rows = (
+            select(
+                week_start(self.db, steps.c.changed_at).label("week"),
+                func.coalesce(cast(Task.theme_id, String), "").label("theme_key"),
+                func.coalesce(cast(Task.assignee_id, String), "").label("assignee_key"),
+                case((done, since_step(Task.created_at))).label("lead"),
+                case((done, since_step(steps.c.started_at))).label("cycle"),
+                case((unblocked, since_step(steps.c.previous_at))).label("blocked"),
+            )
+            .join_from(steps, Task, Task.id == steps.c.task_id)
+            .where(done | unblocked, *([steps.c.changed_at > since] if since is not None else []))
+            .subquery("flow_rows")
+        )
+        return (
+            select(
+                rows.c.week,
+                rows.c.theme_key,
+                rows.c.assignee_key,
+                func.count(rows.c.lead).label("completed"),
+                func.coalesce(func.sum(rows.c.lead), 0.0).label("lead_seconds"),
+                func.count(rows.c.cycle).label("cycle_count"),
+                func.coalesce(func.sum(rows.c.cycle), 0.0).label("cycle_seconds"),
+                func.coalesce(func.sum(rows.c.blocked), 0.0).label("blocked_seconds"),
+            )
+            # WHERE обязателен: без него SQLite путает ON CONFLICT при пополнении.
+            .where(true())
+            .group_by(rows.c.week, rows.c.theme_key, rows.c.assignee_key)
+        )
+
+    async def metrics(self) -> dict:
+        """Показатели, посчитанные по всей истории в момент запроса."""
+        return await self._rollup(self.weekly_events().cte("flow_weeks"))
+
+    async def metrics_from_aggregates(self) -> dict:
+        """Показатели по накопленным недельным суммам task_flow_weekly."""
+        return await self._rollup(TaskFlowWeek.__table__)
+
+    async def refresh(self, until: datetime) -> datetime:
+        """Добавить к недельным суммам переходы после водяного знака до ``until``.
+
+        Строка знака блокируется FOR UPDATE: параллельное пополнение ждет
+        коммита и затем видит уже сдвинутый знак. Коммит — за вызывающим.
+        Возвращает новый водяной знак.
+        """
+        since = await self.db.scalar(
+            select(AnalyticsWatermark.processed_until)
+            .where(AnalyticsWatermark.name == FLOW_WATERMARK)
+            .with_for_update()
+        )
+        since = since or EPOCH
+        if since >= until:
+            return since
+
+        table = TaskFlowWeek.__table__
+        statement = upsert_insert(self.db, TaskFlowWeek).from_select(
+            ["week", "theme_key", "assignee_key", *_SUM_COLUMNS],
+            self.weekly_events(since, until),
+        )
+        await self.db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[table.c.week, table.c.theme_key, table.c.assignee_key],
+                set_={name: table.c[name] + statement.excluded[name] for name in _SUM_COLUMNS},
+            )
+        )
+        await self._set_watermark(until)
+        return until
+
+    async def rebuild(self, until: datetime) -> datetime:
+        """Пересчитать недельные суммы с нуля (после удаления задач или смены тем)."""
+        await self.db.execute(delete(TaskFlowWeek))
+        await self._set_watermark(EPOCH)
+        return await self.refresh(until)
+
+    async def _set_watermark(self, moment: datetime) -> None:
+        statement = upsert_insert(self.db, AnalyticsWatermark).values(
+            name=FLOW_WATERMARK, processed_until=moment
+        )
+        await self.db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[AnalyticsWatermark.name],
+                set_={"processed_until": statement.excluded.processed_until},
+            )
+        )
+
+    async def _rollup(self, source) -> dict:
+        """Свести недельные суммы по всем задачам, темам и исполнителям."""
+        # На PostgreSQL sum(bigint) и сумма extract(epoch ...) — numeric, то есть
+        # Decimal в Python; приводим к типам колонок task_flow_weekly.
+        sums = [
+            cast(func.sum(source.c[name]), TaskFlowWeek.__table__.c[name].type)
+            for name in _SUM_COLUMNS
+        ]
+
+        def dimension(name: str):
+            # Явный CAST: в UNION PostgreSQL приводит нетипизированные параметры к text.
+            return cast(literal(name), String)
+
+        statement = union_all(
+            select(dimension(DIMENSION_TOTAL), dimension(""), source.c.week, *sums)
+            .group_by(source.c.week),
+            select(dimension(DIMENSION_THEME), source.c.theme_key, source.c.week, *sums)
+            .where(source.c.theme_key != "")
+            .group_by(source.c.theme_key, source.c.week),
+            select(dimension(DIMENSION_ASSIGNEE), source.c.assignee_key, source.c.week, *sums)
+            .where(source.c.assignee_key != "")
+            .group_by(source.c.assignee_key, source.c.week),
+        )
+
+        overall = _empty_stats()
+        groups: dict[str, dict[str, dict]] = {name: {} for name in _GROUP_KEYS.values()}
+        for group, key, week, *values in await self.db.execute(statement):
+            if group == DIMENSION_TOTAL:
+                stats = overall
+            else:
+                stats = groups[_GROUP_KEYS[group]].setdefault(key, _empty_stats())
+            for name, value in zip(_SUM_COLUMNS, values):
+                stats[name] += value or 0
+            if values[0]:
+                stats["throughput"][week.isoformat()] = int(values[0])
+
+        return {
+            "overall": _finish(overall),
+            **{
+                name: {key: _finish(stats) for key, stats in members.items()}
+                for name, members in groups.items()
+            },
+        }
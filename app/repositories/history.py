@@ -1,9 +1,50 @@
-﻿from uuid import UUID
+﻿import uuid
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import DateTime, String, insert, literal, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import Insert
 
+from app.db.types import GUID
 from app.models.history import TaskStatusHistory
+from app.repositories.pagination import (
+    DIRECTION_NEXT,
+    Cursor,
+    Page,
+    decode_cursor,
+    encode_cursor,
+    order_clauses,
+    seek_predicate,
+)
+
+# История всегда отдается от новых записей к старым.
+_HISTORY_SORT = ("changed_at", "desc")
+
+
+def history_insert_from(
+    source,
+    to_status: str,
+    changed_by: UUID,
+    changed_at: datetime,
+) -> Insert:
+    """INSERT ... SELECT записи истории для строк ``source`` (колонки id и status).
+
+    Прежний статус берется из той же выборки, что и изменяемая строка, поэтому
+    запись истории и UPDATE согласованы без отдельного чтения.
+    """
+    return insert(TaskStatusHistory).from_select(
+        ["id", "task_id", "from_status", "to_status", "changed_by", "changed_at"],
+        select(
+            literal(uuid.uuid4(), GUID()),
+            source.c.id,
+            source.c.status,
+            literal(to_status, String()),
+            literal(changed_by, GUID()),
+            literal(changed_at, DateTime()),
+        ),
+    )
 
 
 class HistoryRepository:
@@ -35,11 +76,95 @@ class HistoryRepository:
             await self.db.flush()
         return history
 
-    async def get_by_task_id(self, task_id: UUID) -> list[TaskStatusHistory]:
-        """Получить историю изменений по задаче."""
+    async def create_many(
+        self,
+        task_changes: list[tuple[UUID, str]],
+        to_status: str,
+        changed_by: UUID,
+        chunk_size: int = 1000,
+    ) -> None:
+        """Записать историю для пачки задач многострочным INSERT без коммита."""
+        changed_at = datetime.utcnow()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "task_id": task_id,
+                "from_status": from_status,
+                "to_status": to_status,
+                "changed_by": changed_by,
+                "changed_at": changed_at,
+            }
+            for task_id, from_status in task_changes
+        ]
+        for start in range(0, len(rows), chunk_size):
+            await self.db.execute(insert(TaskStatusHistory).values(rows[start:start + chunk_size]))
+
+    async def get_by_task_id(
+        self,
+        task_id: UUID,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Страница истории задачи по индексу (task_id, changed_at DESC, id DESC)."""
+        return await self._page(
+            [TaskStatusHistory.task_id == task_id], since, until, limit, cursor
+        )
+
+    async def feed(
+        self,
+        changed_by: Optional[UUID] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Страница истории всех задач; с ``changed_by`` — по индексу автора изменений."""
+        conditions = [] if changed_by is None else [TaskStatusHistory.changed_by == changed_by]
+        return await self._page(conditions, since, until, limit, cursor)
+
+    async def _page(
+        self,
+        conditions: list,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        limit: int,
+        cursor: Optional[str],
+    ) -> Page:
+        """Записи в окне [since, until) от новых к старым, без total.
+
+        Следующая страница выбирается seek-условием по (changed_at, id) от
+        курсора, поэтому глубина страницы не влияет на стоимость запроса.
+        """
+        changed_at = TaskStatusHistory.__table__.c.changed_at
+        id_column = TaskStatusHistory.__table__.c.id
+        conditions = list(conditions)
+        if since is not None:
+            conditions.append(changed_at >= since)
+        if until is not None:
+            conditions.append(changed_at < until)
+        if cursor:
+            position = decode_cursor(cursor, changed_at)
+            if (position.sort, position.order) != _HISTORY_SORT or position.direction != DIRECTION_NEXT:
+                raise ValueError("Курсор не соответствует истории")
+            # Избыточное для seek условие отсекает более новые месячные секции на PostgreSQL.
+            conditions.append(changed_at <= position.value)
+            conditions.append(
+                seek_predicate(changed_at, id_column, position.value, position.id, descending=True)
+            )
+
         result = await self.db.execute(
             select(TaskStatusHistory)
-            .where(TaskStatusHistory.task_id == task_id)
-            .order_by(TaskStatusHistory.changed_at.desc())
+            .where(*conditions)
+            .order_by(*order_clauses(changed_at, id_column, True))
+            # Лишняя строка показывает, есть ли следующая страница.
+            .limit(limit + 1)
         )
-        return result.scalars().all()
+        items = list(result.scalars().all())
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(Cursor(*_HISTORY_SORT, last.changed_at, last.id))
+        return Page(items, None, next_cursor)
@@ -0,0 +1,133 @@
+"""Курсорная (keyset) пагинация по полю сортировки и id."""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, literal, or_, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+DIRECTION_NEXT = "next"
+DIRECTION_PREV = "prev"
+
+
+class Page(NamedTuple):
+    """Страница списка с total и курсорами соседних страниц."""
+
+    items: list[Any]
+    total: Optional[int]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class Cursor(NamedTuple):
+    """Позиция в упорядоченной выборке."""
+
+    sort: str
+    order: str
+    value: Any
+    id: UUID
+    direction: str = DIRECTION_NEXT
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(value: Any, python_type: type) -> Any:
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    """Упаковать курсор в непрозрачную строку."""
+    payload = {
+        "s": cursor.sort,
+        "o": cursor.order,
+        "v": _dump_value(cursor.value),
+        "id": str(cursor.id),
+        "d": cursor.direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, column: ColumnElement) -> Cursor:
+    """Распаковать курсор; при ошибке выбросить ValueError."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        direction = payload.get("d", DIRECTION_NEXT)
+        if direction not in (DIRECTION_NEXT, DIRECTION_PREV):
+            raise ValueError(direction)
+        return Cursor(
+            sort=payload["s"],
+            order=payload["o"],
+            value=_load_value(payload["v"], column.type.python_type),
+            id=UUID(payload["id"]),
+            direction=direction,
+        )
+    except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, ValueError, UnicodeError):
+        raise ValueError("Некорректный курсор")
+
+
+def seek_predicate(
+    column: ColumnElement,
+    id_column: ColumnElement,
+    value: Any,
+    row_id: UUID,
+    descending: bool,
+) -> ColumnElement:
+    """Условие «строго после (value, row_id)» в порядке сортировки.
+
+    NULL считается наибольшим значением: ASC NULLS LAST, DESC NULLS FIRST,
+    как в индексах PostgreSQL по умолчанию.
+    """
+    if not column.nullable:
+        # Сравнение кортежей совпадает с порядком составного индекса (column, id).
+        # tuple_ не переносит типы колонок на параметры, поэтому задаем их явно.
+        bound = tuple_(literal(value, column.type), literal(row_id, id_column.type))
+        if descending:
+            return tuple_(column, id_column) < bound
+        return tuple_(column, id_column) > bound
+
+    if descending:
+        if value is None:
+            return or_(and_(column.is_(None), id_column < row_id), column.is_not(None))
+        return or_(column < value, and_(column == value, id_column < row_id))
+
+    if value is None:
+        return and_(column.is_(None), id_column > row_id)
+    return or_(
+        column > value,
+        and_(column == value, id_column > row_id),
+        column.is_(None),
+    )
+
+
+def order_clauses(
+    column: ColumnElement,
+    id_column: ColumnElement,
+    descending: bool,
+) -> list[ColumnElement]:
+    """Сортировка по полю с id в качестве разрешения равенств."""
+    if descending:
+        clauses = [column.desc(), id_column.desc()]
+        if column.nullable:
+            clauses[0] = clauses[0].nulls_first()
+        return clauses
+
+    clauses = [column.asc(), id_column.asc()]
+    if column.nullable:
+        clauses[0] = clauses[0].nulls_last()
+    return clauses
@@ -0,0 +1,209 @@
+"""Месячные секции task_status_history на PostgreSQL.
+
+Таблица секционирована по диапазонам ``changed_at`` (миграция
+009_history_partitions), по секции на календарный месяц. Секции создаются
+заранее на ``HISTORY_PARTITIONS_AHEAD`` месяцев вперед: DEFAULT-секции нет,
+иначе планировщик не может читать секции по порядку времени. Индексы по
+task_id и changed_by общие для всех секций, а btree ``(changed_at DESC, id
+DESC)`` свой у каждой: по нему ленту без фильтров читают страницами. Закрытым
+месяцам дополнительно строится BRIN по ``changed_at`` для выборок по
+диапазону времени. В SQLite и в схеме из ``create_all`` таблица одна, и
+обслуживание ничего не делает.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.config import settings
+
+PARTITIONED_TABLE = "task_status_history"
+_NAME = re.compile(rf"^{PARTITIONED_TABLE}_y(\d{{4}})m(\d{{2}})$")
+# Ключ advisory-блокировки: обслуживание из нескольких процессов идет по очереди.
+_LOCK_KEY = 0x7461736B68  # "taskh"
+# ATTACH PARTITION ненадолго блокирует запись в tasks и users (проверка
+# внешних ключей секции); дольше ждать очереди за чужими транзакциями нельзя,
+# иначе за ATTACH выстроятся все пишущие. Не успели — повторим при следующем
+# обслуживании.
+_LOCK_TIMEOUT = "5s"
+
+
+def month_start(moment: datetime) -> date:
+    """Первое число месяца, на который приходится ``moment``."""
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """Первое число месяца через ``count`` месяцев от ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+class HistoryPartitionRepository:
+    """Создание и обслуживание месячных секций истории статусов."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def is_partitioned(self) -> bool:
+        if self.db.bind.dialect.name != "postgresql":
+            return False
+        return bool(
+            await self.db.scalar(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                    "WHERE partrelid = to_regclass(:table))"
+                ),
+                {"table": PARTITIONED_TABLE},
+            )
+        )
+
+    async def partitions(self) -> dict[date, set[str]]:
+        """Секции по месяцам и имена их готовых (valid) индексов."""
+        rows = await self.db.execute(
+            text(
+                "SELECT c.relname::text, coalesce("
+                "  array_agg(ic.relname::text) FILTER (WHERE i.indisvalid), '{}'"
+                ") FROM pg_inherits inh JOIN pg_class c ON c.oid = inh.inhrelid "
+                "LEFT JOIN pg_index i ON i.indrelid = c.oid "
+                "LEFT JOIN pg_class ic ON ic.oid = i.indexrelid "
+                "WHERE inh.inhparent = CAST(:table AS regclass) "
+                "GROUP BY c.relname"
+            ),
+            {"table": PARTITIONED_TABLE},
+        )
+        result = {}
+        for name, indexes in rows:
+            match = _NAME.match(name)
+            if match:
+                result[date(int(match[1]), int(match[2]), 1)] = set(indexes)
+        return result
+
+    async def ensure(self, until: datetime, since: Optional[datetime] = None) -> list[str]:
+        """Создать недостающие секции с месяца ``since`` (по умолчанию текущего) по ``until``.
+
+        Секция создается отдельной таблицей со своим индексом и подключается
+        через ATTACH PARTITION в отдельной короткой транзакции с
+        ``lock_timeout``. Каждая секция коммитится сразу. Возвращает имена
+        созданных секций.
+        """
+        existing = await self.partitions()
+        await self.db.commit()
+        month = month_start(since or datetime.utcnow())
+        created = []
+        while month <= month_start(until):
+            if month not in existing:
+                await self._create(month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+        return created
+
+    async def compact(self, conn: AsyncConnection, before: datetime) -> list[str]:
+        """Добавить BRIN по ``changed_at`` секциям, закончившимся до ``before``.
+
+        ``conn`` — соединение в режиме AUTOCOMMIT: индексы строятся через
+        CREATE INDEX CONCURRENTLY и не мешают ни чтению, ни записи. Btree по
+        ``(changed_at DESC, id DESC)`` остается: без него страница ленты
+        сортировала бы все более старые секции. Если его нет (секцию сжимала
+        прежняя версия обслуживания), он строится заново.
+        """
+        partitions = await self.partitions()
+        # CONCURRENTLY ждет завершения всех транзакций со старым снимком,
+        # в том числе открытой транзакции этой сессии.
+        await self.db.commit()
+        compacted = []
+        for month, indexes in sorted(partitions.items()):
+            if add_months(month, 1) > month_start(before):
+                continue
+            name = partition_name(month)
+            if f"{name}_changed_at_id" not in indexes:
+                await self._build_index(
+                    conn, f"{name}_changed_at_id", f"ON {name} (changed_at DESC, id DESC)"
+                )
+            if f"{name}_changed_at_brin" not in indexes:
+                await self._build_index(
+                    conn, f"{name}_changed_at_brin", f"ON {name} USING brin (changed_at)"
+                )
+                compacted.append(name)
+        return compacted
+
+    async def maintain(
+        self,
+        now: Optional[datetime] = None,
+        ahead: int = settings.HISTORY_PARTITIONS_AHEAD,
+    ) -> dict[str, list[str]]:
+        """Создать секции на ``ahead`` месяцев вперед и добавить BRIN закрытым.
+
+        Каждый шаг коммитится сам, открытая транзакция сессии тоже
+        коммитится. Параллельное обслуживание из другого процесса в это
+        время пропускает свой проход.
+        """
+        changes: dict[str, list[str]] = {"created": [], "compacted": []}
+        if not await self.is_partitioned():
+            return changes
+        now = now or datetime.utcnow()
+        async with self.db.bind.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if not await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY}
+            ):
+                await self.db.commit()
+                return changes
+            try:
+                changes["created"] = await self.ensure(
+                    datetime.combine(add_months(month_start(now), ahead), datetime.min.time()),
+                    now,
+                )
+                changes["compacted"] = await self.compact(conn, now)
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY}
+                )
+        return changes
+
+    async def _create(self, month: date) -> None:
+        name = partition_name(month)
+        lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+        # Пустая таблица, невидимая приложению: блокировки только на ней самой.
+        for statement in (
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"(LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+            # CHECK с границами секции избавляет ATTACH от проверочного чтения таблицы.
+            f"ALTER TABLE {name} DROP CONSTRAINT IF EXISTS {name}_bounds",
+            f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+            f"CHECK (changed_at >= '{lower}' AND changed_at < '{upper}')",
+            f"CREATE INDEX IF NOT EXISTS {name}_changed_at_id "
+            f"ON {name} (changed_at DESC, id DESC)",
+        ):
+            await self.db.execute(text(statement))
+        await self.db.commit()
+
+        # ATTACH клонирует внешние ключи родителя и на время своей транзакции
+        # берет SHARE ROW EXCLUSIVE на tasks и users: коммитим сразу.
+        try:
+            await self.db.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+            await self.db.execute(
+                text(
+                    f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                )
+            )
+            await self.db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    @staticmethod
+    async def _build_index(conn: AsyncConnection, name: str, definition: str) -> None:
+        # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс,
+        # который IF NOT EXISTS пропустил бы: сначала убираем его.
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        await conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} {definition}"))
@@ -0,0 +1,91 @@
+"""Полнотекстовый поиск задач для фильтра ``q``."""
+
+from typing import Optional
+
+from sqlalchemy import column, func, literal, literal_column, or_, select, table
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.expression import Select
+
+from app.core.config import settings
+from app.models.task import SEARCH_TS_CONFIG, Task
+
+SEARCH_ILIKE = "ilike"
+
+# Trigram-токенизатор FTS5 не находит подстроки короче трех символов.
+_MIN_TRIGRAM_LENGTH = 3
+
+_tasks_fts = table("tasks_fts", column("rowid"), column("rank"))
+_tasks_fts_ids = table("tasks_fts_ids", column("fts_rowid"), column("task_id"))
+_search_vector = literal_column("tasks.search_vector")
+
+
+def _ilike_filter(q: str) -> ColumnElement:
+    search_pattern = f"%{q}%"
+    return or_(
+        Task.title.ilike(search_pattern),
+        Task.description.ilike(search_pattern),
+    )
+
+
+def _fts5_phrase(q: str) -> str:
+    # Запрос целиком как фраза: пользовательский ввод не разбирается
+    # как синтаксис FTS5.
+    return '"' + q.replace('"', '""') + '"'
+
+
+def _fts5_match(q: str):
+    return (
+        select(_tasks_fts_ids.c.task_id)
+        .join_from(_tasks_fts, _tasks_fts_ids, _tasks_fts_ids.c.fts_rowid == _tasks_fts.c.rowid)
+        .where(literal_column("tasks_fts").op("MATCH")(literal(_fts5_phrase(q))))
+    )
+
+
+def _use_index(dialect_name: str, q: str) -> bool:
+    if settings.SEARCH_BACKEND == SEARCH_ILIKE:
+        return False
+    if dialect_name == "postgresql":
+        return True
+    return dialect_name == "sqlite" and len(q) >= _MIN_TRIGRAM_LENGTH
+
+
+def search_filter(dialect_name: str, q: str) -> ColumnElement:
+    """Условие поиска по названию и описанию.
+
+    В PostgreSQL совпадения ищутся по ``search_vector`` (GIN) и по подстроке
+    через trigram-индексы, в SQLite — через таблицу FTS5 с trigram-токенизатором.
+    На остальных СУБД и при ``SEARCH_BACKEND=ilike`` используется ILIKE.
+    """
+    if not _use_index(dialect_name, q):
+        return _ilike_filter(q)
+
+    if dialect_name == "postgresql":
+        ts_query = func.websearch_to_tsquery(SEARCH_TS_CONFIG, q)
+        return or_(_search_vector.op("@@")(ts_query), _ilike_filter(q))
+
+    return Task.id.in_(_fts5_match(q))
+
+
+def order_by_relevance(query: Select, dialect_name: str, q: str) -> Optional[Select]:
+    """Упорядочить запрос по релевантности (лучшие совпадения первыми).
+
+    Возвращает ``None``, если для текущей СУБД или запроса ранжирования нет.
+    """
+    if not _use_index(dialect_name, q):
+        return None
+
+    if dialect_name == "postgresql":
+        ts_query = func.websearch_to_tsquery(SEARCH_TS_CONFIG, q)
+        rank = func.ts_rank_cd(_search_vector, ts_query) + func.similarity(Task.title, q)
+        return query.order_by(rank.desc(), Task.id)
+
+    # Ранги берутся одним проходом по FTS5 и присоединяются к задачам;
+    # rank в FTS5 — значение bm25, где меньше значит лучше.
+    ranked = (
+        _fts5_match(q)
+        .add_columns(_tasks_fts.c.rank)
+        .subquery("fts_ranked")
+    )
+    return query.join(ranked, ranked.c.task_id == Task.id).order_by(
+        ranked.c.rank.asc(), Task.id
+    )
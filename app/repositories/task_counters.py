@@ -0,0 +1,212 @@
+"""Счетчики задач по разрезам для сводной аналитики.
+
+Счетчики меняются в той же транзакции, что и задачи (``TaskRepository``),
+поэтому сводка без фильтров читает несколько строк вместо просмотра tasks.
+Каждое изменение пишется в случайный шард ключа; значение — сумма шардов.
+"""
+
+import random
+from collections import Counter
+from typing import Any, Callable
+
+from sqlalchemy import (
+    BigInteger,
+    SmallInteger,
+    String,
+    cast,
+    delete,
+    event,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    true,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Insert
+
+from app.core.config import settings
+from app.models.counter import TaskCounter
+from app.models.task import Task
+from app.repositories.dialects import upsert_insert
+
+DIMENSION_STATUS = "status"
+DIMENSION_THEME = "theme"
+DIMENSION_ASSIGNEE = "assignee"
+
+# Разрез → поле задачи; задачи без темы или исполнителя в разрез не попадают.
+DIMENSION_FIELDS = {
+    DIMENSION_STATUS: "status",
+    DIMENSION_THEME: "theme_id",
+    DIMENSION_ASSIGNEE: "assignee_id",
+}
+
+# Флаг в session.info: транзакция меняла счетчики.
+_CHANGED_KEY = "task_counters_changed"
+
+# Вызываются после коммита, изменившего счетчики (например, перерисовка графиков).
+_listeners: list[Callable[[], None]] = []
+
+
+def on_counters_changed(listener: Callable[[], None]) -> Callable[[], None]:
+    """Подписаться на зафиксированные изменения счетчиков."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def task_deltas(sign: int = 1, **values: Any) -> Counter:
+    """Изменения счетчиков для задачи с полями ``values`` (status, theme_id, assignee_id)."""
+    deltas: Counter = Counter()
+    for dimension, field in DIMENSION_FIELDS.items():
+        value = values.get(field)
+        if value is not None:
+            deltas[(dimension, str(value))] += sign
+    return deltas
+
+
+class TaskCounterRepository:
+    """Репозиторий шардированных счетчиков задач."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def dialect_name(self) -> str:
+        return self.db.bind.dialect.name
+
+    def touch(self) -> None:
+        """Отметить, что транзакция изменила счетчики (слушатели узнают после коммита)."""
+        self.db.sync_session.info[_CHANGED_KEY] = True
+
+    @staticmethod
+    def _shard() -> int:
+        return random.randrange(max(settings.TASK_COUNTER_SHARDS, 1))
+
+    def _upsert(self, statement: Insert) -> Insert:
+        table = TaskCounter.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.dimension, table.c.key, table.c.shard],
+            set_={"count": table.c.count + statement.excluded.count},
+        )
+
+    async def apply(self, deltas: Counter) -> None:
+        """Применить изменения одним UPSERT; коммит — за вызывающим.
+
+        Строки идут в порядке ключей, чтобы параллельные транзакции брали
+        блокировки в одном порядке.
+        """
+        shard = self._shard()
+        rows = [
+            {"dimension": dimension, "key": key, "shard": shard, "count": delta}
+            for (dimension, key), delta in sorted(deltas.items())
+            if delta
+        ]
+        if rows:
+            self.touch()
+            await self.db.execute(self._upsert(upsert_insert(self.db, TaskCounter).values(rows)))
+
+    def status_change_from(self, source, to_status: str) -> Insert:
+        """UPSERT, переносящий строки ``source`` (id, status) в ``to_status``.
+
+        Применяется там, где прежний статус известен только базе: в CTE смены
+        статуса или перед UPDATE в той же транзакции. Сколько строк перенесено,
+        видно только после выполнения, поэтому ``touch`` вызывает вызывающий,
+        когда смена статуса действительно прошла.
+        """
+        # Явные CAST: в UNION PostgreSQL приводит нетипизированные параметры к text.
+        dimension = cast(literal(DIMENSION_STATUS), String)
+        shard = cast(literal(self._shard()), SmallInteger)
+        moves = union_all(
+            select(dimension, source.c.status, shard, cast(literal(-1), BigInteger)).where(true()),
+            # WHERE обязателен: без него SQLite путает ON CONFLICT с условием JOIN.
+            select(dimension, cast(literal(to_status), String), shard, cast(literal(1), BigInteger))
+            .select_from(source)
+            .where(true()),
+        )
+        return self._upsert(
+            upsert_insert(self.db, TaskCounter).from_select(
+                ["dimension", "key", "shard", "count"], moves
+            )
+        )
+
+    async def totals(self) -> dict[str, dict[str, int]]:
+        """Значения счетчиков: разрез → ключ → сумма по шардам (без нулей)."""
+        total = func.sum(TaskCounter.count)
+        result = await self.db.execute(
+            select(TaskCounter.dimension, TaskCounter.key, total)
+            .group_by(TaskCounter.dimension, TaskCounter.key)
+            .having(total != 0)
+        )
+        totals: dict[str, dict[str, int]] = {dimension: {} for dimension in DIMENSION_FIELDS}
+        for dimension, key, count in result:
+            totals.setdefault(dimension, {})[key] = int(count)
+        return totals
+
+    async def recount(self) -> dict[str, dict[str, int]]:
+        """Пересчитать значения по таблице tasks (полный просмотр)."""
+        selects = []
+        for dimension, field in DIMENSION_FIELDS.items():
+            column = getattr(Task, field)
+            selects.append(
+                select(literal(dimension), cast(column, String), func.count())
+                .where(column.is_not(None))
+                .group_by(column)
+            )
+        actual: dict[str, dict[str, int]] = {dimension: {} for dimension in DIMENSION_FIELDS}
+        for dimension, key, count in await self.db.execute(union_all(*selects)):
+            actual[dimension][key] = int(count)
+        return actual
+
+    async def verify(self) -> list[tuple[str, str, int, int]]:
+        """Расхождения счетчиков с tasks: (разрез, ключ, в счетчиках, фактически)."""
+        return _drift(await self.totals(), await self.recount())
+
+    async def rebuild(self) -> list[tuple[str, str, int, int]]:
+        """Пересобрать счетчики с нуля и вернуть найденные расхождения.
+
+        В PostgreSQL tasks блокируется от записи до коммита, чтобы пересчет
+        не потерял изменения, сделанные во время пересборки.
+        """
+        if self.dialect_name == "postgresql":
+            await self.db.execute(text("LOCK TABLE tasks IN SHARE MODE"))
+        stored = await self.totals()
+        actual = await self.recount()
+        await self.db.execute(delete(TaskCounter))
+        rows = [
+            {"dimension": dimension, "key": key, "shard": 0, "count": count}
+            for dimension, counts in actual.items()
+            for key, count in counts.items()
+        ]
+        if rows:
+            await self.db.execute(insert(TaskCounter), rows)
+        self.touch()
+        await self.db.commit()
+        return _drift(stored, actual)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed(session: Session) -> None:
+    if session.info.pop(_CHANGED_KEY, False):
+        for listener in _listeners:
+            listener()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def _drift(stored: dict, actual: dict) -> list[tuple[str, str, int, int]]:
+    drift = []
+    for dimension in DIMENSION_FIELDS:
+        stored_counts = stored.get(dimension, {})
+        actual_counts = actual.get(dimension, {})
+        for key in sorted(stored_counts.keys() | actual_counts.keys()):
+            expected, found = actual_counts.get(key, 0), stored_counts.get(key, 0)
+            if expected != found:
+                drift.append((dimension, key, found, expected))
+    return drift
@@ -1,15 +1,53 @@
-﻿from datetime import date
-from typing import Optional
-from uuid import UUID
+﻿from collections import Counter
+from datetime import date, datetime
+from typing import AsyncIterator, Optional, Sequence
+from uuid import UUID, uuid4
 
-from sqlalchemy import and_, asc, desc, or_, select
+from sqlalchemy import Row, and_, delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.task import Task
+from app.repositories.cache import entity_cache
+from app.repositories.counting import COUNT_EXACT, COUNT_WINDOW, CountEngine
+from app.repositories.history import history_insert_from
+from app.repositories.pagination import (
+    DIRECTION_NEXT,
+    DIRECTION_PREV,
+    Cursor,
+    Page,
+    decode_cursor,
+    encode_cursor,
+    order_clauses,
+    seek_predicate,
+)
+from app.repositories.search import order_by_relevance, search_filter
+from app.repositories.task_counters import DIMENSION_FIELDS, TaskCounterRepository, task_deltas
 
 
 ALLOWED_SORT_FIELDS = {"created_at", "due_date", "priority", "status"}
 ALLOWED_ORDER = {"asc", "desc"}
+# Сортировка по релевантности доступна только вместе с q и только с offset.
+SORT_RELEVANCE = "relevance"
+
+# Поля, которые update может обнулить; остальные None пропускаются.
+CLEARABLE_FIELDS = {"description", "theme_id", "assignee_id", "due_date"}
+# Поля, которые update не принимает от вызывающего.
+_SYSTEM_FIELDS = {"id", "version"}
+
+# Колонки задачи в порядке полей ответа; используются выгрузкой и выборкой полей.
+TASK_COLUMNS = [
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.status,
+    Task.priority,
+    Task.theme_id,
+    Task.assignee_id,
+    Task.created_by,
+    Task.due_date,
+    Task.created_at,
+    Task.updated_at,
+]
 
 
 class TaskRepository:
@@ -17,11 +55,36 @@ class TaskRepository:
 
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.counters = TaskCounterRepository(db)
+
+    @property
+    def dialect_name(self) -> str:
+        return self.db.bind.dialect.name
 
     async def get_by_id(self, task_id: UUID) -> Optional[Task]:
         """Получить задачу по идентификатору."""
+        generation = entity_cache.generation(Task, task_id)
+        cached = await entity_cache.get(self.db, Task, task_id)
+        if cached is not None:
+            return cached
         result = await self.db.execute(select(Task).where(Task.id == task_id))
-        return result.scalar_one_or_none()
+        task = result.scalar_one_or_none()
+        entity_cache.put(self.db, task, generation)
+        return task
+
+    async def get_version(self, task_id: UUID) -> Optional[Row]:
+        """Получить id, версию, автора и статус задачи (для ETag и разбора отказов)."""
+        result = await self.db.execute(
+            select(Task.id, Task.version, Task.created_by, Task.status).where(Task.id == task_id)
+        )
+        return result.one_or_none()
+
+    async def get_fields_by_id(self, task_id: UUID, fields: Sequence[str]) -> Optional[Row]:
+        """Получить только перечисленные поля задачи."""
+        result = await self.db.execute(
+            select(*_projection(fields)).where(Task.id == task_id)
+        )
+        return result.one_or_none()
 
     async def create(
         self,
@@ -34,59 +97,265 @@ class TaskRepository:
         due_date: Optional[date] = None,
         commit: bool = True,
     ) -> Task:
-        """Создать задачу."""
-        task = Task(
-            title=title,
-            description=description,
-            priority=priority,
-            theme_id=theme_id,
-            assignee_id=assignee_id,
-            created_by=created_by,
-            due_date=due_date,
+        """Создать задачу одним INSERT ... RETURNING и обновить счетчики."""
+        result = await self.db.execute(
+            insert(Task)
+            .values(
+                title=title,
+                description=description,
+                priority=priority,
+                theme_id=theme_id,
+                assignee_id=assignee_id,
+                created_by=created_by,
+                due_date=due_date,
+            )
+            .returning(Task)
         )
-        self.db.add(task)
+        task = result.scalar_one()
+        await self.counters.apply(_deltas(task))
         if commit:
             await self.db.commit()
-            await self.db.refresh(task)
-        else:
-            await self.db.flush()
         return task
 
-    async def update(self, task_id: UUID, commit: bool = True, **kwargs) -> Optional[Task]:
-        """Обновить задачу."""
-        task = await self.get_by_id(task_id)
-        if not task:
-            return None
+    async def create_many(
+        self,
+        rows: list[dict],
+        chunk_size: int = 1000,
+        commit: bool = True,
+    ) -> list[Task]:
+        """Создать задачи пачками: один INSERT ... RETURNING на пачку.
 
-        clearable_fields = {"description", "theme_id", "assignee_id", "due_date"}
-        for key, value in kwargs.items():
-            if not hasattr(task, key):
-                continue
-            if value is None and key not in clearable_fields:
-                continue
-            setattr(task, key, value)
+        Задачи возвращаются в порядке ``rows``. Порядок восстанавливается по
+        id, выданным заранее: RETURNING многострочного INSERT его не
+        гарантирует, а sort_by_parameter_order сверяет id из параметров со
+        строками результата и на PostgreSQL не узнает str в uuid.UUID из GUID.
+        """
+        tasks: list[Task] = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = [
+                {**row, "id": row.get("id") or uuid4()} for row in rows[start:start + chunk_size]
+            ]
+            result = await self.db.execute(insert(Task).returning(Task), chunk)
+            created = {task.id: task for task in result.scalars().all()}
+            tasks.extend(created[row["id"]] for row in chunk)
 
+        deltas = Counter()
+        for task in tasks:
+            deltas.update(_deltas(task))
+        await self.counters.apply(deltas)
         if commit:
             await self.db.commit()
-            await self.db.refresh(task)
         else:
             await self.db.flush()
-        return task
+        return tasks
+
+    async def update(
+        self,
+        task_id: UUID,
+        commit: bool = True,
+        owner_id: Optional[UUID] = None,
+        expected_version: Optional[int] = None,
+        **kwargs,
+    ) -> Optional[Task]:
+        """Обновить задачу одним UPDATE ... RETURNING.
+
+        С ``owner_id`` обновляется только задача этого автора, с
+        ``expected_version`` — только эта версия задачи. ``None`` означает,
+        что задачи нет или условие не выполнено. Если меняются тема или
+        исполнитель, прежние значения для счетчиков берутся в PostgreSQL из
+        CTE с блокировкой строки, в SQLite — отдельным чтением перед UPDATE.
+        """
+        columns = Task.__table__.c
+        values = {
+            key: value
+            for key, value in kwargs.items()
+            if key in columns
+            and key not in _SYSTEM_FIELDS
+            and (value is not None or key in CLEARABLE_FIELDS)
+        }
+        conditions = _write_conditions(task_id, owner_id, expected_version)
 
-    async def delete(self, task_id: UUID, commit: bool = True) -> bool:
-        """Удалить задачу (жесткое удаление)."""
-        task = await self.get_by_id(task_id)
-        if not task:
-            return False
+        if not values:
+            result = await self.db.execute(select(Task).where(*conditions))
+            return result.scalar_one_or_none()
 
-        await self.db.delete(task)
+        tasks = Task.__table__
+        counted = [field for field in DIMENSION_FIELDS.values() if field in values]
+        statement = update(Task).where(*conditions)
+        previous_columns = []
+        previous = None
+        if counted and self.dialect_name == "postgresql":
+            locked = (
+                select(tasks.c.id, *(tasks.c[field] for field in counted))
+                .where(*conditions)
+                .with_for_update()
+                .cte("locked")
+            )
+            statement = update(Task).where(Task.id == locked.c.id)
+            previous_columns = [locked.c[field] for field in counted]
+        elif counted:
+            result = await self.db.execute(
+                select(*(tasks.c[field] for field in counted)).where(*conditions)
+            )
+            previous = result.first()
+            if previous is None:
+                return None
+
+        result = await self.db.execute(
+            statement.values(**values, version=Task.version + 1)
+            .returning(Task, *previous_columns)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        row = result.first()
+        task = row[0] if row is not None else None
+        if task is not None:
+            entity_cache.mark(self.db, Task, [task_id])
+            if counted:
+                previous = row[1:] if previous_columns else previous
+                deltas = task_deltas(-1, **dict(zip(counted, previous)))
+                deltas.update(task_deltas(**{field: getattr(task, field) for field in counted}))
+                await self.counters.apply(deltas)
         if commit:
             await self.db.commit()
+        return task
+
+    async def change_status(
+        self,
+        task_id: UUID,
+        to_status: str,
+        changed_by: UUID,
+        owner_id: Optional[UUID] = None,
+        from_status: Optional[str] = None,
+        expected_version: Optional[int] = None,
+    ) -> Optional[Task]:
+        """Сменить статус и записать историю без предварительного чтения задачи.
+
+        Задача меняется, только если ее статус отличается от ``to_status`` и
+        выполнены условия (автор, ожидаемый статус, версия); иначе ``None``.
+        В PostgreSQL это один запрос: CTE блокирует строку и берет прежний
+        статус, следующие CTE пишут историю и счетчики, UPDATE меняет задачу.
+        В SQLite — INSERT ... SELECT истории и счетчиков и UPDATE в одной
+        транзакции: запись в базу сериализована, поэтому между ними строка
+        измениться не может. Коммит — за вызывающим.
+        """
+        tasks = Task.__table__
+        conditions = _write_conditions(task_id, owner_id, expected_version)
+        conditions.append(tasks.c.status != to_status)
+        if from_status is not None:
+            conditions.append(tasks.c.status == from_status)
+        changed_at = datetime.utcnow()
+        values = {"status": to_status, "version": Task.version + 1, "updated_at": changed_at}
+
+        if self.dialect_name == "postgresql":
+            locked = (
+                select(tasks.c.id, tasks.c.status)
+                .where(*conditions)
+                .with_for_update()
+                .cte("locked")
+            )
+            history = history_insert_from(locked, to_status, changed_by, changed_at)
+            counters = self.counters.status_change_from(locked, to_status)
+            statement = (
+                update(Task)
+                .where(Task.id == locked.c.id)
+                .add_cte(history.cte("history_row"), counters.cte("counter_rows"))
+            )
         else:
-            await self.db.flush()
-        return True
+            source = select(tasks.c.id, tasks.c.status).where(*conditions).subquery()
+            inserted = await self.db.execute(
+                history_insert_from(source, to_status, changed_by, changed_at)
+            )
+            if inserted.rowcount == 0:
+                return None
+            await self.db.execute(self.counters.status_change_from(source, to_status))
+            statement = update(Task).where(*conditions)
 
-    async def list_with_filters(
+        result = await self.db.execute(
+            statement.values(**values)
+            .returning(Task)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        task = result.scalar_one_or_none()
+        if task is not None:
+            entity_cache.mark(self.db, Task, [task_id])
+            self.counters.touch()
+        return task
+
+    async def change_status_many(
+        self,
+        to_status: str,
+        conditions: list,
+        chunk_size: int = 1000,
+    ) -> list[tuple[UUID, str]]:
+        """Перевести в статус все задачи, подходящие под условия.
+
+        Возвращает пары ``(id, прежний статус)`` для измененных задач; задачи,
+        уже находящиеся в ``to_status``, не трогаются. Коммит — за вызывающим.
+        """
+        tasks = Task.__table__
+        conditions = [*conditions, tasks.c.status != to_status]
+
+        if self.dialect_name == "postgresql":
+            # Строки блокируются в CTE, поэтому прежний статус — актуальный,
+            # а изменение и выборка прежних значений идут одним запросом.
+            locked = (
+                select(tasks.c.id, tasks.c.status)
+                .where(*conditions)
+                .with_for_update()
+                .cte("locked")
+            )
+            result = await self.db.execute(
+                update(tasks)
+                .where(tasks.c.id == locked.c.id)
+                .values(status=to_status, version=tasks.c.version + 1)
+                .returning(tasks.c.id, locked.c.status)
+            )
+            changed = [(row[0], row[1]) for row in result.all()]
+            entity_cache.mark(self.db, Task, [task_id for task_id, _ in changed])
+            await self.counters.apply(_status_deltas(changed, to_status))
+            return changed
+
+        # В SQLite RETURNING не видит присоединенные таблицы; запись в базу
+        # сериализована, так что чтение и изменение в одной транзакции согласованы.
+        result = await self.db.execute(select(tasks.c.id, tasks.c.status).where(*conditions))
+        changed = [(row[0], row[1]) for row in result.all()]
+        ids = [task_id for task_id, _ in changed]
+        entity_cache.mark(self.db, Task, ids)
+        for start in range(0, len(ids), chunk_size):
+            await self.db.execute(
+                update(tasks)
+                .where(tasks.c.id.in_(ids[start:start + chunk_size]))
+                .values(status=to_status, version=tasks.c.version + 1)
+            )
+        await self.counters.apply(_status_deltas(changed, to_status))
+        return changed
+
+    async def delete(
+        self,
+        task_id: UUID,
+        commit: bool = True,
+        owner_id: Optional[UUID] = None,
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        """Удалить задачу (жесткое удаление) одним DELETE ... RETURNING."""
+        conditions = _write_conditions(task_id, owner_id, expected_version)
+
+        result = await self.db.execute(
+            delete(Task)
+            .where(*conditions)
+            .returning(Task.status, Task.theme_id, Task.assignee_id)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        deleted = row is not None
+        if deleted:
+            entity_cache.mark(self.db, Task, [task_id])
+            await self.counters.apply(_deltas(row, sign=-1))
+        if commit:
+            await self.db.commit()
+        return deleted
+
+    def build_filters(
         self,
         status: Optional[str] = None,
         theme_id: Optional[UUID] = None,
@@ -96,18 +365,8 @@ class TaskRepository:
         due_date_from: Optional[date] = None,
         due_date_to: Optional[date] = None,
         q: Optional[str] = None,
-        sort: str = "created_at",
-        order: str = "desc",
-        limit: int = 100,
-        offset: int = 0,
-    ) -> tuple[list[Task], int]:
-        """Вернуть список задач с фильтрацией, сортировкой и пагинацией."""
-
-        if sort not in ALLOWED_SORT_FIELDS:
-            sort = "created_at"
-        if order not in ALLOWED_ORDER:
-            order = "desc"
-
+    ) -> list:
+        """Собрать условия WHERE для фильтров списка задач."""
         filters = []
 
         if status:
@@ -125,29 +384,176 @@ class TaskRepository:
         if due_date_to:
             filters.append(Task.due_date <= due_date_to)
         if q:
-            search_pattern = f"%{q}%"
-            filters.append(
-                or_(
-                    Task.title.ilike(search_pattern),
-                    Task.description.ilike(search_pattern),
-                )
-            )
+            filters.append(search_filter(self.dialect_name, q))
+        return filters
+
+    async def list_with_filters(
+        self,
+        status: Optional[str] = None,
+        theme_id: Optional[UUID] = None,
+        assignee_id: Optional[UUID] = None,
+        created_by: Optional[UUID] = None,
+        priority: Optional[int] = None,
+        due_date_from: Optional[date] = None,
+        due_date_to: Optional[date] = None,
+        q: Optional[str] = None,
+        sort: str = "created_at",
+        order: str = "desc",
+        limit: int = 100,
+        offset: int = 0,
+        count_mode: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Page:
+        """Вернуть список задач с фильтрацией, сортировкой и пагинацией.
+
+        ``count_mode`` выбирает способ подсчета total (см. ``CountEngine``),
+        при ``none`` вместо total возвращается ``None``. Если передан
+        ``cursor``, страница выбирается seek-условием по ``(sort, id)``,
+        а ``offset`` игнорируется. ``sort=relevance`` вместе с ``q`` упорядочивает
+        задачи по рангу поиска. С ``fields`` вместо сущностей возвращаются строки
+        только с этими колонками (плюс id и поле сортировки).
+        """
+
+        relevance = sort == SORT_RELEVANCE and bool(q)
+        if sort not in ALLOWED_SORT_FIELDS:
+            sort = "created_at"
+        if order not in ALLOWED_ORDER:
+            order = "desc"
+
+        filters = self.build_filters(
+            status=status,
+            theme_id=theme_id,
+            assignee_id=assignee_id,
+            created_by=created_by,
+            priority=priority,
+            due_date_from=due_date_from,
+            due_date_to=due_date_to,
+            q=q,
+        )
 
-        query = select(Task)
+        query = select(Task) if fields is None else select(*_projection([*fields, sort]))
         if filters:
             query = query.where(and_(*filters))
 
-        count_result = await self.db.execute(query)
-        total = len(count_result.all())
+        engine = CountEngine(self.db, mode=count_mode)
+
+        ranked_query = order_by_relevance(query, self.dialect_name, q) if relevance else None
+        if ranked_query is not None:
+            if cursor:
+                raise ValueError("Курсор не поддерживается для сортировки по релевантности")
+            page_query = ranked_query.limit(limit).offset(offset)
+            items, total = await engine.paginate(query, page_query, filtered=True)
+            return Page(list(items), total)
+
+        sort_column = Task.__table__.c[sort]
+        id_column = Task.__table__.c.id
+
+        position = None
+        if cursor:
+            position = decode_cursor(cursor, sort_column)
+            if (position.sort, position.order) != (sort, order):
+                raise ValueError("Курсор не соответствует сортировке")
+
+        backward = position is not None and position.direction == DIRECTION_PREV
+        # Назад по списку идем обратным порядком и затем разворачиваем страницу.
+        descending = (order == "desc") != backward
+
+        page_query = query
+        if position is not None:
+            page_query = page_query.where(
+                seek_predicate(sort_column, id_column, position.value, position.id, descending)
+            )
+        # Лишняя строка показывает, есть ли что-то за пределами страницы.
+        page_query = page_query.order_by(
+            *order_clauses(sort_column, id_column, descending)
+        ).limit(limit + 1)
+        if position is None:
+            page_query = page_query.offset(offset)
+
+        if position is not None and engine.mode == COUNT_WINDOW:
+            # Оконная функция посчитала бы только строки после курсора.
+            engine.mode = COUNT_EXACT
+        items, total = await engine.paginate(query, page_query, filtered=bool(filters))
+
+        has_more = len(items) > limit
+        items = list(items[:limit])
+        if backward:
+            items.reverse()
+
+        def make_cursor(task: Task | Row, direction: str) -> str:
+            return encode_cursor(
+                Cursor(sort, order, getattr(task, sort), task.id, direction)
+            )
+
+        next_cursor = None
+        prev_cursor = None
+        if items:
+            if backward:
+                next_cursor = make_cursor(items[-1], DIRECTION_NEXT)
+                if has_more:
+                    prev_cursor = make_cursor(items[0], DIRECTION_PREV)
+            else:
+                if has_more:
+                    next_cursor = make_cursor(items[-1], DIRECTION_NEXT)
+                if position is not None or offset > 0:
+                    prev_cursor = make_cursor(items[0], DIRECTION_PREV)
+
+        return Page(items, total, next_cursor, prev_cursor)
+
+    async def stream_with_filters(
+        self,
+        chunk_size: int = 1000,
+        **filters,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Отдавать строки задач пачками через серверный курсор.
+
+        Выгрузка — один SELECT, поэтому все пачки берутся из одного снимка
+        данных, а в памяти держится не больше ``chunk_size`` строк.
+        """
+        conditions = self.build_filters(**filters)
+        query = select(*TASK_COLUMNS)
+        if conditions:
+            query = query.where(and_(*conditions))
+        query = query.order_by(Task.created_at, Task.id).execution_options(yield_per=chunk_size)
+
+        result = await self.db.stream(query)
+        try:
+            async for partition in result.partitions():
+                yield partition
+        finally:
+            await result.close()
+
+
+def _deltas(task, sign: int = 1) -> Counter:
+    """Изменения счетчиков для задачи или строки с полями разрезов."""
+    return task_deltas(sign, **{field: getattr(task, field) for field in DIMENSION_FIELDS.values()})
+
+
+def _status_deltas(changed: list[tuple[UUID, str]], to_status: str) -> Counter:
+    """Изменения счетчиков для пар (id, прежний статус), переведенных в ``to_status``."""
+    deltas = Counter()
+    for _, from_status in changed:
+        deltas.update(task_deltas(-1, status=from_status))
+    deltas.update(task_deltas(len(changed), status=to_status))
+    return deltas
 
-        sort_column = getattr(Task, sort)
-        if order == "desc":
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(asc(sort_column))
 
-        query = query.limit(limit).offset(offset)
+def _write_conditions(
+    task_id: UUID,
+    owner_id: Optional[UUID],
+    expected_version: Optional[int],
+) -> list:
+    """Условия изменения одной задачи: id, автор и ожидаемая версия."""
+    conditions = [Task.id == task_id]
+    if owner_id is not None:
+        conditions.append(Task.created_by == owner_id)
+    if expected_version is not None:
+        conditions.append(Task.version == expected_version)
+    return conditions
 
-        result = await self.db.execute(query)
-        return result.scalars().all(), total
 
+def _projection(fields: Sequence[str]) -> list:
+    """Колонки для выборки полей: всегда с id, в порядке TASK_COLUMNS."""
+    requested = {"id", *fields}
+    return [column for column in TASK_COLUMNS if column.key in requested]
@@ -1,10 +1,17 @@
 ﻿from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Row, delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.theme import Theme
+from app.repositories.cache import entity_cache
+from app.repositories.counting import CountEngine
+from app.repositories.dialects import upsert_insert
+
+
+# Детерминированный порядок нужен, чтобы ETag страницы совпадал с ее содержимым.
+_LIST_ORDER = (Theme.created_at, Theme.id)
 
 
 class ThemeRepository:
@@ -13,53 +20,104 @@ class ThemeRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def existing_ids(self, ids: set[UUID]) -> set[UUID]:
+        """Вернуть идентификаторы из набора, которые есть в базе."""
+        if not ids:
+            return set()
+        result = await self.db.execute(select(Theme.id).where(Theme.id.in_(ids)))
+        return set(result.scalars().all())
+
     async def get_by_id(self, theme_id: UUID) -> Optional[Theme]:
         """Получить тему по идентификатору."""
+        generation = entity_cache.generation(Theme, theme_id)
+        cached = await entity_cache.get(self.db, Theme, theme_id)
+        if cached is not None:
+            return cached
         result = await self.db.execute(select(Theme).where(Theme.id == theme_id))
-        return result.scalar_one_or_none()
+        theme = result.scalar_one_or_none()
+        entity_cache.put(self.db, theme, generation)
+        return theme
+
+    async def get_version(self, theme_id: UUID) -> Optional[Row]:
+        """Получить только id и updated_at темы (для ETag)."""
+        result = await self.db.execute(
+            select(Theme.id, Theme.updated_at).where(Theme.id == theme_id)
+        )
+        return result.one_or_none()
 
     async def get_by_name(self, name: str) -> Optional[Theme]:
         """Получить тему по имени."""
         result = await self.db.execute(select(Theme).where(Theme.name == name))
         return result.scalar_one_or_none()
 
-    async def create(self, name: str, description: Optional[str] = None) -> Theme:
-        """Создать тему."""
-        theme = Theme(name=name, description=description)
-        self.db.add(theme)
+    async def create(self, name: str, description: Optional[str] = None) -> Optional[Theme]:
+        """Создать тему; None, если имя уже занято (ON CONFLICT DO NOTHING)."""
+        result = await self.db.execute(
+            upsert_insert(self.db, Theme)
+            .values(name=name, description=description)
+            .on_conflict_do_nothing(index_elements=[Theme.name])
+            .returning(Theme)
+        )
+        theme = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(theme)
         return theme
 
     async def update(self, theme_id: UUID, **kwargs) -> Optional[Theme]:
-        """Обновить тему."""
-        theme = await self.get_by_id(theme_id)
-        if not theme:
-            return None
-
-        for key, value in kwargs.items():
-            if value is not None:
-                setattr(theme, key, value)
-
+        """Обновить тему одним UPDATE ... RETURNING.
+
+        Занятое имя приводит к IntegrityError от уникального индекса.
+        """
+        values = {key: value for key, value in kwargs.items() if value is not None}
+        if not values:
+            return await self.get_by_id(theme_id)
+
+        result = await self.db.execute(
+            update(Theme)
+            .where(Theme.id == theme_id)
+            .values(**values)
+            .returning(Theme)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        theme = result.scalar_one_or_none()
+        if theme is not None:
+            entity_cache.mark(self.db, Theme, [theme_id])
         await self.db.commit()
-        await self.db.refresh(theme)
         return theme
 
     async def delete(self, theme_id: UUID) -> bool:
-        """Удалить тему."""
-        theme = await self.get_by_id(theme_id)
-        if not theme:
-            return False
-
-        await self.db.delete(theme)
+        """Удалить тему одним DELETE ... RETURNING."""
+        result = await self.db.execute(
+            delete(Theme)
+            .where(Theme.id == theme_id)
+            .returning(Theme.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.first() is not None
+        if deleted:
+            entity_cache.mark(self.db, Theme, [theme_id])
         await self.db.commit()
-        return True
-
-    async def list_all(self, limit: int = 100, offset: int = 0) -> tuple[list[Theme], int]:
+        return deleted
+
+    async def list_all(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        count_mode: Optional[str] = None,
+    ) -> tuple[list[Theme], Optional[int]]:
         """Получить список тем."""
-        count_result = await self.db.execute(select(Theme))
-        total = len(count_result.all())
-
-        result = await self.db.execute(select(Theme).limit(limit).offset(offset))
-        return result.scalars().all(), total
+        query = select(Theme)
+        page_query = query.order_by(*_LIST_ORDER).limit(limit).offset(offset)
+
+        engine = CountEngine(self.db, mode=count_mode)
+        return await engine.paginate(query, page_query, filtered=False)
+
+    async def list_versions(self, limit: int = 100, offset: int = 0) -> list[Row]:
+        """Пары (id, updated_at) страницы тем в порядке list_all (для ETag)."""
+        result = await self.db.execute(
+            select(Theme.id, Theme.updated_at)
+            .order_by(*_LIST_ORDER)
+            .limit(limit)
+            .offset(offset)
+        )
+        return result.all()
 
@@ -0,0 +1,53 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.lru import LRUCache
+from app.models.token_version import UserTokenVersion
+from app.repositories.dialects import upsert_insert
+
+# Версии читаются на каждый запрос в режиме AUTH_STATELESS, поэтому кэшируются;
+# TTL — задержка, с которой отзыв виден другим процессам.
+token_version_cache = LRUCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL,
+)
+
+
+class TokenVersionRepository:
+    """Репозиторий версий токенов пользователей."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_version(self, user_id: UUID) -> int:
+        """Текущая версия токенов пользователя (0, если токены не отзывались)."""
+        version = token_version_cache.get(user_id)
+        if version is not None:
+            return version
+
+        result = await self.db.execute(
+            select(UserTokenVersion.version).where(UserTokenVersion.user_id == user_id)
+        )
+        version = result.scalar_one_or_none() or 0
+        token_version_cache.set(user_id, version)
+        return version
+
+    async def bump(self, user_id: UUID) -> int:
+        """Увеличить версию одним UPSERT, отозвав все выданные токены."""
+        table = UserTokenVersion.__table__
+        now = datetime.utcnow()
+        statement = upsert_insert(self.db, table).values(user_id=user_id, version=1, updated_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"version": table.c.version + 1, "updated_at": now},
+        ).returning(table.c.version)
+
+        result = await self.db.execute(statement)
+        version = result.scalar_one()
+        await self.db.commit()
+        token_version_cache.delete(user_id)
+        return version
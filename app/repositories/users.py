@@ -1,10 +1,13 @@
 ﻿from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
+from app.repositories.cache import entity_cache
+from app.repositories.counting import CountEngine
+from app.repositories.dialects import upsert_insert
 
 
 class UserRepository:
@@ -13,10 +16,23 @@ class UserRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def existing_ids(self, ids: set[UUID]) -> set[UUID]:
+        """Вернуть идентификаторы из набора, которые есть в базе."""
+        if not ids:
+            return set()
+        result = await self.db.execute(select(User.id).where(User.id.in_(ids)))
+        return set(result.scalars().all())
+
     async def get_by_id(self, user_id: UUID) -> Optional[User]:
         """Получить пользователя по идентификатору."""
+        generation = entity_cache.generation(User, user_id)
+        cached = await entity_cache.get(self.db, User, user_id)
+        if cached is not None:
+            return cached
         result = await self.db.execute(select(User).where(User.id == user_id))
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+        entity_cache.put(self.db, user, generation)
+        return user
 
     async def get_by_email(self, email: str) -> Optional[User]:
         """Получить пользователя по почте."""
@@ -29,38 +45,55 @@ class UserRepository:
         username: str,
         hashed_password: str,
         is_admin: bool = False,
-    ) -> User:
-        """Создать пользователя."""
-        user = User(
-            email=email,
-            username=username,
-            hashed_password=hashed_password,
-            is_admin=is_admin,
+    ) -> Optional[User]:
+        """Создать пользователя; None, если почта уже занята (ON CONFLICT DO NOTHING)."""
+        result = await self.db.execute(
+            upsert_insert(self.db, User)
+            .values(
+                email=email,
+                username=username,
+                hashed_password=hashed_password,
+                is_admin=is_admin,
+            )
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
         )
-        self.db.add(user)
+        user = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(user)
         return user
 
     async def update(self, user_id: UUID, **kwargs) -> Optional[User]:
-        """Обновить пользователя."""
-        user = await self.get_by_id(user_id)
-        if not user:
-            return None
+        """Обновить пользователя одним UPDATE ... RETURNING.
 
-        for key, value in kwargs.items():
-            if value is not None:
-                setattr(user, key, value)
+        Занятая почта приводит к IntegrityError от уникального индекса.
+        """
+        values = {key: value for key, value in kwargs.items() if value is not None}
+        if not values:
+            return await self.get_by_id(user_id)
 
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(**values)
+            .returning(User)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        user = result.scalar_one_or_none()
+        if user is not None:
+            entity_cache.mark(self.db, User, [user_id])
         await self.db.commit()
-        await self.db.refresh(user)
         return user
 
-    async def list_all(self, limit: int = 100, offset: int = 0) -> tuple[list[User], int]:
+    async def list_all(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        count_mode: Optional[str] = None,
+    ) -> tuple[list[User], Optional[int]]:
         """Получить список пользователей."""
-        count_result = await self.db.execute(select(User))
-        total = len(count_result.all())
+        query = select(User)
+        page_query = query.limit(limit).offset(offset)
 
-        result = await self.db.execute(select(User).limit(limit).offset(offset))
-        return result.scalars().all(), total
+        engine = CountEngine(self.db, mode=count_mode)
+        return await engine.paginate(query, page_query, filtered=False)
 
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -7,3 +10,22 @@ class AnalyticsSummary(BaseModel):
     counts_by_theme: dict[str, int]
     counts_by_assignee: dict[str, int]
     overdue_count: int
+
+
+class FlowStats(BaseModel):
+    """Показатели потока задач: средние в часах и завершенные по неделям."""
+    completed: int
+    lead_time_hours: Optional[float]
+    cycle_time_hours: Optional[float]
+    blocked_hours: float
+    # Понедельник недели (ISO) → число завершенных задач.
+    throughput: dict[str, int]
+
+
+class FlowMetrics(BaseModel):
+    """Схема показателей потока задач."""
+    overall: FlowStats
+    by_theme: dict[str, FlowStats]
+    by_assignee: dict[str, FlowStats]
+    # Водяной знак инкрементального подсчета; None — посчитано по всей истории.
+    processed_until: Optional[datetime] = None
@@ -1,7 +1,8 @@
 from datetime import datetime, date
+from functools import lru_cache
 from typing import Optional
 from uuid import UUID
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, create_model
 
 
 class TaskBase(BaseModel):
@@ -32,6 +33,8 @@ class TaskUpdate(BaseModel):
 class TaskStatusChange(BaseModel):
     """Схема изменения статуса."""
     to_status: str = Field(..., pattern="^(new|in_progress|done|blocked|canceled)$")
+    # Ожидаемый текущий статус: при несовпадении смена отклоняется (409).
+    from_status: Optional[str] = Field(None, pattern="^(new|in_progress|done|blocked|canceled)$")
 
 
 class TaskResponse(TaskBase):
@@ -46,12 +49,74 @@ class TaskResponse(TaskBase):
         from_attributes = True
 
 
+TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+
+def parse_task_fields(fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    """Разобрать параметр fields; id добавляется всегда, неизвестные поля — ошибка."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(name for name in TASK_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=128)
+def sparse_task_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    """Схема ответа задачи только с выбранными полями."""
+    return create_model(
+        "TaskSparseResponse",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (TaskResponse.model_fields[name].annotation, ...) for name in fields},
+    )
+
+
 class TaskListResponse(BaseModel):
     """Схема списка задач с пагинацией."""
     items: list[TaskResponse]
-    total: int
+    total: Optional[int] = None
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+@lru_cache(maxsize=128)
+def sparse_task_list_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    """Схема списка задач только с выбранными полями."""
+    return create_model(
+        "TaskSparseListResponse",
+        __base__=TaskListResponse,
+        items=(list[sparse_task_model(fields)], ...),
+    )
+
+
+class TaskBulkError(BaseModel):
+    """Ошибка элемента пакетного создания."""
+    index: int
+    detail: str
+
+
+class TaskBulkCreateResponse(BaseModel):
+    """Схема ответа пакетного создания задач."""
+    created: int
+    items: list[TaskResponse]
+    errors: list[TaskBulkError]
+
+
+class TaskBulkStatusChange(BaseModel):
+    """Схема пакетной смены статуса."""
+    to_status: str = Field(..., pattern="^(new|in_progress|done|blocked|canceled)$")
+    task_ids: Optional[list[UUID]] = None
+
+
+class TaskBulkStatusResponse(BaseModel):
+    """Схема ответа пакетной смены статуса."""
+    updated: int
+    task_ids: list[UUID]
 
 
 class TaskStatusHistoryResponse(BaseModel):
@@ -65,3 +130,10 @@ class TaskStatusHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class HistoryFeedResponse(BaseModel):
+    """Схема ленты истории статусов с курсорной пагинацией."""
+    items: list[TaskStatusHistoryResponse]
+    limit: int
+    next_cursor: Optional[str] = None
@@ -1,9 +1,17 @@
-﻿from datetime import date
+﻿from datetime import date, datetime, timedelta
+from typing import Optional, Sequence
+from uuid import UUID
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.analytics.frames import FRAME_COLUMNS, build_tasks_frame, frame_columns
+from app.analytics.plots import ChartSpec, priority_chart, status_chart, theme_chart
+from app.core.config import settings
 from app.models.task import Task
+from app.repositories.analytics import AnalyticsRepository
+from app.repositories.flow import FlowRepository
+
+CHART_NAMES = ("statuses", "priorities", "themes")
 
 try:
     import pandas as pd
@@ -20,68 +28,89 @@ class AnalyticsService:
 
     def __init__(self, db: AsyncSession):
         self.db = db
-
-    async def get_summary(self) -> dict:
-        """Получить агрегированную аналитику по задачам."""
-        result = await self.db.execute(select(Task))
-        tasks = result.scalars().all()
-
-        counts_by_status: dict[str, int] = {}
-        for task in tasks:
-            status = task.status
-            counts_by_status[status] = counts_by_status.get(status, 0) + 1
-
-        counts_by_theme: dict[str, int] = {}
-        for task in tasks:
-            if task.theme_id:
-                theme_id = str(task.theme_id)
-                counts_by_theme[theme_id] = counts_by_theme.get(theme_id, 0) + 1
-
-        counts_by_assignee: dict[str, int] = {}
-        for task in tasks:
-            if task.assignee_id:
-                assignee_id = str(task.assignee_id)
-                counts_by_assignee[assignee_id] = counts_by_assignee.get(assignee_id, 0) + 1
-
-        today = date.today()
-        overdue_count = 0
-        for task in tasks:
-            if task.due_date and task.due_date < today and task.status not in ("done", "canceled"):
-                overdue_count += 1
-
+        self.repo = AnalyticsRepository(db)
+        self.flow = FlowRepository(db)
+
+    async def get_summary(
+        self,
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+        theme_id: Optional[UUID] = None,
+        assignee_id: Optional[UUID] = None,
+    ) -> dict:
+        """Получить агрегированную аналитику по задачам.
+
+        Без фильтров сводка читается из счетчиков задач, с фильтрами
+        агрегаты считает база по tasks.
+        """
+        if created_from and created_to and created_from > created_to:
+            raise ValueError("created_from не может быть позже created_to")
+
+        filtered = any(value is not None for value in (created_from, created_to, theme_id, assignee_id))
+        if settings.ANALYTICS_USE_COUNTERS and not filtered:
+            return await self.repo.summary_from_counters(today=date.today())
+        return await self.repo.summary(
+            today=date.today(),
+            created_from=created_from,
+            created_to=created_to,
+            theme_id=theme_id,
+            assignee_id=assignee_id,
+        )
+
+    async def get_chart(self, name: str) -> ChartSpec:
+        """Агрегированный ряд для графика ``name`` (statuses, priorities, themes).
+
+        Статусы и темы берутся из сводки, приоритеты — одним GROUP BY.
+        """
+        if name not in CHART_NAMES:
+            raise ValueError(f"Неизвестный график: {name}")
+        if name == "priorities":
+            return priority_chart(await self.repo.counts_by(Task.priority))
+        summary = await self.get_summary()
+        if name == "statuses":
+            return status_chart(summary["counts_by_status"])
+        return theme_chart(summary["counts_by_theme"])
+
+    async def get_charts(self) -> dict[str, ChartSpec]:
+        """Ряды всех графиков; статусы и темы — из одной сводки."""
+        summary = await self.get_summary()
         return {
-            "counts_by_status": counts_by_status,
-            "counts_by_theme": counts_by_theme,
-            "counts_by_assignee": counts_by_assignee,
-            "overdue_count": overdue_count,
+            "statuses": status_chart(summary["counts_by_status"]),
+            "priorities": priority_chart(await self.repo.counts_by(Task.priority)),
+            "themes": theme_chart(summary["counts_by_theme"]),
         }
 
-    async def get_tasks_dataframe(self) -> pd.DataFrame:
-        """Собрать таблицу pandas со всеми задачами для графиков."""
+    async def get_flow(self, incremental: Optional[bool] = None) -> dict:
+        """Показатели потока задач (lead/cycle time, блокировки, пропускная способность).
+
+        В инкрементальном режиме к недельным суммам сначала добавляются
+        переходы после водяного знака, кроме последних ANALYTICS_FLOW_LAG
+        секунд; иначе показатели считаются по всей истории.
+        """
+        if incremental is None:
+            incremental = settings.ANALYTICS_FLOW_INCREMENTAL
+        if not incremental:
+            return await self.flow.metrics()
+
+        until = datetime.utcnow() - timedelta(seconds=settings.ANALYTICS_FLOW_LAG)
+        processed_until = await self.flow.refresh(until)
+        await self.db.commit()
+        return {**await self.flow.metrics_from_aggregates(), "processed_until": processed_until}
+
+    async def get_tasks_dataframe(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Собрать таблицу pandas с задачами для графиков.
+
+        Читаются только колонки ``columns`` (по умолчанию все) — пачками и
+        сразу в типизированные массивы; идентификаторы остаются строками.
+        """
         if not HAS_PANDAS:
             raise ImportError(
                 "Для аналитики нужен pandas. "
                 "Установите зависимости: pip install -e '.[analytics]'"
             )
 
-        result = await self.db.execute(select(Task))
-        tasks = result.scalars().all()
-
-        data = []
-        for task in tasks:
-            data.append(
-                {
-                    "id": task.id,
-                    "title": task.title,
-                    "status": task.status,
-                    "priority": task.priority,
-                    "theme_id": task.theme_id,
-                    "assignee_id": task.assignee_id,
-                    "created_by": task.created_by,
-                    "due_date": task.due_date,
-                    "created_at": task.created_at,
-                    "updated_at": task.updated_at,
-                }
-            )
-
-        return pd.DataFrame(data)
+        names = list(FRAME_COLUMNS) if columns is None else list(columns)
+        partitions = self.repo.stream_columns(
+            frame_columns(names), chunk_size=settings.ANALYTICS_CHUNK_SIZE
+        )
+        return await build_tasks_frame(partitions, names)
@@ -1,13 +1,19 @@
-﻿from datetime import date
-from typing import Optional
+﻿from datetime import date, datetime, timezone
+from typing import Any, Optional, Sequence
 from uuid import UUID
 
+from pydantic import ValidationError
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.history import TaskStatusHistory
+from app.core.config import settings
 from app.models.task import Task
 from app.repositories.history import HistoryRepository
+from app.repositories.pagination import Page
 from app.repositories.tasks import TaskRepository
+from app.repositories.themes import ThemeRepository
+from app.repositories.users import UserRepository
+from app.schemas.task import TaskCreate
 
 VALID_STATUSES = {"new", "in_progress", "done", "blocked", "canceled"}
 
@@ -32,8 +38,7 @@ class TaskService:
         due_date: Optional[date] = None,
     ) -> Task:
         """Создать задачу."""
-        if priority < 1 or priority > 5:
-            raise ValueError("Приоритет должен быть от 1 до 5")
+        self._validate_priority(priority)
 
         return await self.repo.create(
             title=title,
@@ -45,51 +50,170 @@ class TaskService:
             due_date=due_date,
         )
 
+    async def create_many(
+        self,
+        items: list[dict[str, Any]],
+        created_by: UUID,
+        partial: bool = False,
+    ) -> tuple[list[Task], list[dict]]:
+        """Создать задачи пачкой.
+
+        Каждый элемент проверяется схемой TaskCreate и правилами ``create``,
+        ссылки на темы и исполнителей проверяются двумя запросами на всю пачку.
+        Без ``partial`` любая ошибка отменяет всю пачку; с ``partial``
+        создаются корректные элементы, а ошибки возвращаются по индексам.
+        """
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValueError(f"Не больше {settings.BULK_MAX_ITEMS} задач за один запрос")
+
+        errors: list[dict] = []
+        valid: list[tuple[int, TaskCreate]] = []
+        for index, item in enumerate(items):
+            try:
+                data = TaskCreate.model_validate(item)
+                self._validate_priority(data.priority)
+            except ValidationError as e:
+                errors.append({"index": index, "detail": _validation_message(e)})
+                continue
+            except ValueError as e:
+                errors.append({"index": index, "detail": str(e)})
+                continue
+            valid.append((index, data))
+
+        theme_ids = {data.theme_id for _, data in valid if data.theme_id}
+        assignee_ids = {data.assignee_id for _, data in valid if data.assignee_id}
+        known_themes = await ThemeRepository(self.db).existing_ids(theme_ids)
+        known_users = await UserRepository(self.db).existing_ids(assignee_ids)
+
+        rows = []
+        for index, data in valid:
+            if data.theme_id and data.theme_id not in known_themes:
+                errors.append({"index": index, "detail": "Тема не найдена"})
+                continue
+            if data.assignee_id and data.assignee_id not in known_users:
+                errors.append({"index": index, "detail": "Исполнитель не найден"})
+                continue
+            rows.append({**data.model_dump(), "created_by": created_by})
+
+        errors.sort(key=lambda error: error["index"])
+        if errors and not partial:
+            return [], errors
+
+        tasks = await self.repo.create_many(rows, chunk_size=settings.BULK_INSERT_CHUNK_SIZE)
+        return tasks, errors
+
     async def get_by_id(self, task_id: UUID) -> Optional[Task]:
         """Получить задачу по идентификатору."""
         return await self.repo.get_by_id(task_id)
 
-    async def update(self, task_id: UUID, **kwargs) -> Optional[Task]:
-        """Обновить задачу."""
+    async def get_version(self, task_id: UUID) -> Optional[Row]:
+        """Получить id, версию, автора и статус задачи."""
+        return await self.repo.get_version(task_id)
+
+    async def get_fields_by_id(self, task_id: UUID, fields: Sequence[str]) -> Optional[Row]:
+        """Получить выбранные поля задачи."""
+        return await self.repo.get_fields_by_id(task_id, fields)
+
+    async def update(
+        self,
+        task_id: UUID,
+        owner_id: Optional[UUID] = None,
+        expected_version: Optional[int] = None,
+        **kwargs,
+    ) -> Optional[Task]:
+        """Обновить задачу; с ``owner_id`` — только если он ее автор,
+        с ``expected_version`` — только если версия не изменилась."""
         if "priority" in kwargs and kwargs["priority"] is not None:
-            if kwargs["priority"] < 1 or kwargs["priority"] > 5:
-                raise ValueError("Приоритет должен быть от 1 до 5")
+            self._validate_priority(kwargs["priority"])
 
-        return await self.repo.update(task_id, **kwargs)
+        return await self.repo.update(
+            task_id, owner_id=owner_id, expected_version=expected_version, **kwargs
+        )
 
-    async def delete(self, task_id: UUID) -> bool:
-        """Удалить задачу."""
-        return await self.repo.delete(task_id)
+    async def delete(
+        self,
+        task_id: UUID,
+        owner_id: Optional[UUID] = None,
+        expected_version: Optional[int] = None,
+    ) -> bool:
+        """Удалить задачу; с ``owner_id`` — только если он ее автор."""
+        return await self.repo.delete(
+            task_id, owner_id=owner_id, expected_version=expected_version
+        )
 
     async def change_status(
         self,
         task_id: UUID,
         to_status: str,
         changed_by: UUID,
+        owner_id: Optional[UUID] = None,
+        from_status: Optional[str] = None,
+        expected_version: Optional[int] = None,
     ) -> Optional[Task]:
-        """Изменить статус задачи и записать историю."""
+        """Изменить статус задачи и записать историю.
+
+        Статус меняется условным запросом без предварительного чтения.
+        ``None`` — задачи нет, она уже в ``to_status`` или не выполнено одно
+        из условий (автор, ожидаемый статус, версия); причину выясняет
+        вызывающий.
+        """
         if to_status not in VALID_STATUSES:
             raise ValueError(f"Недопустимый статус: {to_status}")
+        if from_status is not None and from_status not in VALID_STATUSES:
+            raise ValueError(f"Недопустимый статус: {from_status}")
 
-        task = await self.get_by_id(task_id)
-        if not task:
-            return None
+        task = await self.repo.change_status(
+            task_id,
+            to_status,
+            changed_by,
+            owner_id=owner_id,
+            from_status=from_status,
+            expected_version=expected_version,
+        )
+        if task is not None:
+            await self.db.commit()
+        return task
 
-        from_status = task.status
-        if from_status == to_status:
-            return task
+    async def change_status_many(
+        self,
+        to_status: str,
+        changed_by: UUID,
+        is_admin: bool,
+        task_ids: Optional[list[UUID]] = None,
+        **filters,
+    ) -> list[UUID]:
+        """Сменить статус у набора задач одной транзакцией.
 
-        task.status = to_status
-        await self.history_repo.create(
-            task_id=task_id,
-            from_status=from_status,
+        Задачи выбираются по ``task_ids`` и/или фильтрам списка. Права
+        (автор или админ) проверяются в условии UPDATE, поэтому чужие задачи
+        просто не попадают в результат. Возвращает id измененных задач.
+        """
+        if to_status not in VALID_STATUSES:
+            raise ValueError(f"Недопустимый статус: {to_status}")
+        if task_ids is not None and len(task_ids) > settings.BULK_MAX_ITEMS:
+            raise ValueError(f"Не больше {settings.BULK_MAX_ITEMS} задач за один запрос")
+
+        conditions = self.repo.build_filters(**filters)
+        if task_ids is not None:
+            conditions.append(Task.id.in_(task_ids))
+        if not conditions:
+            raise ValueError("Нужно передать task_ids или хотя бы один фильтр")
+        if not is_admin:
+            conditions.append(Task.created_by == changed_by)
+
+        changed = await self.repo.change_status_many(
+            to_status,
+            conditions,
+            chunk_size=settings.BULK_INSERT_CHUNK_SIZE,
+        )
+        await self.history_repo.create_many(
+            changed,
             to_status=to_status,
             changed_by=changed_by,
-            commit=False,
+            chunk_size=settings.BULK_INSERT_CHUNK_SIZE,
         )
         await self.db.commit()
-        await self.db.refresh(task)
-        return task
+        return [task_id for task_id, _ in changed]
 
     async def list_with_filters(
         self,
@@ -105,7 +229,10 @@ class TaskService:
         order: str = "desc",
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[Task], int]:
+        count_mode: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Page:
         """Получить список задач с фильтрами."""
         return await self.repo.list_with_filters(
             status=status,
@@ -120,8 +247,59 @@ class TaskService:
             order=order,
             limit=limit,
             offset=offset,
+            count_mode=count_mode,
+            cursor=cursor,
+            fields=fields,
         )
 
-    async def get_task_history(self, task_id: UUID) -> list[TaskStatusHistory]:
-        """Получить историю смены статусов."""
-        return await self.history_repo.get_by_task_id(task_id)
+    async def get_task_history(
+        self,
+        task_id: UUID,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Получить страницу истории смены статусов задачи (от новых к старым)."""
+        since, until = self._history_window(since, until)
+        return await self.history_repo.get_by_task_id(task_id, since, until, limit, cursor)
+
+    async def get_history_feed(
+        self,
+        changed_by: Optional[UUID] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Получить страницу истории смены статусов всех задач (от новых к старым)."""
+        since, until = self._history_window(since, until)
+        return await self.history_repo.feed(changed_by, since, until, limit, cursor)
+
+    @staticmethod
+    def _history_window(
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> tuple[Optional[datetime], Optional[datetime]]:
+        """Привести границы к UTC без часового пояса, как хранится changed_at."""
+        since, until = (
+            moment.astimezone(timezone.utc).replace(tzinfo=None)
+            if moment is not None and moment.tzinfo is not None
+            else moment
+            for moment in (since, until)
+        )
+        if since is not None and until is not None and since >= until:
+            raise ValueError("since должен быть раньше until")
+        return since, until
+
+    @staticmethod
+    def _validate_priority(priority: int) -> None:
+        if priority < 1 or priority > 5:
+            raise ValueError("Приоритет должен быть от 1 до 5")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'item'}: {item['msg']}"
+        for item in error.errors()
+    )
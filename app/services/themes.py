@@ -1,6 +1,8 @@
 ﻿from typing import Optional
 from uuid import UUID
 
+from sqlalchemy import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.theme import Theme
@@ -16,41 +18,52 @@ class ThemeService:
 
     async def create(self, name: str, description: Optional[str] = None) -> Theme:
         """Создать тему."""
-        existing_theme = await self.repo.get_by_name(name)
-        if existing_theme:
+        theme = await self.repo.create(name, description)
+        if theme is None:
             raise ValueError("Тема с таким именем уже есть")
-
-        return await self.repo.create(name, description)
+        return theme
 
     async def get_by_id(self, theme_id: UUID) -> Optional[Theme]:
         """Получить тему по идентификатору."""
         return await self.repo.get_by_id(theme_id)
 
+    async def get_version(self, theme_id: UUID) -> Optional[Row]:
+        """Получить id и updated_at темы."""
+        return await self.repo.get_version(theme_id)
+
+    async def list_versions(self, limit: int = 100, offset: int = 0) -> list[Row]:
+        """Получить пары (id, updated_at) страницы тем."""
+        return await self.repo.list_versions(limit, offset)
+
     async def update(
         self,
         theme_id: UUID,
         name: Optional[str] = None,
         description: Optional[str] = None,
     ) -> Optional[Theme]:
-        """Обновить тему."""
-        if name:
-            existing_theme = await self.repo.get_by_name(name)
-            if existing_theme and existing_theme.id != theme_id:
-                raise ValueError("Тема с таким именем уже есть")
-
+        """Обновить тему; уникальность имени проверяет база."""
         update_data = {}
         if name:
             update_data["name"] = name
         if description is not None:
             update_data["description"] = description
 
-        return await self.repo.update(theme_id, **update_data)
+        try:
+            return await self.repo.update(theme_id, **update_data)
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("Тема с таким именем уже есть")
 
     async def delete(self, theme_id: UUID) -> bool:
         """Удалить тему."""
         return await self.repo.delete(theme_id)
 
-    async def list_all(self, limit: int = 100, offset: int = 0) -> tuple[list[Theme], int]:
+    async def list_all(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        count_mode: Optional[str] = None,
+    ) -> tuple[list[Theme], Optional[int]]:
         """Получить список тем."""
-        return await self.repo.list_all(limit, offset)
+        return await self.repo.list_all(limit, offset, count_mode=count_mode)
 
@@ -1,10 +1,13 @@
 ﻿from typing import Optional
 from uuid import UUID
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import hash_password, verify_password
+from app.core.principals import principal_cache
+from app.core.security import hash_password_async, verify_password_async
 from app.models.user import User
+from app.repositories.token_versions import TokenVersionRepository
 from app.repositories.users import UserRepository
 
 
@@ -16,13 +19,12 @@ class UserService:
         self.repo = UserRepository(db)
 
     async def register(self, email: str, username: str, password: str) -> User:
-        """Зарегистрировать пользователя."""
-        existing_user = await self.repo.get_by_email(email)
-        if existing_user:
+        """Зарегистрировать пользователя; занятость почты проверяет база."""
+        hashed_password = await hash_password_async(password)
+        user = await self.repo.create(email, username, hashed_password)
+        if user is None:
             raise ValueError("Почта уже зарегистрирована")
-
-        hashed_password = hash_password(password)
-        return await self.repo.create(email, username, hashed_password)
+        return user
 
     async def authenticate(self, email: str, password: str) -> Optional[User]:
         """Проверить логин и пароль пользователя."""
@@ -30,7 +32,7 @@ class UserService:
         if not user:
             return None
 
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
 
         return user
@@ -46,20 +48,31 @@ class UserService:
         username: Optional[str] = None,
         password: Optional[str] = None,
     ) -> Optional[User]:
-        """Обновить данные пользователя."""
+        """Обновить данные пользователя; занятость почты проверяет база."""
         update_data = {}
 
         if email:
-            existing_user = await self.repo.get_by_email(email)
-            if existing_user and existing_user.id != user_id:
-                raise ValueError("Почта уже зарегистрирована")
             update_data["email"] = email
 
         if username:
             update_data["username"] = username
 
         if password:
-            update_data["hashed_password"] = hash_password(password)
+            update_data["hashed_password"] = await hash_password_async(password)
+
+        try:
+            user = await self.repo.update(user_id, **update_data)
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("Почта уже зарегистрирована")
+        principal_cache.invalidate(user_id)
+        if user and password:
+            # После смены пароля старые токены не должны работать.
+            await self.revoke_tokens(user_id)
+        return user
 
-        return await self.repo.update(user_id, **update_data)
+    async def revoke_tokens(self, user_id: UUID) -> int:
+        """Отозвать все выданные пользователю токены."""
+        principal_cache.invalidate(user_id)
+        return await TokenVersionRepository(self.db).bump(user_id)
 
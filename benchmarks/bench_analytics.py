@@ -0,0 +1,91 @@
+"""Сводная аналитика: подсчет в Python, агрегаты в SQL и счетчики задач.
+
+Замеряет задержку и пик памяти Python (tracemalloc) на одну сводку.
+Запуск: python benchmarks/bench_analytics.py 10000 100000 1000000
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from datetime import date
+
+from common import create_engine, measure, report, seed, session_factory
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Task
+from app.repositories.task_counters import TaskCounterRepository
+from app.services.analytics import AnalyticsService
+
+
+async def python_summary(session) -> dict:
+    """Прежняя реализация: загрузить все задачи и посчитать в цикле."""
+    tasks = (await session.execute(select(Task))).scalars().all()
+    today = date.today()
+    summary = {"counts_by_status": {}, "counts_by_theme": {}, "counts_by_assignee": {}, "overdue_count": 0}
+    for task in tasks:
+        summary["counts_by_status"][task.status] = summary["counts_by_status"].get(task.status, 0) + 1
+        if task.theme_id:
+            key = str(task.theme_id)
+            summary["counts_by_theme"][key] = summary["counts_by_theme"].get(key, 0) + 1
+        if task.assignee_id:
+            key = str(task.assignee_id)
+            summary["counts_by_assignee"][key] = summary["counts_by_assignee"].get(key, 0) + 1
+        if task.due_date and task.due_date < today and task.status not in ("done", "canceled"):
+            summary["overdue_count"] += 1
+    return summary
+
+
+async def sql_summary(session) -> dict:
+    settings.ANALYTICS_USE_COUNTERS = False
+    return await AnalyticsService(session).get_summary()
+
+
+async def counters_summary(session) -> dict:
+    settings.ANALYTICS_USE_COUNTERS = True
+    return await AnalyticsService(session).get_summary()
+
+
+async def peak_memory(make_session, fn) -> float:
+    tracemalloc.start()
+    async with make_session() as session:
+        await fn(session)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+async def run(size: int) -> None:
+    engine = await create_engine()
+    await seed(engine, size)
+    make_session = session_factory(engine)
+    # seed пишет задачи в обход репозитория, поэтому счетчики собираются заново.
+    async with make_session() as session:
+        await TaskCounterRepository(session).rebuild()
+
+    results = {}
+    rows = []
+    for title, fn in (("Python", python_summary), ("SQL", sql_summary), ("счетчики", counters_summary)):
+        async def query() -> None:
+            async with make_session() as session:
+                results[title] = await fn(session)
+
+        stats = await measure(query, repeat=3 if size >= 1_000_000 else 10)
+        rows.append(
+            (
+                title,
+                f"median {stats['median_ms']:.1f} ms",
+                f"p99 {stats['p99_ms']:.1f} ms",
+                f"пик {await peak_memory(make_session, fn):.1f} MB",
+            )
+        )
+
+    assert results["Python"] == results["SQL"] == results["счетчики"], "результаты разошлись"
+    report(f"Сводная аналитика, {size} задач ({engine.dialect.name})", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        asyncio.run(run(size))
@@ -0,0 +1,93 @@
+"""Смешанная нагрузка с аутентификацией: с кэшем пользователей и без него.
+
+Считает запросы к базе на HTTP-запрос и задержку (медиана, p99).
+Запуск: python benchmarks/bench_auth.py 2000
+"""
+
+import asyncio
+import itertools
+import random
+import sys
+
+from common import create_engine, measure, report, seed, session_factory
+from httpx import AsyncClient
+from sqlalchemy import event, select
+
+from app.core.deps import get_db
+from app.core.principals import principal_cache
+from app.core.security import create_access_token
+from app.main import app
+from app.models import Task
+from app.repositories.cache import entity_cache
+
+MODES = [
+    ("без кэшей", False, False),
+    ("кэш пользователей", False, True),
+    ("кэш сущностей", True, False),
+    ("оба кэша", True, True),
+]
+
+
+async def run(tasks: int, requests: int = 400) -> None:
+    engine = await create_engine()
+    ids = await seed(engine, tasks)
+    make_session = session_factory(engine)
+    async with make_session() as session:
+        task_ids = (await session.execute(select(Task.id).limit(200))).scalars().all()
+
+    queries = itertools.count()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_query(*args):
+        next(queries)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = AsyncClient(app=app, base_url="http://bench")
+    # Первый пользователь в seed — админ, ему доступны все задачи.
+    tokens = [create_access_token({"sub": str(ids["user_ids"][0])})]
+    tokens += [create_access_token({"sub": str(user_id)}) for user_id in ids["user_ids"][1:]]
+    rng = random.Random(7)
+
+    async def mixed_request():
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        task_id = rng.choice(task_ids)
+        kind = rng.random()
+        if kind < 0.5:
+            await client.get("/tasks/export?status=blocked&priority=1", headers=headers)
+        elif kind < 0.8:
+            await client.get(f"/tasks/{task_id}/history", headers=headers)
+        else:
+            await client.get("/users/me", headers=headers)
+
+    rows = []
+    for title, entity_enabled, principal_enabled in MODES:
+        entity_cache.enabled = entity_enabled
+        principal_cache.enabled = principal_enabled
+        entity_cache.clear()
+        principal_cache.clear()
+        before = next(queries)
+        stats = await measure(mixed_request, requests)
+        executed = next(queries) - before - 1
+        rows.append(
+            (
+                title,
+                f"median {stats['median_ms']:.2f} ms",
+                f"p99 {stats['p99_ms']:.2f} ms",
+                f"{executed / (requests + 1):.2f} запросов к БД",
+            )
+        )
+
+    await client.aclose()
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    report(f"Смешанная нагрузка, {tasks} задач ({engine.dialect.name})", rows)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000]
+    for size in sizes:
+        asyncio.run(run(size))
@@ -0,0 +1,72 @@
+"""Сравнение N запросов POST /tasks с одним POST /tasks/bulk.
+
+Запуск: python benchmarks/bench_bulk_create.py 1000 10000
+"""
+
+import asyncio
+import sys
+import time
+
+from common import create_engine, report, session_factory
+from httpx import AsyncClient
+
+from app.core.deps import get_db
+from app.main import app
+
+
+async def make_client(engine) -> tuple[AsyncClient, dict]:
+    make_session = session_factory(engine)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = AsyncClient(app=app, base_url="http://bench")
+    await client.post(
+        "/auth/register",
+        json={"email": "bulk@example.com", "username": "bulk", "password": "password123"},
+    )
+    login = await client.post(
+        "/auth/login",
+        json={"email": "bulk@example.com", "password": "password123"},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    return client, headers
+
+
+async def run(size: int) -> None:
+    items = [
+        {"title": f"Imported {i}", "description": "from another tracker", "priority": i % 5 + 1}
+        for i in range(size)
+    ]
+    rows = []
+
+    engine = await create_engine()
+    client, headers = await make_client(engine)
+    started = time.perf_counter()
+    for item in items:
+        await client.post("/tasks", headers=headers, json=item)
+    single = time.perf_counter() - started
+    rows.append(("POST /tasks x N", f"{single:.2f} s", f"{size / single:.0f} задач/с"))
+    await client.aclose()
+    await engine.dispose()
+
+    engine = await create_engine()
+    client, headers = await make_client(engine)
+    started = time.perf_counter()
+    response = await client.post("/tasks/bulk", headers=headers, json=items, timeout=None)
+    bulk = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    rows.append(("POST /tasks/bulk", f"{bulk:.2f} s", f"{size / bulk:.0f} задач/с"))
+    await client.aclose()
+    await engine.dispose()
+
+    app.dependency_overrides.clear()
+    report(f"Создание {size} задач ({engine.dialect.name})", rows)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10_000]
+    for size in sizes:
+        asyncio.run(run(size))
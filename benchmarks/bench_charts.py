@@ -0,0 +1,100 @@
+"""Задержка посторонних запросов во время отрисовки графиков.
+
+Пока рисуются параллельные графики, отдельный цикл опрашивает GET /themes
+и замеряет задержку; сравниваются отрисовка в цикле событий, в пуле
+процессов и параллельные GET /analytics/plot/statuses.png с кэшем графиков
+(холодным: одна отрисовка, остальные запросы ждут ее или берут из кэша).
+Запуск: python benchmarks/bench_charts.py 20
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from common import create_engine, report, seed, session_factory
+from httpx import AsyncClient
+
+from app.analytics.chart_cache import chart_cache
+from app.analytics.rendering import chart_renderer
+from app.core.config import settings
+from app.core.deps import get_db
+from app.main import app
+from app.services.analytics import AnalyticsService
+
+
+async def storm(client: AsyncClient, charts: int, draw) -> list[float]:
+    done = asyncio.Event()
+    latencies: list[float] = []
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/themes")
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.005)
+
+    async def render_all():
+        await asyncio.gather(*(draw() for _ in range(charts)))
+        done.set()
+
+    await asyncio.gather(probe(), render_all())
+    return latencies
+
+
+async def run(charts: int) -> None:
+    engine = await create_engine()
+    await seed(engine, 1000)
+    make_session = session_factory(engine)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = AsyncClient(app=app, base_url="http://bench", timeout=None)
+    # Все графики ставятся в очередь разом, без отказов по ее длине.
+    chart_renderer.queue_limit = charts
+    await chart_renderer.start()
+
+    async with make_session() as session:
+        spec = await AnalyticsService(session).get_chart("statuses")
+
+    async def render():
+        await chart_renderer.render(spec)
+
+    async def cached():
+        await client.get("/analytics/plot/statuses.png")
+
+    rows = []
+    for title, offload, draw in (
+        ("в цикле событий", False, render),
+        ("пул процессов", True, render),
+        ("кэш графиков", True, cached),
+    ):
+        settings.CHART_RENDER_OFFLOAD = offload
+        chart_cache.clear()
+        started = time.perf_counter()
+        latencies = sorted(await storm(client, charts, draw))
+        elapsed = time.perf_counter() - started
+        rows.append(
+            (
+                title,
+                f"GET /themes p50 {statistics.median(latencies):.1f} ms",
+                f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f} ms",
+                f"графики {elapsed:.2f} s",
+            )
+        )
+
+    settings.CHART_RENDER_OFFLOAD = True
+    chart_renderer.shutdown()
+    await client.aclose()
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    report(f"{charts} графиков, процессов: {chart_renderer.workers} ({engine.dialect.name})", rows)
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [20]
+    for count in counts:
+        asyncio.run(run(count))
@@ -0,0 +1,117 @@
+"""Показатели потока задач: пересчет по всей истории против пополнения после водяного знака.
+
+История — от одного до четырех переходов на задачу. Замеряются полный подсчет,
+первое пополнение (вся история), пополнение после 1% новых переходов и
+чтение готовых недельных сумм.
+Запуск: python benchmarks/bench_flow.py 10000 100000
+"""
+
+import asyncio
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import create_engine, measure, report, seed, session_factory
+from sqlalchemy import insert, select
+
+from app.models import Task, TaskStatusHistory
+from app.repositories.flow import FlowRepository
+
+PATHS = [
+    ["in_progress", "done"],
+    ["in_progress", "blocked", "in_progress", "done"],
+    ["blocked", "in_progress", "done"],
+    ["in_progress", "blocked"],
+    ["done"],
+]
+
+
+def history_rows(tasks: list, user_ids: list, rng: random.Random, start_offset: float = 0) -> list:
+    rows = []
+    for task_id, created_at in tasks:
+        changed_at = created_at + timedelta(hours=start_offset)
+        previous = "new"
+        for status in rng.choice(PATHS):
+            changed_at += timedelta(hours=rng.randint(1, 96))
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "task_id": task_id,
+                    "from_status": previous,
+                    "to_status": status,
+                    "changed_by": rng.choice(user_ids),
+                    "changed_at": changed_at,
+                }
+            )
+            previous = status
+    return rows
+
+
+async def insert_history(engine, rows: list[dict], batch: int = 5000) -> None:
+    for start in range(0, len(rows), batch):
+        async with engine.begin() as conn:
+            await conn.execute(insert(TaskStatusHistory), rows[start:start + batch])
+
+
+async def run(size: int) -> None:
+    engine = await create_engine()
+    ids = await seed(engine, size)
+    make_session = session_factory(engine)
+    rng = random.Random(7)
+    async with make_session() as session:
+        tasks = (await session.execute(select(Task.id, Task.created_at))).all()
+    rows = history_rows(tasks, ids["user_ids"], rng)
+    await insert_history(engine, rows)
+
+    rows_out = []
+
+    async def full() -> None:
+        async with make_session() as session:
+            await FlowRepository(session).metrics()
+
+    stats = await measure(full, repeat=3)
+    rows_out.append(
+        ("полный подсчет", f"median {stats['median_ms']:.1f} ms", f"p99 {stats['p99_ms']:.1f} ms")
+    )
+
+    async with make_session() as session:
+        started = time.perf_counter()
+        await FlowRepository(session).rebuild(datetime.utcnow())
+        await session.commit()
+        rows_out.append(("первое пополнение", f"{(time.perf_counter() - started) * 1000:.1f} ms", ""))
+
+    # 1% задач получает новые переходы (сдвинутые на 10 лет вперед — после водяного знака).
+    changed = rng.sample(tasks, max(1, size // 100))
+    delta = history_rows(changed, ids["user_ids"], rng, start_offset=24 * 3650)
+    await insert_history(engine, delta)
+    async with make_session() as session:
+        started = time.perf_counter()
+        await FlowRepository(session).refresh(datetime.utcnow() + timedelta(days=2 * 3650))
+        await session.commit()
+        rows_out.append(
+            (f"пополнение +{len(delta)} переходов", f"{(time.perf_counter() - started) * 1000:.1f} ms", "")
+        )
+
+    async def aggregated() -> None:
+        async with make_session() as session:
+            await FlowRepository(session).metrics_from_aggregates()
+
+    stats = await measure(aggregated, repeat=10)
+    rows_out.append(
+        ("чтение сумм", f"median {stats['median_ms']:.1f} ms", f"p99 {stats['p99_ms']:.1f} ms")
+    )
+
+    async with make_session() as session:
+        repo = FlowRepository(session)
+        assert await repo.metrics() == await repo.metrics_from_aggregates(), "результаты разошлись"
+    transitions = len(rows) + len(delta)
+    report(f"Показатели потока, {size} задач, {transitions} переходов ({engine.dialect.name})", rows_out)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        asyncio.run(run(size))
@@ -0,0 +1,89 @@
+"""Сборка DataFrame задач: ORM → словари → DataFrame против колоночной загрузки.
+
+Замеряет время, пик памяти Python (tracemalloc, отдельным прогоном — он
+замедляет аллокации) и размер готовой таблицы.
+Запуск: python benchmarks/bench_frames.py 100000 1000000
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from common import create_engine, report, seed, session_factory
+from sqlalchemy import select
+
+from app.models import Task
+from app.services.analytics import AnalyticsService
+
+
+async def orm_frame(session) -> pd.DataFrame:
+    """Прежняя реализация: ORM-объекты и словарь на каждую задачу."""
+    tasks = (await session.execute(select(Task))).scalars().all()
+    return pd.DataFrame(
+        [
+            {
+                "id": task.id,
+                "title": task.title,
+                "status": task.status,
+                "priority": task.priority,
+                "theme_id": task.theme_id,
+                "assignee_id": task.assignee_id,
+                "created_by": task.created_by,
+                "due_date": task.due_date,
+                "created_at": task.created_at,
+                "updated_at": task.updated_at,
+            }
+            for task in tasks
+        ]
+    )
+
+
+async def columnar_frame(session) -> pd.DataFrame:
+    return await AnalyticsService(session).get_tasks_dataframe()
+
+
+async def status_frame(session) -> pd.DataFrame:
+    return await AnalyticsService(session).get_tasks_dataframe(["status", "priority", "theme_id"])
+
+
+async def run(size: int) -> None:
+    engine = await create_engine()
+    await seed(engine, size)
+    make_session = session_factory(engine)
+
+    rows = []
+    for title, fn in (
+        ("ORM + dict", orm_frame),
+        ("колонки, все", columnar_frame),
+        ("колонки, 3 поля", status_frame),
+    ):
+        async with make_session() as session:
+            started = time.perf_counter()
+            df = await fn(session)
+            elapsed = time.perf_counter() - started
+        del df
+        async with make_session() as session:
+            tracemalloc.start()
+            df = await fn(session)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        rows.append(
+            (
+                title,
+                f"{elapsed * 1000:.0f} ms",
+                f"пик {peak / 1024 / 1024:.1f} MB",
+                f"таблица {df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB",
+            )
+        )
+        del df
+
+    report(f"DataFrame задач, {size} строк ({engine.dialect.name})", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        asyncio.run(run(size))
@@ -0,0 +1,99 @@
+"""История статусов: страницы по курсору против OFFSET.
+
+На каждую задачу приходится от одного до пяти переходов. Замеряются первая
+страница истории задачи, первая страница ленты (всей и одного автора) и
+глубокая страница ленты: по курсору и тем же запросом с OFFSET.
+Запуск: python benchmarks/bench_history.py 10000 100000
+"""
+
+import asyncio
+import random
+import sys
+import uuid
+from datetime import timedelta
+
+from common import create_engine, measure, report, seed, session_factory
+from sqlalchemy import insert, select
+
+from app.models import Task, TaskStatusHistory
+from app.repositories.history import HistoryRepository
+
+PAGE = 100
+DEPTH = 50
+STATUSES = ["in_progress", "blocked", "done", "new"]
+
+
+async def insert_history(engine, tasks: list, user_ids: list, batch: int = 5000) -> int:
+    rng = random.Random(11)
+    rows = []
+    for task_id, created_at in tasks:
+        changed_at, previous = created_at, "new"
+        for _ in range(rng.randint(1, 5)):
+            status = rng.choice([s for s in STATUSES if s != previous])
+            changed_at += timedelta(minutes=rng.randint(1, 5000))
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "task_id": task_id,
+                    "from_status": previous,
+                    "to_status": status,
+                    "changed_by": rng.choice(user_ids),
+                    "changed_at": changed_at,
+                }
+            )
+            previous = status
+    for start in range(0, len(rows), batch):
+        async with engine.begin() as conn:
+            await conn.execute(insert(TaskStatusHistory), rows[start:start + batch])
+    return len(rows)
+
+
+async def run(size: int) -> None:
+    engine = await create_engine()
+    ids = await seed(engine, size)
+    make_session = session_factory(engine)
+    async with make_session() as session:
+        tasks = (await session.execute(select(Task.id, Task.created_at))).all()
+    total = await insert_history(engine, tasks, ids["user_ids"])
+    task_id, author = tasks[len(tasks) // 2][0], ids["user_ids"][1]
+
+    # Курсор страницы DEPTH + 1 ленты: дальше его перечитывает каждый прогон.
+    cursor = None
+    async with make_session() as session:
+        for _ in range(DEPTH):
+            cursor = (await HistoryRepository(session).feed(limit=PAGE, cursor=cursor)).next_cursor
+
+    def case(load):
+        async def call() -> None:
+            async with make_session() as session:
+                await load(HistoryRepository(session), session)
+
+        return call
+
+    h = TaskStatusHistory
+    offset_query = (
+        select(h).order_by(h.changed_at.desc(), h.id.desc()).offset(DEPTH * PAGE).limit(PAGE)
+    )
+    cases = {
+        "история задачи": case(lambda repo, _: repo.get_by_task_id(task_id, limit=PAGE)),
+        "лента, 1-я страница": case(lambda repo, _: repo.feed(limit=PAGE)),
+        "лента автора, 1-я страница": case(lambda repo, _: repo.feed(author, limit=PAGE)),
+        f"лента, страница {DEPTH + 1} по курсору": case(
+            lambda repo, _: repo.feed(limit=PAGE, cursor=cursor)
+        ),
+        f"лента, страница {DEPTH + 1} с OFFSET": case(
+            lambda _, session: session.execute(offset_query)
+        ),
+    }
+    rows = []
+    for title, call in cases.items():
+        stats = await measure(call, repeat=20)
+        rows.append((title, f"median {stats['median_ms']:.2f} ms", f"p99 {stats['p99_ms']:.2f} ms"))
+    report(f"История статусов, {size} задач, {total} переходов ({engine.dialect.name})", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        asyncio.run(run(size))
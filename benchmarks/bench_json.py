@@ -0,0 +1,65 @@
+"""Сериализация списка задач: обычный путь FastAPI против FAST_JSON_RESPONSES.
+
+Запуск: python benchmarks/bench_json.py 20000
+"""
+
+import asyncio
+import sys
+import time
+
+from common import create_engine, measure, report, seed, session_factory
+from httpx import AsyncClient
+
+from app.api.serialization import HAS_ORJSON
+from app.core.config import settings
+from app.core.deps import get_db
+from app.main import app
+
+PAGE_SIZES = [100, 1000, 5000]
+
+
+async def run(tasks: int, repeat: int = 20) -> None:
+    engine = await create_engine()
+    await seed(engine, tasks)
+    make_session = session_factory(engine)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = AsyncClient(app=app, base_url="http://bench")
+
+    rows = []
+    for limit in PAGE_SIZES:
+        url = f"/tasks?limit={limit}&include_total=false"
+        for fast in (False, True):
+            settings.FAST_JSON_RESPONSES = fast
+
+            async def request():
+                response = await client.get(url)
+                assert response.status_code == 200, response.text
+
+            started = time.perf_counter()
+            stats = await measure(request, repeat)
+            elapsed = time.perf_counter() - started
+            rows.append(
+                (
+                    f"limit={limit}",
+                    "fast" if fast else "default",
+                    f"{(repeat + 1) / elapsed:.1f} req/s",
+                    f"p99 {stats['p99_ms']:.1f} ms",
+                )
+            )
+
+    settings.FAST_JSON_RESPONSES = False
+    await client.aclose()
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    report(f"GET /tasks, {tasks} задач ({engine.dialect.name}, orjson={HAS_ORJSON})", rows)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20_000]
+    for size in sizes:
+        asyncio.run(run(size))
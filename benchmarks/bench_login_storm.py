@@ -0,0 +1,84 @@
+"""Задержка посторонних запросов во время волны логинов.
+
+Пока идут параллельные POST /auth/login, отдельный цикл опрашивает GET /themes
+и замеряет задержку; сравниваются bcrypt в цикле событий и в пуле потоков.
+Запуск: python benchmarks/bench_login_storm.py 50
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from common import create_engine, report, session_factory
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.core.deps import get_db
+from app.core.security import password_hash_pool
+from app.main import app
+
+CREDENTIALS = {"email": "storm@example.com", "password": "password123"}
+
+
+async def storm(client: AsyncClient, logins: int) -> list[float]:
+    done = asyncio.Event()
+    latencies: list[float] = []
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/themes")
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.005)
+
+    async def login_all():
+        await asyncio.gather(*(client.post("/auth/login", json=CREDENTIALS) for _ in range(logins)))
+        done.set()
+
+    await asyncio.gather(probe(), login_all())
+    return latencies
+
+
+async def run(logins: int) -> None:
+    engine = await create_engine()
+    make_session = session_factory(engine)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = AsyncClient(app=app, base_url="http://bench", timeout=None)
+    await client.post("/auth/register", json={**CREDENTIALS, "username": "storm"})
+
+    rows = []
+    for offload in (False, True):
+        settings.PASSWORD_HASH_OFFLOAD = offload
+        started = time.perf_counter()
+        latencies = sorted(await storm(client, logins))
+        elapsed = time.perf_counter() - started
+        rows.append(
+            (
+                "пул потоков" if offload else "в цикле событий",
+                f"GET /themes p50 {statistics.median(latencies):.1f} ms",
+                f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f} ms",
+                f"логины {elapsed:.2f} s",
+            )
+        )
+
+    settings.PASSWORD_HASH_OFFLOAD = True
+    await client.aclose()
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    report(
+        f"{logins} логинов, потоков bcrypt: {password_hash_pool.workers} ({engine.dialect.name})",
+        rows,
+    )
+    print("  ожидание слота:", password_hash_pool.stats())
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [50]
+    for count in counts:
+        asyncio.run(run(count))
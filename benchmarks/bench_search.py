@@ -0,0 +1,48 @@
+"""Сравнение поиска по q: ILIKE против индексов (tsvector/trigram или FTS5).
+
+Запуск: python benchmarks/bench_search.py 100000 1000000
+"""
+
+import asyncio
+import sys
+
+from common import create_engine, measure, report, seed, session_factory
+
+from app.core.config import settings
+from app.repositories.tasks import TaskRepository
+
+# Частое слово, префикс и редкий код из описания.
+QUERIES = ["database", "migr", "ref4242"]
+
+
+async def run(size: int) -> None:
+    engine = await create_engine()
+    await seed(engine, size)
+    make_session = session_factory(engine)
+
+    rows = []
+    for backend in ("ilike", "auto"):
+        settings.SEARCH_BACKEND = backend
+        for q in QUERIES:
+            for sort in ("created_at", "relevance"):
+                if backend == "ilike" and sort == "relevance":
+                    continue
+
+                async def query() -> None:
+                    async with make_session() as session:
+                        await TaskRepository(session).list_with_filters(q=q, sort=sort, limit=50)
+
+                stats = await measure(query, repeat=10)
+                rows.append(
+                    (backend, q, sort, f"{stats['median_ms']:.1f} ms", f"p99 {stats['p99_ms']:.1f} ms")
+                )
+
+    settings.SEARCH_BACKEND = "auto"
+    report(f"Поиск, {size} задач ({engine.dialect.name})", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        asyncio.run(run(size))
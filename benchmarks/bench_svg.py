@@ -0,0 +1,53 @@
+"""Отрисовка графиков: matplotlib (PNG) против встроенного SVG.
+
+Для каждого графика замеряет время отрисовки, пик памяти Python
+(tracemalloc, отдельным прогоном) и размер результата. Отрисовка идет в
+текущем процессе, без пула и кэша графиков.
+Запуск: python benchmarks/bench_svg.py
+"""
+
+import asyncio
+import tracemalloc
+
+from common import measure, report
+
+from app.analytics.plots import priority_chart, render_chart, status_chart, theme_chart
+from app.analytics.svg import render_svg
+
+CHARTS = {
+    "statuses": status_chart({"new": 420, "in_progress": 310, "done": 1250, "blocked": 40}),
+    "priorities": priority_chart({1: 300, 2: 520, 3: 610, 4: 380, 5: 210}),
+    "themes": theme_chart({f"{i:08x}-theme": 1000 - i * 70 for i in range(12)}),
+}
+
+
+def peak_memory(render, spec) -> float:
+    tracemalloc.start()
+    render(spec)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+async def run() -> None:
+    for name, spec in CHARTS.items():
+        rows = []
+        for title, render, repeat in (("matplotlib PNG", render_chart, 20), ("SVG", render_svg, 2000)):
+            async def draw() -> None:
+                render(spec)
+
+            stats = await measure(draw, repeat=repeat)
+            rows.append(
+                (
+                    title,
+                    f"median {stats['median_ms']:.3f} ms",
+                    f"p99 {stats['p99_ms']:.3f} ms",
+                    f"пик {peak_memory(render, spec):.0f} KB",
+                    f"размер {len(render(spec)) / 1024:.1f} KB",
+                )
+            )
+        report(f"График {name}, столбцов: {len(spec.values)}", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
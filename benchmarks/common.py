@@ -0,0 +1,127 @@
+"""Общие помощники для скриптов замеров.
+
+База берется из переменной BENCH_DATABASE_URL (по умолчанию файл SQLite),
+для честных цифр запускайте замеры на PostgreSQL.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.base import Base
+from app.models import Task, Theme, User  # noqa: E402
+
+DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+
+STATUSES = ["new", "in_progress", "done", "blocked", "canceled"]
+WORDS = [
+    "database", "deploy", "refactor", "api", "frontend", "backend", "migration",
+    "release", "bugfix", "review", "docs", "search", "index", "cache", "metrics",
+]
+
+
+async def create_engine() -> AsyncEngine:
+    """Создать движок и пересоздать схему."""
+    engine = create_async_engine(DATABASE_URL, future=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def seed(
+    engine: AsyncEngine,
+    tasks: int,
+    users: int = 20,
+    themes: int = 10,
+    batch: int = 5000,
+) -> dict:
+    """Наполнить базу синтетическими пользователями, темами и задачами."""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    theme_ids = [uuid.uuid4() for _ in range(themes)]
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "email": f"bench{i}@example.com",
+                    "username": f"bench{i}",
+                    "hashed_password": "x",
+                    "is_admin": i == 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await conn.execute(
+            insert(Theme),
+            [
+                {"id": theme_id, "name": f"theme{i}", "created_at": now, "updated_at": now}
+                for i, theme_id in enumerate(theme_ids)
+            ],
+        )
+
+    for start in range(0, tasks, batch):
+        rows = []
+        for _ in range(min(batch, tasks - start)):
+            created_at = now - timedelta(minutes=rng.randint(0, 500_000))
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "title": " ".join(rng.sample(WORDS, 3)),
+                    "description": " ".join(rng.choices(WORDS, k=12)) + f" ref{rng.randrange(tasks)}",
+                    "status": rng.choice(STATUSES),
+                    "priority": rng.randint(1, 5),
+                    "theme_id": rng.choice(theme_ids + [None]),
+                    "assignee_id": rng.choice(user_ids + [None]),
+                    "created_by": rng.choice(user_ids),
+                    "due_date": rng.choice([None, date.today() + timedelta(days=rng.randint(-60, 60))]),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+        async with engine.begin() as conn:
+            await conn.execute(insert(Task), rows)
+
+    return {"user_ids": user_ids, "theme_ids": theme_ids}
+
+
+async def measure(fn: Callable[[], Awaitable], repeat: int = 20) -> dict:
+    """Выполнить fn несколько раз и вернуть медиану и p99 в миллисекундах."""
+    await fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+
+
+def report(title: str, rows: list[tuple]) -> None:
+    """Напечатать таблицу результатов."""
+    print(f"\n{title}")
+    for row in rows:
+        print("  " + "  ".join(str(value).ljust(18) for value in row))
@@ -0,0 +1,51 @@
+"""Обслуживание месячных секций task_status_history (PostgreSQL).
+
+python maintain_partitions.py            — создать секции вперед и BRIN закрытым
+python maintain_partitions.py --ahead 6  — держать секции на 6 месяцев вперед
+Для запуска из cron при HISTORY_PARTITION_MAINTENANCE_INTERVAL=0.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.repositories.partitions import HistoryPartitionRepository
+
+
+async def run(ahead: int) -> int:
+    """Обслужить секции и напечатать изменения."""
+    engine = create_async_engine(settings.DATABASE_URL, future=True)
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        repo = HistoryPartitionRepository(session)
+        partitioned = await repo.is_partitioned()
+        changes = await repo.maintain(ahead=ahead)
+    await engine.dispose()
+
+    if not partitioned:
+        print("task_status_history не секционирована, обслуживать нечего")
+        return 0
+    for name in changes["created"]:
+        print(f"создана секция {name}")
+    for name in changes["compacted"]:
+        print(f"добавлен BRIN по времени: {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--ahead",
+        type=int,
+        default=settings.HISTORY_PARTITIONS_AHEAD,
+        help="на сколько месяцев вперед держать секции",
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.ahead)))
@@ -0,0 +1,44 @@
+"""Проверка и пересборка счетчиков задач (task_counters).
+
+python rebuild_counters.py            — сверить счетчики с tasks
+python rebuild_counters.py --rebuild  — пересчитать счетчики с нуля
+Код возврата 1, если при проверке найдены расхождения.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.repositories.task_counters import TaskCounterRepository
+
+
+async def run(rebuild: bool) -> int:
+    """Сверить или пересобрать счетчики и напечатать расхождения."""
+    engine = create_async_engine(settings.DATABASE_URL, future=True)
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        repo = TaskCounterRepository(session)
+        drift = await (repo.rebuild() if rebuild else repo.verify())
+    await engine.dispose()
+
+    for dimension, key, stored, actual in drift:
+        print(f"{dimension}:{key} в счетчиках {stored}, фактически {actual}")
+    if rebuild:
+        print(f"Счетчики пересобраны, исправлено расхождений: {len(drift)}")
+        return 0
+    print("Расхождений нет" if not drift else f"Расхождений: {len(drift)}")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать счетчики с нуля")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.rebuild)))
@@ -5,18 +5,25 @@ from typing import AsyncGenerator, Generator
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from app.analytics.chart_cache import chart_cache
 from app.core.deps import get_db
 from app.db.base import Base
+from app.core.principals import principal_cache
+from app.core.security import token_cache
 from app.main import app
+from app.repositories.token_versions import token_version_cache
+from app.repositories.cache import entity_cache
 
 
-# Тестовая БД в памяти.
-DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+# Тестовая БД: по умолчанию SQLite в памяти; TEST_DATABASE_URL направляет
+# тесты на пустую базу PostgreSQL (postgresql+asyncpg://...).
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 
 
 @pytest.fixture(scope="session")
@@ -27,16 +34,30 @@ def event_loop() -> Generator:
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_entity_cache(monkeypatch):
+    """Тесты идут с включенными кэшами, но не делят их между собой."""
+    monkeypatch.setattr(entity_cache, "enabled", True)
+    entity_cache.clear()
+    principal_cache.clear()
+    token_cache.clear()
+    token_version_cache.clear()
+    chart_cache.clear()
+    yield
+    entity_cache.clear()
+    principal_cache.clear()
+    token_cache.clear()
+    chart_cache.clear()
+
+
 @pytest.fixture
 async def db_engine():
     """Создать тестовый движок БД."""
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=False,
-        future=True,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
+    if DATABASE_URL.startswith("sqlite"):
+        options = {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    else:
+        options = {}
+    engine = create_async_engine(DATABASE_URL, echo=False, future=True, **options)
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -49,6 +70,19 @@ async def db_engine():
     await engine.dispose()
 
 
+@pytest.fixture
+def query_log(db_engine) -> Generator[list[str], None, None]:
+    """Список SQL-запросов, выполненных через тестовый движок."""
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+
 @pytest.fixture
 async def db_session(db_engine) -> AsyncGenerator[AsyncSession, None]:
     """Создать тестовую сессию."""
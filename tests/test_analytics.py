@@ -1,4 +1,6 @@
-﻿import pytest
+﻿import asyncio
+
+import pytest
 from httpx import AsyncClient
 
 
@@ -119,3 +121,325 @@ async def test_analytics_empty_database(client: AsyncClient):
     assert data["counts_by_theme"] == {}
     assert data["counts_by_assignee"] == {}
     assert data["overdue_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_analytics_summary_sql_filters(client: AsyncClient, query_log: list):
+    """Сводка считается одним запросом и учитывает фильтры."""
+    token = await create_test_user_with_tasks(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = (await client.get("/auth/me", headers=headers)).json()["id"]
+    await client.post(
+        "/tasks",
+        headers=headers,
+        json={"title": "Overdue", "assignee_id": user_id, "due_date": "2000-01-01"},
+    )
+
+    query_log.clear()
+    data = (await client.get("/analytics/summary")).json()
+    assert len(query_log) == 1
+    assert data["counts_by_status"] == {"new": 3, "done": 1}
+    assert data["counts_by_assignee"] == {user_id: 1}
+    assert data["overdue_count"] == 1
+
+    by_assignee = (await client.get(f"/analytics/summary?assignee_id={user_id}")).json()
+    assert by_assignee["counts_by_status"] == {"new": 1}
+    assert by_assignee["overdue_count"] == 1
+
+    future = (await client.get("/analytics/summary?created_from=2999-01-01")).json()
+    assert future["counts_by_status"] == {}
+    assert future["overdue_count"] == 0
+
+    invalid = await client.get("/analytics/summary?created_from=2024-02-01&created_to=2024-01-01")
+    assert invalid.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_analytics_counters_match_tasks(client: AsyncClient, db_session, monkeypatch):
+    """Счетчики следуют за изменениями задач и совпадают с агрегацией по tasks."""
+    from sqlalchemy import update
+
+    from app.core.config import settings
+    from app.models import TaskCounter
+    from app.repositories.task_counters import TaskCounterRepository
+    from app.repositories.themes import ThemeRepository
+
+    token = await create_test_user_with_tasks(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = (await client.get("/auth/me", headers=headers)).json()["id"]
+    theme = await ThemeRepository(db_session).create("Counters")
+    other = await ThemeRepository(db_session).create("Other counters")
+
+    task_id = (
+        await client.post("/tasks", headers=headers, json={"title": "Counted", "theme_id": str(theme.id)})
+    ).json()["id"]
+    await client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Bulk {i}", "assignee_id": user_id} for i in range(3)],
+    )
+    await client.patch(
+        f"/tasks/{task_id}", headers=headers, json={"theme_id": str(other.id), "assignee_id": user_id}
+    )
+    await client.post(f"/tasks/{task_id}/status", headers=headers, json={"to_status": "blocked"})
+    await client.post("/tasks/status:bulk?assignee_id=" + user_id, headers=headers, json={"to_status": "done"})
+    deleted_id = (await client.post("/tasks", headers=headers, json={"title": "Gone"})).json()["id"]
+    await client.delete(f"/tasks/{deleted_id}", headers=headers)
+
+    from_counters = (await client.get("/analytics/summary")).json()
+    monkeypatch.setattr(settings, "ANALYTICS_USE_COUNTERS", False)
+    from_tasks = (await client.get("/analytics/summary")).json()
+    assert from_counters == from_tasks
+    assert from_counters["counts_by_theme"] == {str(other.id): 1}
+    assert from_counters["counts_by_assignee"] == {user_id: 4}
+
+    repo = TaskCounterRepository(db_session)
+    assert await repo.verify() == []
+    await db_session.execute(
+        update(TaskCounter).where(TaskCounter.dimension == "status").values(count=TaskCounter.count + 5)
+    )
+    await db_session.commit()
+    drift = await repo.verify()
+    assert drift and all(dimension == "status" for dimension, *_ in drift)
+    assert await repo.rebuild() == drift
+    assert await repo.verify() == []
+
+
+@pytest.mark.asyncio
+async def test_tasks_dataframe_columnar(client: AsyncClient, db_session, monkeypatch):
+    """DataFrame задач собирается пачками в типизированные колонки."""
+    from app.core.config import settings
+    from app.services.analytics import AnalyticsService
+
+    token = await create_test_user_with_tasks(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    due = (await client.post("/tasks", headers=headers, json={"title": "Due", "due_date": "2030-05-01"})).json()
+    monkeypatch.setattr(settings, "ANALYTICS_CHUNK_SIZE", 2)
+
+    service = AnalyticsService(db_session)
+    df = await service.get_tasks_dataframe()
+    assert len(df) == 4
+    assert str(df["status"].dtype) == "category"
+    assert df["status"].value_counts()[["new", "done"]].tolist() == [3, 1]
+    assert str(df["priority"].dtype) == "int8"
+    assert str(df["due_date"].dtype).startswith("datetime64")
+    assert due["id"] in set(df["id"])
+    assert df["due_date"].notna().sum() == 1
+
+    narrow = await service.get_tasks_dataframe(["status", "priority"])
+    assert list(narrow.columns) == ["status", "priority"]
+    assert narrow["priority"].sum() == df["priority"].sum()
+
+    with pytest.raises(ValueError):
+        await service.get_tasks_dataframe(["status", "secret"])
+
+
+@pytest.mark.asyncio
+async def test_chart_rendering_pool(client: AsyncClient, monkeypatch):
+    """График рисуется в пуле процессов; переполненная очередь — 503."""
+    from app.analytics.chart_cache import chart_cache
+    from app.analytics.plots import render_chart, status_chart
+    from app.analytics.rendering import ChartRenderTimeout, chart_renderer
+
+    await create_test_user_with_tasks(client)
+    calls = chart_renderer.calls
+    response = await client.get("/analytics/plot/statuses.png")
+    assert response.status_code == 200
+    assert response.content.startswith(b"\x89PNG")
+    assert chart_renderer.calls == calls + 1
+    assert response.content == render_chart(status_chart({"new": 2, "done": 1}))
+
+    # Тот же ряд отдается из кэша; переполненную очередь видит только новая отрисовка.
+    chart_cache.clear()
+    monkeypatch.setattr(chart_renderer, "queue_limit", -chart_renderer.workers)
+    busy = await client.get("/analytics/plot/statuses.png")
+    assert busy.status_code == 503
+    assert busy.headers["retry-after"] == "1"
+
+    # Ожидающий сдался по таймауту, но слот занят, пока процесс не дорисует.
+    monkeypatch.setattr(chart_renderer, "queue_limit", 0)
+    monkeypatch.setattr(chart_renderer, "timeout", 0.0001)
+    with pytest.raises(ChartRenderTimeout):
+        await chart_renderer.render(status_chart({"new": 3}))
+    assert chart_renderer.stats()["in_flight"] == 1
+    for _ in range(100):
+        if chart_renderer.stats()["in_flight"] == 0:
+            break
+        await asyncio.sleep(0.05)
+    assert chart_renderer.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chart_cache(client: AsyncClient, db_session, tmp_path, monkeypatch):
+    """Тот же ряд отдается из кэша с сильным ETag; новый ряд рисуется в фоне."""
+    from app.analytics.chart_cache import ChartCache, chart_cache, chart_fingerprint
+    from app.analytics.plots import status_chart
+    from app.analytics.rendering import chart_renderer
+    from app.repositories import task_counters
+    from app.services.analytics import AnalyticsService
+
+    token = await create_test_user_with_tasks(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first = await client.get("/analytics/plot/statuses.png")
+    etag = first.headers["etag"]
+    assert etag == f'"{chart_fingerprint("statuses", status_chart({"new": 2, "done": 1}))}"'
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    calls = chart_renderer.calls
+    second = await client.get("/analytics/plot/statuses.png")
+    assert second.content == first.content and second.headers["etag"] == etag
+    revalidated = await client.get("/analytics/plot/statuses.png", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert chart_renderer.calls == calls
+
+    # Коммит, изменивший счетчики, будит фоновую перерисовку.
+    notified = []
+    monkeypatch.setattr(task_counters, "_listeners", [lambda: notified.append(True)])
+    task_id = (await client.post("/tasks", headers=headers, json={"title": "Blocked"})).json()["id"]
+    await client.post(f"/tasks/{task_id}/status", headers=headers, json={"to_status": "blocked"})
+    assert len(notified) == 2
+    # Отклоненная смена статуса не помечает счетчики измененными: следующий
+    # коммит той же сессии без изменений счетчиков перерисовку не будит.
+    await client.post(f"/tasks/{task_id}/status", headers=headers, json={"to_status": "blocked"})
+    await client.patch(f"/tasks/{task_id}", headers=headers, json={"title": "Still blocked"})
+    assert len(notified) == 2
+
+    # Пока рисуется новая версия, отдается прежняя.
+    stale = await client.get("/analytics/plot/statuses.png")
+    assert stale.headers["etag"] == etag and stale.headers["cache-control"] == "no-cache"
+    await chart_cache.join()
+    fresh = await client.get("/analytics/plot/statuses.png")
+    assert fresh.headers["etag"] != etag and fresh.headers["cache-control"] != "no-cache"
+
+    specs = await AnalyticsService(db_session).get_charts()
+    assert await chart_cache.refresh(specs) == 2
+    assert await chart_cache.refresh(specs) == 0
+
+    # Диск переживает процесс; память ограничена бюджетом в байтах.
+    on_disk = ChartCache(chart_renderer, max_bytes=len(fresh.content), directory=str(tmp_path))
+    on_disk.store("a", fresh.content)
+    on_disk.store("b", fresh.content)
+    assert on_disk.stats()["entries"] == 1
+    reopened = ChartCache(chart_renderer, max_bytes=0, directory=str(tmp_path))
+    assert reopened.lookup("a") == fresh.content and reopened.disk_hits == 1
+
+    pruned = ChartCache(
+        chart_renderer, max_bytes=0, directory=str(tmp_path), disk_max_bytes=len(fresh.content)
+    )
+    pruned.store("c", fresh.content)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["c.chart"]
+
+
+@pytest.mark.asyncio
+async def test_chart_formats(client: AsyncClient):
+    """Все графики отдаются в SVG без matplotlib и в PNG; формат — по format или Accept."""
+    import xml.etree.ElementTree as ET
+
+    from app.analytics.rendering import chart_renderer
+
+    await create_test_user_with_tasks(client)
+    calls = chart_renderer.calls
+    for name in ("statuses", "priorities", "themes"):
+        response = await client.get(f"/analytics/plot/{name}?format=svg")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/svg+xml"
+        assert response.headers["etag"].startswith('"')
+        ET.fromstring(response.content)
+    assert chart_renderer.calls == calls
+
+    svg = ET.fromstring((await client.get("/analytics/plot/priorities")).content)
+    bars = svg.findall("{http://www.w3.org/2000/svg}rect")[1:]
+    assert [bar.get("fill") for bar in bars] == ["coral"] * 3
+    themes = (await client.get("/analytics/plot/themes", headers={"Accept": "image/*"})).text
+    assert "Нет задач с темами" in themes
+
+    png = await client.get("/analytics/plot/statuses", headers={"Accept": "image/png,image/svg+xml;q=0.5"})
+    assert png.headers["content-type"] == "image/png"
+    assert png.content.startswith(b"\x89PNG")
+    assert png.headers["vary"] == "Accept"
+
+    assert (await client.get("/analytics/plot/statuses", headers={"Accept": "text/html"})).status_code == 406
+    assert (await client.get("/analytics/plot/unknown")).status_code == 404
+    assert (await client.get("/analytics/plot/statuses?format=gif")).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_flow_metrics(client: AsyncClient, db_session, monkeypatch):
+    """Показатели потока по истории; инкрементальный подсчет совпадает с полным."""
+    from datetime import datetime, timedelta
+    from uuid import UUID
+
+    from sqlalchemy import select
+
+    from app.core.config import settings
+    from app.models import Task, TaskFlowWeek, TaskStatusHistory
+    from app.repositories.themes import ThemeRepository
+
+    token = await create_test_user_with_tasks(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = UUID((await client.get("/auth/me", headers=headers)).json()["id"])
+    theme = await ThemeRepository(db_session).create("Flow")
+    monkeypatch.setattr(settings, "ANALYTICS_FLOW_LAG", 0)
+
+    def task(created_at, theme_id=None):
+        item = Task(
+            title="Flow",
+            status="done",
+            created_by=user_id,
+            assignee_id=user_id,
+            theme_id=theme_id,
+            created_at=created_at,
+        )
+        db_session.add(item)
+        return item
+
+    def step(item, from_status, to_status, changed_at):
+        db_session.add(
+            TaskStatusHistory(
+                task_id=item.id,
+                from_status=from_status,
+                to_status=to_status,
+                changed_by=user_id,
+                changed_at=changed_at,
+            )
+        )
+
+    first = task(datetime(2024, 1, 1), theme.id)
+    second = task(datetime(2024, 1, 8))
+    reopened = task(datetime(2024, 1, 1))
+    await db_session.flush()
+    step(first, "new", "in_progress", datetime(2024, 1, 2))
+    step(first, "in_progress", "blocked", datetime(2024, 1, 3))
+    step(first, "blocked", "in_progress", datetime(2024, 1, 4))
+    step(first, "in_progress", "done", datetime(2024, 1, 5))
+    step(second, "new", "done", datetime(2024, 1, 9, 12))
+    step(reopened, "new", "blocked", datetime(2024, 1, 10))
+    await db_session.commit()
+
+    incremental = (await client.get("/analytics/flow")).json()
+    assert incremental["processed_until"] is not None
+    full = (await client.get("/analytics/flow?incremental=false")).json()
+    assert full["processed_until"] is None
+    assert {**incremental, "processed_until": None} == full
+    assert full["overall"]["completed"] == 3
+    assert full["by_theme"][str(theme.id)] == {
+        "completed": 1,
+        "lead_time_hours": 96.0,
+        "cycle_time_hours": 72.0,
+        "blocked_hours": 24.0,
+        "throughput": {"2024-01-01": 1},
+    }
+    assert full["by_assignee"][str(user_id)]["throughput"] == {"2024-01-01": 1, "2024-01-08": 1}
+    assert full["by_assignee"][str(user_id)]["lead_time_hours"] == 66.0
+
+    # Блокировка, начатая до водяного знака, засчитывается при выходе из нее.
+    weeks = len((await db_session.execute(select(TaskFlowWeek))).all())
+    now = datetime.utcnow()
+    step(reopened, "blocked", "done", now - timedelta(microseconds=1))
+    await db_session.commit()
+    incremental = (await client.get("/analytics/flow")).json()
+    full = (await client.get("/analytics/flow?incremental=false")).json()
+    assert {**incremental, "processed_until": None} == full
+    assert incremental["overall"]["completed"] == 4
+    assert full["by_assignee"][str(user_id)]["blocked_hours"] > 24
+    assert len((await db_session.execute(select(TaskFlowWeek))).all()) == weeks + 1
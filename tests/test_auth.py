@@ -164,3 +164,183 @@ async def test_auth_register_login_me(client: AsyncClient):
     assert me_response.status_code == 200
     me_data = me_response.json()
     assert me_data["email"] == "user@example.com"
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidated_on_update(client: AsyncClient):
+    """Кэш пользователей в get_current_user сбрасывается при изменении профиля."""
+    from app.core.principals import principal_cache
+
+    await client.post(
+        "/auth/register",
+        json={
+            "email": "principal@example.com",
+            "username": "principal",
+            "password": "password123",
+        },
+    )
+    login = await client.post(
+        "/auth/login",
+        json={"email": "principal@example.com", "password": "password123"},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    await client.get("/tasks/export", headers=headers)
+    await client.get("/tasks/export", headers=headers)
+    assert principal_cache.stats()["misses"] == 1
+    assert principal_cache.stats()["hits"] == 1
+
+    updated = await client.patch("/users/me", headers=headers, json={"username": "renamed"})
+    assert updated.json()["username"] == "renamed"
+
+    me = await client.get("/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["username"] == "renamed"
+    assert "created_at" in me.json()
+    assert principal_cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_offloaded(client: AsyncClient, monkeypatch):
+    """bcrypt выполняется в пуле потоков; переполненная очередь дает 503."""
+    from app.core.security import password_hash_pool
+
+    calls = password_hash_pool.calls
+    await client.post(
+        "/auth/register",
+        json={"email": "pool@example.com", "username": "pool", "password": "password123"},
+    )
+    login = await client.post(
+        "/auth/login",
+        json={"email": "pool@example.com", "password": "password123"},
+    )
+    assert login.status_code == 200
+    assert password_hash_pool.calls == calls + 2
+
+    health = await client.get("/health")
+    assert health.json()["password_hashing"]["calls"] >= 2
+
+    monkeypatch.setattr(password_hash_pool, "queue_limit", -password_hash_pool.workers)
+    busy = await client.post(
+        "/auth/login",
+        json={"email": "pool@example.com", "password": "password123"},
+    )
+    assert busy.status_code == 503
+    assert busy.headers["retry-after"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_token_cache(client: AsyncClient):
+    """Повторные и мусорные токены не проверяются заново."""
+    import time
+    from datetime import timedelta
+
+    from app.core.security import create_access_token, decode_token, token_cache
+
+    token = create_access_token({"sub": "00000000-0000-0000-0000-000000000001"})
+    assert decode_token(token) == {"user_id": "00000000-0000-0000-0000-000000000001"}
+    assert decode_token(token) == {"user_id": "00000000-0000-0000-0000-000000000001"}
+    assert token_cache.stats()["hits"] == 1
+
+    for _ in range(3):
+        response = await client.get("/auth/me", headers={"Authorization": "Bearer garbage"})
+        assert response.status_code == 401
+    assert token_cache.stats()["negative_hits"] == 2
+
+    expired = create_access_token({"sub": "x"}, expires_delta=timedelta(seconds=-1))
+    assert decode_token(expired) is None
+
+    short = create_access_token({"sub": "y"})
+    token_cache.put(short, {"user_id": "y"}, time.time() - 1)
+    assert token_cache.get(short) == (False, None)
+    assert token_cache.stats()["verifications_saved"] == 3
+
+    # Мусорные токены не вытесняют проверенные, а изменения копии не попадают в кэш.
+    for i in range(token_cache.rejected.maxsize + 10):
+        assert decode_token(f"garbage-{i}") is None
+    payload = decode_token(token)
+    assert payload == {"user_id": "00000000-0000-0000-0000-000000000001"}
+    payload["is_admin"] = True
+    assert decode_token(token) == {"user_id": "00000000-0000-0000-0000-000000000001"}
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_claims_and_revocation(client: AsyncClient, monkeypatch):
+    """В режиме AUTH_STATELESS пользователь берется из claims, смена пароля отзывает токены."""
+    from jose import jwt
+
+    from app.core.config import settings
+    from app.repositories.users import UserRepository
+
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    credentials = {"email": "stateless@example.com", "password": "password123"}
+    await client.post("/auth/register", json={**credentials, "username": "stateless"})
+    token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+    claims = jwt.get_unverified_claims(token)
+    assert claims["username"] == "stateless"
+    assert claims["is_admin"] is False
+    assert claims["token_version"] == 0
+
+    async def fail_lookup(self, user_id):
+        raise AssertionError("пользователь не должен читаться из базы")
+
+    headers = {"Authorization": f"Bearer {token}"}
+    with monkeypatch.context() as patch:
+        patch.setattr(UserRepository, "get_by_id", fail_lookup)
+        created = await client.post("/tasks", headers=headers, json={"title": "Stateless"})
+        assert created.status_code == 200
+
+    changed = await client.patch("/users/me", headers=headers, json={"password": "password456"})
+    assert changed.status_code == 200
+
+    revoked = await client.post("/tasks", headers=headers, json={"title": "Revoked"})
+    assert revoked.status_code == 401
+    assert revoked.json()["detail"] == "Токен отозван"
+
+    new_token = (
+        await client.post("/auth/login", json={**credentials, "password": "password456"})
+    ).json()["access_token"]
+    assert jwt.get_unverified_claims(new_token)["token_version"] == 1
+    fresh = await client.post(
+        "/tasks", headers={"Authorization": f"Bearer {new_token}"}, json={"title": "Fresh"}
+    )
+    assert fresh.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_user_mutations_single_statement(client: AsyncClient, query_log: list):
+    """Регистрация и изменение профиля — один SQL-запрос плюс commit."""
+    query_log.clear()
+    registered = await client.post(
+        "/auth/register",
+        json={"email": "oneshot@example.com", "username": "oneshot", "password": "password123"},
+    )
+    assert registered.status_code == 200
+    assert len(query_log) == 1
+    assert query_log[0].startswith("INSERT INTO users")
+
+    duplicate = await client.post(
+        "/auth/register",
+        json={"email": "oneshot@example.com", "username": "again", "password": "password123"},
+    )
+    assert duplicate.status_code == 400
+
+    login = await client.post(
+        "/auth/login",
+        json={"email": "oneshot@example.com", "password": "password123"},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.get("/tasks/export", headers=headers)
+
+    query_log.clear()
+    updated = await client.patch("/users/me", headers=headers, json={"username": "renamed"})
+    assert updated.json()["username"] == "renamed"
+    assert len(query_log) == 1
+    assert query_log[0].startswith("UPDATE users")
+
+    await client.post(
+        "/auth/register",
+        json={"email": "taken@example.com", "username": "taken", "password": "password123"},
+    )
+    clash = await client.patch("/users/me", headers=headers, json={"email": "taken@example.com"})
+    assert clash.status_code == 400
@@ -1,4 +1,7 @@
-﻿from datetime import date, timedelta
+﻿import csv
+import io
+import json
+from datetime import date, timedelta
 
 import pytest
 from httpx import AsyncClient
@@ -474,3 +477,755 @@ async def test_task_history_permissions(client: AsyncClient):
     )
     assert other_resp.status_code == 403
 
+
+@pytest.mark.asyncio
+async def test_list_tasks_count_modes(client: AsyncClient):
+    """Проверка режимов подсчета total в списке задач."""
+    token, _ = await create_test_user(client, email="count@example.com", username="count")
+
+    for i in range(5):
+        await client.post(
+            "/tasks",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"title": f"Count {i}", "priority": 1 if i < 2 else 3},
+        )
+
+    for mode in ("exact", "window", "estimate"):
+        response = await client.get(f"/tasks?priority=3&limit=2&count={mode}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert len(data["items"]) == 2
+
+    window_past_end = await client.get("/tasks?count=window&offset=10")
+    assert window_past_end.status_code == 200
+    assert window_past_end.json()["items"] == []
+    assert window_past_end.json()["total"] == 5
+
+    no_total = await client.get("/tasks?include_total=false&limit=2")
+    assert no_total.status_code == 200
+    assert no_total.json()["total"] is None
+    assert len(no_total.json()["items"]) == 2
+
+    invalid = await client.get("/tasks?count=bogus")
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_concurrent_count_falls_back_without_slot(db_session, monkeypatch):
+    """Без свободного слота параллельного подсчета total считается в своей сессии."""
+    import asyncio
+
+    from sqlalchemy import select
+
+    from app.models.task import Task
+    from app.repositories import counting
+    from app.repositories.tasks import TaskRepository
+    from app.repositories.users import UserRepository
+
+    user = await UserRepository(db_session).create("slot@example.com", "slot", "x")
+    for i in range(3):
+        await TaskRepository(db_session).create(title=f"Slot {i}", created_by=user.id, commit=False)
+
+    # Слотов нет: запрос не ждет второго соединения и видит свои незафиксированные строки.
+    monkeypatch.setattr(counting, "_concurrent_counts", asyncio.Semaphore(0))
+    engine = counting.CountEngine(db_session, mode=counting.COUNT_EXACT, concurrent=True)
+    items, total = await engine.paginate(select(Task), select(Task).order_by(Task.id).limit(2))
+    assert (len(items), total) == (2, 3)
+    await db_session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_cursor_pagination(client: AsyncClient):
+    """Курсорная пагинация проходит все задачи без пропусков и повторов."""
+    token, _ = await create_test_user(client, email="cursor@example.com", username="cursor")
+
+    created = []
+    for i in range(7):
+        payload = {"title": f"Cursor {i}", "priority": i % 3 + 1}
+        if i % 2 == 0:
+            payload["due_date"] = (date.today() + timedelta(days=i % 4)).isoformat()
+        response = await client.post(
+            "/tasks",
+            headers={"Authorization": f"Bearer {token}"},
+            json=payload,
+        )
+        created.append(response.json()["id"])
+
+    for sort in ("created_at", "due_date", "priority", "status"):
+        for order in ("asc", "desc"):
+            expected = [
+                item["id"]
+                for item in (await client.get(f"/tasks?sort={sort}&order={order}&limit=100")).json()["items"]
+            ]
+            assert sorted(expected) == sorted(created)
+
+            seen = []
+            pages = []
+            url = f"/tasks?sort={sort}&order={order}&limit=3"
+            response = await client.get(url)
+            while True:
+                assert response.status_code == 200
+                data = response.json()
+                pages.append(data)
+                seen.extend(item["id"] for item in data["items"])
+                if not data["next_cursor"]:
+                    break
+                response = await client.get(f"{url}&cursor={data['next_cursor']}")
+            assert seen == expected
+
+            back = await client.get(f"{url}&cursor={pages[-1]['prev_cursor']}")
+            assert back.status_code == 200
+            assert [item["id"] for item in back.json()["items"]] == [
+                item["id"] for item in pages[-2]["items"]
+            ]
+
+    mismatch = await client.get(f"/tasks?sort=priority&cursor={pages[0]['next_cursor']}")
+    assert mismatch.status_code == 400
+
+    invalid = await client.get("/tasks?cursor=not-a-cursor")
+    assert invalid.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_search_index(client: AsyncClient):
+    """Поиск по индексу: подстроки, обновления, удаления и сортировка по релевантности."""
+    token, _ = await create_test_user(client, email="search@example.com", username="search")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    await client.post("/tasks", headers=headers, json={"title": "Deploy database", "priority": 1})
+    await client.post(
+        "/tasks",
+        headers=headers,
+        json={"title": "Write docs", "description": "database schema and database tuning", "priority": 1},
+    )
+    third = await client.post("/tasks", headers=headers, json={"title": "Refactor api", "priority": 2})
+    third_id = third.json()["id"]
+
+    response = await client.get("/tasks?q=DATAB")
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+
+    combined = await client.get("/tasks?q=datab&priority=1&sort=relevance")
+    assert combined.status_code == 200
+    assert combined.json()["total"] == 2
+
+    await client.patch(f"/tasks/{third_id}", headers=headers, json={"title": "Database migration"})
+    updated = await client.get("/tasks?q=database&priority=2")
+    assert [item["id"] for item in updated.json()["items"]] == [third_id]
+
+    await client.delete(f"/tasks/{third_id}", headers=headers)
+    deleted = await client.get("/tasks?q=migration")
+    assert deleted.json()["total"] == 0
+
+    short = await client.get("/tasks?q=ap")
+    assert short.status_code == 200
+
+    no_cursor = await client.get("/tasks?q=database&sort=relevance&cursor=abc")
+    assert no_cursor.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_tasks(client: AsyncClient):
+    """Потоковая выгрузка задач в NDJSON и CSV с фильтрами."""
+    token, _ = await create_test_user(client, email="export@example.com", username="export")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(5):
+        await client.post(
+            "/tasks",
+            headers=headers,
+            json={
+                "title": f"Export {i}",
+                "description": 'line, with "quotes"',
+                "priority": 5 if i < 3 else 1,
+            },
+        )
+
+    ndjson = await client.get("/tasks/export?format=ndjson&priority=5", headers=headers)
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [line["title"] for line in lines[:-1]] == ["Export 0", "Export 1", "Export 2"]
+    assert lines[-1] == {"export": {"rows": 3}}
+
+    csv_response = await client.get("/tasks/export?format=csv", headers=headers)
+    assert csv_response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+    assert len(rows) == 5
+    assert rows[0]["description"] == 'line, with "quotes"'
+
+    counted = await client.get("/tasks/export?format=csv&csv_row_count=true", headers=headers)
+    assert counted.text.endswith("\n# rows: 5\n")
+    assert counted.text[: -len("# rows: 5\n")] == csv_response.text
+
+    invalid = await client.get("/tasks/export?format=xml", headers=headers)
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_create_tasks_bulk(client: AsyncClient):
+    """Пакетное создание задач: атомарный и частичный режимы."""
+    token, user_id = await create_test_user(client, email="bulk@example.com", username="bulk")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    items = [{"title": f"Bulk {i}", "priority": i % 5 + 1} for i in range(5)]
+    response = await client.post("/tasks/bulk", headers=headers, json=items)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 5
+    assert data["errors"] == []
+    assert [item["title"] for item in data["items"]] == [item["title"] for item in items]
+    assert all(item["created_by"] == user_id and item["status"] == "new" for item in data["items"])
+
+    broken = [
+        {"title": "Valid", "priority": 3},
+        {"title": "", "priority": 3},
+        {"title": "Bad theme", "theme_id": "00000000-0000-0000-0000-000000000001"},
+        {"title": "Bad priority", "priority": 9},
+    ]
+    atomic = await client.post("/tasks/bulk", headers=headers, json=broken)
+    assert atomic.status_code == 400
+    assert [error["index"] for error in atomic.json()["detail"]] == [1, 2, 3]
+
+    partial = await client.post("/tasks/bulk?partial=true", headers=headers, json=broken)
+    assert partial.status_code == 200
+    assert partial.json()["created"] == 1
+    assert [error["index"] for error in partial.json()["errors"]] == [1, 2, 3]
+
+    listing = await client.get("/tasks")
+    assert listing.json()["total"] == 6
+
+
+@pytest.mark.asyncio
+async def test_change_status_bulk(client: AsyncClient):
+    """Пакетная смена статуса по id и по фильтру с записью истории."""
+    token1, _ = await create_test_user(client, email="sprint1@example.com", username="sprint1")
+    token2, _ = await create_test_user(client, email="sprint2@example.com", username="sprint2")
+    headers1 = {"Authorization": f"Bearer {token1}"}
+    headers2 = {"Authorization": f"Bearer {token2}"}
+
+    own = (
+        await client.post(
+            "/tasks/bulk",
+            headers=headers1,
+            json=[{"title": f"Own {i}", "priority": 2 if i < 2 else 4} for i in range(4)],
+        )
+    ).json()["items"]
+    foreign = (await client.post("/tasks", headers=headers2, json={"title": "Foreign"})).json()
+
+    by_ids = await client.post(
+        "/tasks/status:bulk",
+        headers=headers1,
+        json={"to_status": "in_progress", "task_ids": [own[0]["id"], own[1]["id"], foreign["id"]]},
+    )
+    assert by_ids.status_code == 200
+    assert by_ids.json()["updated"] == 2
+    assert set(by_ids.json()["task_ids"]) == {own[0]["id"], own[1]["id"]}
+    assert (await client.get(f"/tasks/{foreign['id']}")).json()["status"] == "new"
+
+    by_filter = await client.post(
+        "/tasks/status:bulk?status=in_progress",
+        headers=headers1,
+        json={"to_status": "done"},
+    )
+    assert by_filter.json()["updated"] == 2
+
+    history = await client.get(f"/tasks/{own[0]['id']}/history", headers=headers1)
+    assert [(item["from_status"], item["to_status"]) for item in history.json()] == [
+        ("in_progress", "done"),
+        ("new", "in_progress"),
+    ]
+
+    unchanged = await client.post(
+        "/tasks/status:bulk?priority=2",
+        headers=headers1,
+        json={"to_status": "done"},
+    )
+    assert unchanged.json()["updated"] == 0
+
+    no_criteria = await client.post("/tasks/status:bulk", headers=headers1, json={"to_status": "done"})
+    assert no_criteria.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_task_sparse_fields(client: AsyncClient):
+    """Выборка только запрошенных полей в списке и в карточке задачи."""
+    token, _ = await create_test_user(client, email="fields@example.com", username="fields")
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(3):
+        await client.post(
+            "/tasks",
+            headers=headers,
+            json={"title": f"Board {i}", "description": "long text", "priority": i + 1},
+        )
+
+    for count in ("exact", "window"):
+        response = await client.get(f"/tasks?fields=title,status,priority&sort=priority&limit=2&count={count}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert [set(item) for item in data["items"]] == [{"id", "title", "status", "priority"}] * 2
+        assert [item["priority"] for item in data["items"]] == [3, 2]
+
+    next_page = await client.get(f"/tasks?fields=title&sort=priority&limit=2&cursor={data['next_cursor']}")
+    assert [item["title"] for item in next_page.json()["items"]] == ["Board 0"]
+    assert set(next_page.json()["items"][0]) == {"id", "title"}
+
+    task_id = data["items"][0]["id"]
+    single = await client.get(f"/tasks/{task_id}?fields=title,due_date")
+    assert single.status_code == 200
+    assert single.json() == {"id": task_id, "title": "Board 2", "due_date": None}
+
+    unknown = await client.get("/tasks?fields=title,secret")
+    assert unknown.status_code == 400
+    unknown_single = await client.get(f"/tasks/{task_id}?fields=password")
+    assert unknown_single.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_fast_json_responses_match_default(client: AsyncClient, db_session, monkeypatch):
+    """Быстрая сериализация отдает тот же JSON, что и обычный путь."""
+    from app.core.config import settings
+    from app.repositories.themes import ThemeRepository
+
+    token, _ = await create_test_user(client, email="fastjson@example.com", username="fastjson")
+    headers = {"Authorization": f"Bearer {token}"}
+    theme = await ThemeRepository(db_session).create("Fast")
+    created = await client.post(
+        "/tasks",
+        headers=headers,
+        json={"title": "Fast", "theme_id": str(theme.id), "due_date": "2030-01-01"},
+    )
+    task_id = created.json()["id"]
+    await client.post(f"/tasks/{task_id}/status", headers=headers, json={"to_status": "in_progress"})
+
+    urls = [
+        "/tasks?limit=10",
+        "/tasks?fields=title,due_date",
+        f"/tasks/{task_id}",
+        f"/tasks/{task_id}?fields=status",
+        f"/tasks/{task_id}/history",
+        "/themes",
+        f"/themes/{theme.id}",
+    ]
+    default = [(await client.get(url, headers=headers)).json() for url in urls]
+
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = [(await client.get(url, headers=headers)).json() for url in urls]
+    assert fast == default
+
+    updated = await client.patch(f"/tasks/{task_id}", headers=headers, json={"title": "Faster"})
+    assert updated.status_code == 200
+    assert updated.json()["title"] == "Faster"
+    assert updated.json()["due_date"] == "2030-01-01"
+
+
+@pytest.mark.asyncio
+async def test_task_etag_conditional_get(client: AsyncClient):
+    """ETag задачи и ответ 304 на If-None-Match."""
+    token, _ = await create_test_user(client, email="etag@example.com", username="etag")
+    headers = {"Authorization": f"Bearer {token}"}
+    created = await client.post("/tasks", headers=headers, json={"title": "Poll me"})
+    task_id = created.json()["id"]
+
+    first = await client.get(f"/tasks/{task_id}")
+    etag = first.headers["etag"]
+    assert etag.startswith('"')
+
+    cached = await client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    weak = await client.get(f"/tasks/{task_id}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert weak.status_code == 304
+
+    sparse = await client.get(f"/tasks/{task_id}?fields=title", headers={"If-None-Match": etag})
+    assert sparse.status_code == 200
+    assert sparse.headers["etag"] != etag
+    sparse_cached = await client.get(
+        f"/tasks/{task_id}?fields=title", headers={"If-None-Match": sparse.headers["etag"]}
+    )
+    assert sparse_cached.status_code == 304
+
+    await client.patch(f"/tasks/{task_id}", headers=headers, json={"title": "Changed"})
+    changed = await client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["title"] == "Changed"
+    assert changed.headers["etag"] != etag
+
+    missing = await client.get(
+        "/tasks/00000000-0000-0000-0000-000000000000", headers={"If-None-Match": etag}
+    )
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_entity_cache_no_stale_reads(db_engine):
+    """Кэш сущностей отдает свежие данные после изменения, смены статуса и удаления."""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    from app.models.task import Task
+    from app.repositories.cache import entity_cache
+    from app.repositories.tasks import TaskRepository
+    from app.repositories.users import UserRepository
+    from app.services.tasks import TaskService
+
+    make_session = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    assert entity_cache.enabled
+
+    async with make_session() as session:
+        user = await UserRepository(session).create("cache@example.com", "cache", "x")
+        task = await TaskRepository(session).create(title="Cached", created_by=user.id)
+
+    async def read(task_id):
+        async with make_session() as session:
+            return await TaskRepository(session).get_by_id(task_id)
+
+    assert (await read(task.id)).title == "Cached"
+    misses = entity_cache.misses
+    assert (await read(task.id)).title == "Cached"
+    assert entity_cache.misses == misses
+    assert entity_cache.hits >= 1
+
+    # Снимок, прочитанный до сброса конкурентной записью, в кэш не попадает.
+    async with make_session() as session:
+        generation = entity_cache.generation(Task, task.id)
+        snapshot = await session.get(Task, task.id)
+        entity_cache.invalidate(Task, task.id)
+        entity_cache.put(session, snapshot, generation)
+    assert entity_cache.backend.get(entity_cache.key(Task, task.id)) is None
+
+    async with make_session() as session:
+        await TaskService(session).update(task.id, title="Renamed")
+    assert (await read(task.id)).title == "Renamed"
+
+    async with make_session() as session:
+        await TaskService(session).change_status(task.id, "in_progress", user.id)
+    assert (await read(task.id)).status == "in_progress"
+
+    async with make_session() as session:
+        await TaskService(session).change_status_many("done", user.id, is_admin=True, task_ids=[task.id])
+    cached = await read(task.id)
+    assert cached.status == "done"
+    assert cached.title == "Renamed"
+
+    async with make_session() as session:
+        cached_user = await UserRepository(session).get_by_id(user.id)
+        assert cached_user.username == "cache"
+        await UserRepository(session).update(user.id, username="renamed")
+    async with make_session() as session:
+        assert (await UserRepository(session).get_by_id(user.id)).username == "renamed"
+
+    async with make_session() as session:
+        assert await TaskService(session).delete(task.id)
+    assert await read(task.id) is None
+
+
+@pytest.mark.asyncio
+async def test_task_mutations_single_statement(client: AsyncClient, query_log: list):
+    """Создание, изменение и удаление задачи — один SQL-запрос к tasks.
+
+    Создание и удаление еще обновляют счетчики аналитики в той же транзакции.
+    """
+    token, _ = await create_test_user(client, email="oneshot@example.com", username="oneshot")
+    other_token, _ = await create_test_user(client, email="other1@example.com", username="other1")
+    headers = {"Authorization": f"Bearer {token}"}
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+    # /auth/me кладет обоих пользователей в кэш Principal, чтобы ниже
+    # считались только запросы самих изменений.
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+    assert (await client.get("/auth/me", headers=other_headers)).status_code == 200
+
+    query_log.clear()
+    created = await client.post("/tasks", headers=headers, json={"title": "One shot"})
+    assert created.status_code == 200
+    assert len(query_log) == 2
+    assert query_log[0].startswith("INSERT INTO tasks")
+    assert query_log[1].startswith("INSERT INTO task_counters")
+    task_id = created.json()["id"]
+
+    query_log.clear()
+    updated = await client.patch(f"/tasks/{task_id}", headers=headers, json={"priority": 5})
+    assert updated.json()["priority"] == 5
+    assert len(query_log) == 1
+    assert query_log[0].startswith("UPDATE tasks")
+
+    forbidden = await client.patch(f"/tasks/{task_id}", headers=other_headers, json={"priority": 1})
+    assert forbidden.status_code == 403
+    assert (await client.delete(f"/tasks/{task_id}", headers=other_headers)).status_code == 403
+    missing = await client.patch(
+        "/tasks/00000000-0000-0000-0000-000000000000", headers=headers, json={"priority": 1}
+    )
+    assert missing.status_code == 404
+
+    query_log.clear()
+    deleted = await client.delete(f"/tasks/{task_id}", headers=headers)
+    assert deleted.status_code == 204
+    assert len(query_log) == 2
+    assert query_log[0].startswith("DELETE FROM tasks")
+    assert query_log[1].startswith("INSERT INTO task_counters")
+    assert (await client.get(f"/tasks/{task_id}")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_task_status_change_conditional(client: AsyncClient, query_log: list):
+    """Смена статуса без чтения задачи, If-Match (412) и from_status (409)."""
+    token, _ = await create_test_user(client, email="optimistic@example.com", username="optimistic")
+    other_token, _ = await create_test_user(client, email="other2@example.com", username="other2")
+    headers = {"Authorization": f"Bearer {token}"}
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+    created = await client.post("/tasks", headers=headers, json={"title": "Race me"})
+    task_id = created.json()["id"]
+    etag = (await client.get(f"/tasks/{task_id}")).headers["etag"]
+    # Пользователь уже в кэше Principal после /auth/me: ниже — только смена статуса.
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+
+    query_log.clear()
+    changed = await client.post(
+        f"/tasks/{task_id}/status",
+        headers={**headers, "If-Match": etag},
+        json={"to_status": "in_progress", "from_status": "new"},
+    )
+    assert changed.status_code == 200
+    assert changed.json()["status"] == "in_progress"
+    assert changed.headers["etag"] != etag
+    # В SQLite — INSERT ... SELECT истории и счетчиков и UPDATE,
+    # в PostgreSQL — один запрос с CTE.
+    assert len(query_log) <= 3
+    assert not any(statement.startswith("SELECT") for statement in query_log)
+
+    stale = await client.post(
+        f"/tasks/{task_id}/status",
+        headers={**headers, "If-Match": etag},
+        json={"to_status": "done"},
+    )
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == changed.headers["etag"]
+
+    conflict = await client.post(
+        f"/tasks/{task_id}/status", headers=headers, json={"to_status": "done", "from_status": "new"}
+    )
+    assert conflict.status_code == 409
+
+    forbidden = await client.post(
+        f"/tasks/{task_id}/status", headers=other_headers, json={"to_status": "done"}
+    )
+    assert forbidden.status_code == 403
+
+    same = await client.post(
+        f"/tasks/{task_id}/status", headers=headers, json={"to_status": "in_progress"}
+    )
+    assert same.status_code == 200
+    assert same.headers["etag"] == changed.headers["etag"]
+
+    stale_patch = await client.patch(
+        f"/tasks/{task_id}", headers={**headers, "If-Match": etag}, json={"title": "Lost update"}
+    )
+    assert stale_patch.status_code == 412
+    patched = await client.patch(
+        f"/tasks/{task_id}",
+        headers={**headers, "If-Match": changed.headers["etag"]},
+        json={"title": "Won"},
+    )
+    assert patched.status_code == 200
+    assert patched.headers["etag"] not in (etag, changed.headers["etag"])
+    malformed = await client.patch(
+        f"/tasks/{task_id}", headers={**headers, "If-Match": "W/\"v1\""}, json={"title": "Weak"}
+    )
+    assert malformed.status_code == 412
+
+    history = (await client.get(f"/tasks/{task_id}/history", headers=headers)).json()
+    assert [(item["from_status"], item["to_status"]) for item in history] == [("new", "in_progress")]
+
+
+@pytest.mark.asyncio
+async def test_history_pagination_and_feed(client: AsyncClient, db_session):
+    """История задачи по страницам с курсором и окном, лента изменений по авторам."""
+    from sqlalchemy import select
+
+    from app.models.user import User
+
+    token1, user1_id = await create_test_user(client, email="page1@example.com", username="page1")
+    token2, user2_id = await create_test_user(client, email="page2@example.com", username="page2")
+    token3, user3_id = await create_test_user(client, email="page3@example.com", username="page3")
+    headers1 = {"Authorization": f"Bearer {token1}"}
+    headers2 = {"Authorization": f"Bearer {token2}"}
+    admin = await db_session.scalar(select(User).where(User.id == user3_id))
+    admin.is_admin = True
+    await db_session.commit()
+
+    task_id = (await client.post("/tasks", headers=headers1, json={"title": "Paged"})).json()["id"]
+    for to_status in ("in_progress", "blocked", "in_progress", "done", "new"):
+        await client.post(f"/tasks/{task_id}/status", headers=headers1, json={"to_status": to_status})
+    other_id = (await client.post("/tasks", headers=headers2, json={"title": "Other"})).json()["id"]
+    await client.post(f"/tasks/{other_id}/status", headers=headers2, json={"to_status": "done"})
+
+    full = (await client.get(f"/tasks/{task_id}/history", headers=headers1)).json()
+    assert [item["to_status"] for item in full] == ["new", "done", "in_progress", "blocked", "in_progress"]
+
+    pages, url = [], f"/tasks/{task_id}/history?limit=2"
+    while url:
+        response = await client.get(url, headers=headers1)
+        assert response.status_code == 200
+        pages.append(response.json())
+        link = response.headers.get("link")
+        url = link[1:link.index(">")] if link else None
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [item["id"] for page in pages for item in page] == [item["id"] for item in full]
+
+    window = await client.get(
+        f"/tasks/{task_id}/history",
+        headers=headers1,
+        params={"since": full[3]["changed_at"], "until": full[1]["changed_at"]},
+    )
+    assert [item["id"] for item in window.json()] == [full[2]["id"], full[3]["id"]]
+
+    reversed_window = await client.get(
+        f"/tasks/{task_id}/history",
+        headers=headers1,
+        params={"since": full[1]["changed_at"], "until": full[3]["changed_at"]},
+    )
+    assert reversed_window.status_code == 400
+    bad_cursor = await client.get(f"/tasks/{task_id}/history?cursor=garbage", headers=headers1)
+    assert bad_cursor.status_code == 400
+
+    own = (await client.get("/history?limit=3", headers=headers1)).json()
+    assert [item["id"] for item in own["items"]] == [item["id"] for item in full[:3]]
+    rest = (
+        await client.get("/history", headers=headers1, params={"cursor": own["next_cursor"]})
+    ).json()
+    assert [item["id"] for item in rest["items"]] == [item["id"] for item in full[3:]]
+    assert rest["next_cursor"] is None
+
+    forbidden = await client.get("/history", headers=headers1, params={"changed_by": user2_id})
+    assert forbidden.status_code == 403
+
+    admin_headers = {"Authorization": f"Bearer {token3}"}
+    everything = (await client.get("/history", headers=admin_headers)).json()["items"]
+    assert len(everything) == 6
+    by_user2 = (
+        await client.get("/history", headers=admin_headers, params={"changed_by": user2_id})
+    ).json()["items"]
+    assert [(item["task_id"], item["changed_by"]) for item in by_user2] == [(other_id, user2_id)]
+
+
+@pytest.mark.asyncio
+async def test_history_partition_maintenance(db_session):
+    """Месячные секции истории: границы и имена; в SQLite таблица остается одной."""
+    from datetime import datetime
+
+    from app.repositories.partitions import (
+        HistoryPartitionRepository,
+        add_months,
+        month_start,
+        partition_name,
+    )
+
+    month = month_start(datetime(2026, 11, 30, 23, 59))
+    assert month == date(2026, 11, 1)
+    assert add_months(month, 2) == date(2027, 1, 1)
+    assert add_months(month, -11) == date(2025, 12, 1)
+    assert partition_name(add_months(month, 2)) == "task_status_history_y2027m01"
+
+    repo = HistoryPartitionRepository(db_session)
+    assert await repo.is_partitioned() is False
+    assert await repo.maintain() == {"created": [], "compacted": []}
+
+
+@pytest.mark.asyncio
+async def test_history_partition_maintenance_postgres(client: AsyncClient, db_session):
+    """Обслуживание секций на PostgreSQL: новые месяцы подключаются, BRIN добавляется к btree."""
+    if db_session.bind.dialect.name != "postgresql":
+        pytest.skip("секции истории есть только на PostgreSQL (TEST_DATABASE_URL)")
+    import uuid
+    from datetime import datetime
+
+    from sqlalchemy import text
+
+    from app.models.history import TaskStatusHistory
+    from app.repositories.partitions import HistoryPartitionRepository
+
+    token, user_id = await create_test_user(client, email="part@example.com", username="part")
+    task = await client.post(
+        "/tasks", headers={"Authorization": f"Bearer {token}"}, json={"title": "Partitioned"}
+    )
+    task_id = task.json()["id"]
+
+    # Схема из create_all не секционирована: собираем таблицу как миграция 009,
+    # с одной секцией за ноябрь 2026.
+    for statement in (
+        "DROP TABLE task_status_history",
+        """
+        CREATE TABLE task_status_history (
+            id UUID NOT NULL,
+            task_id UUID NOT NULL REFERENCES tasks (id),
+            from_status VARCHAR(20) NOT NULL,
+            to_status VARCHAR(20) NOT NULL,
+            changed_by UUID NOT NULL REFERENCES users (id),
+            changed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, changed_at)
+        ) PARTITION BY RANGE (changed_at)
+        """,
+        "CREATE TABLE task_status_history_y2026m11 PARTITION OF task_status_history "
+        "FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')",
+        "CREATE INDEX task_status_history_y2026m11_changed_at_id "
+        "ON task_status_history_y2026m11 (changed_at DESC, id DESC)",
+    ):
+        await db_session.execute(text(statement))
+    await db_session.commit()
+
+    repo = HistoryPartitionRepository(db_session)
+    assert await repo.is_partitioned() is True
+    changes = await repo.maintain(now=datetime(2026, 12, 5), ahead=3)
+    assert changes == {
+        "created": [
+            "task_status_history_y2026m12",
+            "task_status_history_y2027m01",
+            "task_status_history_y2027m02",
+            "task_status_history_y2027m03",
+        ],
+        "compacted": ["task_status_history_y2026m11"],
+    }
+
+    partitions = await repo.partitions()
+    assert sorted(partitions) == [
+        date(2026, 11, 1),
+        date(2026, 12, 1),
+        date(2027, 1, 1),
+        date(2027, 2, 1),
+        date(2027, 3, 1),
+    ]
+    assert partitions[date(2026, 11, 1)] >= {
+        "task_status_history_y2026m11_changed_at_id",
+        "task_status_history_y2026m11_changed_at_brin",
+    }
+    assert "task_status_history_y2027m02_changed_at_id" in partitions[date(2027, 2, 1)]
+    assert "task_status_history_y2027m02_changed_at_brin" not in partitions[date(2027, 2, 1)]
+    # Ни одна транзакция обслуживания не осталась открытой с блокировками.
+    locked = await db_session.scalar(
+        text(
+            "SELECT count(*) FROM pg_locks l JOIN pg_class c ON c.oid = l.relation "
+            "WHERE c.relname IN ('tasks', 'users') AND l.pid <> pg_backend_pid()"
+        )
+    )
+    assert locked == 0
+    await db_session.commit()
+
+    db_session.add(
+        TaskStatusHistory(
+            id=uuid.uuid4(),
+            task_id=uuid.UUID(task_id),
+            from_status="new",
+            to_status="in_progress",
+            changed_by=uuid.UUID(user_id),
+            changed_at=datetime(2027, 2, 10),
+        )
+    )
+    await db_session.commit()
+
+    assert await repo.maintain(now=datetime(2026, 12, 5), ahead=3) == {
+        "created": [],
+        "compacted": [],
+    }
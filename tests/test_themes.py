@@ -78,3 +78,63 @@ async def test_themes_non_admin_forbidden(client: AsyncClient):
         json={"name": "NoAdmin", "description": "Should fail"},
     )
     assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_themes_etag(client: AsyncClient, db_session: AsyncSession):
+    token, user_id = await create_user(client, "etag_theme@example.com", "etag_theme")
+    await promote_admin(db_session, user_id)
+    headers = {"Authorization": f"Bearer {token}"}
+    first = await client.post("/themes", headers=headers, json={"name": "First"})
+    await client.post("/themes", headers=headers, json={"name": "Second"})
+    theme_id = first.json()["id"]
+
+    listing = await client.get("/themes")
+    list_etag = listing.headers["etag"]
+    assert [item["name"] for item in listing.json()] == ["First", "Second"]
+    assert (await client.get("/themes", headers={"If-None-Match": list_etag})).status_code == 304
+    other_page = await client.get("/themes?limit=1", headers={"If-None-Match": list_etag})
+    assert other_page.status_code == 200
+
+    single = await client.get(f"/themes/{theme_id}")
+    theme_etag = single.headers["etag"]
+    assert (await client.get(f"/themes/{theme_id}", headers={"If-None-Match": theme_etag})).status_code == 304
+
+    await client.patch(f"/themes/{theme_id}", headers=headers, json={"description": "Updated"})
+    assert (await client.get(f"/themes/{theme_id}", headers={"If-None-Match": theme_etag})).status_code == 200
+    refreshed = await client.get("/themes", headers={"If-None-Match": list_etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != list_etag
+
+
+@pytest.mark.asyncio
+async def test_theme_mutations_single_statement(
+    client: AsyncClient, db_session: AsyncSession, query_log: list
+):
+    token, user_id = await create_user(client, "oneshot_theme@example.com", "oneshot_theme")
+    await promote_admin(db_session, user_id)
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.get("/users/me", headers=headers)
+
+    query_log.clear()
+    created = await client.post("/themes", headers=headers, json={"name": "Ops"})
+    assert created.status_code == 200
+    assert len(query_log) == 1
+    theme_id = created.json()["id"]
+
+    duplicate = await client.post("/themes", headers=headers, json={"name": "Ops"})
+    assert duplicate.status_code == 400
+
+    query_log.clear()
+    updated = await client.patch(f"/themes/{theme_id}", headers=headers, json={"description": "On call"})
+    assert updated.json()["description"] == "On call"
+    assert len(query_log) == 1
+
+    await client.post("/themes", headers=headers, json={"name": "Dev"})
+    clash = await client.patch(f"/themes/{theme_id}", headers=headers, json={"name": "Dev"})
+    assert clash.status_code == 400
+
+    query_log.clear()
+    assert (await client.delete(f"/themes/{theme_id}", headers=headers)).status_code == 204
+    assert len(query_log) == 1
+    assert (await client.delete(f"/themes/{theme_id}", headers=headers)).status_code == 404